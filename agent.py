@@ -1,26 +1,21 @@
 import streamlit as st
-from services.parser import parse_criteria
-from services.query_builder import build_soql_query
-from services.query_executor import query_salesforce
-from utils.formatter import format_results, get_formatted_dataframe
+from config.settings import settings
+from services.conversation import ConversationState
+from services.errors import BackendUnavailableError
+from services.pipeline import customer_reference_agent
+from services.replica import get_replica
+from services.rule_parser import is_refinement
+from utils.result_store import SessionResultStore
 from utils.logger import logger
-from typing import List, Dict, Tuple
+from utils.metrics import stage_summary, start_metrics_server
 
-def customer_reference_agent(prompt: str) -> Tuple[str, List[Dict], str, str]:
-    """Core agent function that returns formatted results, raw data, SOQL query and message type"""
-    logger.info(f"Processing prompt: '{prompt}'")
-    criteria = parse_criteria(prompt)
-    soql_query = build_soql_query(criteria)
-    results = query_salesforce(soql_query)
-    
-    # Format results differently based on whether we found matches
-    if not results:
-        return "No customers found matching your criteria.", [], soql_query, "text"
-    else:
-        return format_results(results), results, soql_query, "table"
+def display_chat_message(role: str, content: str, message_idx: int, expandable_content: str = None,
+                         eager: bool = True):
+    """Display a chat message with optional expandable content.
 
-def display_chat_message(role: str, content: str, message_idx: int, expandable_content: str = None):
-    """Display a chat message with optional expandable content"""
+    Tables that are not `eager` (older messages) only build and render their
+    DataFrame once the user opens them, so a rerun stays cheap in long chats.
+    """
     with st.chat_message(role):
         # Get the message type
         message_type = st.session_state.message_types.get(message_idx, "text")
@@ -28,19 +23,20 @@ def display_chat_message(role: str, content: str, message_idx: int, expandable_c
         # If this is a table result, display it properly
         if message_type == "table":
             try:
-                # Get the raw results for this message
-                raw_results = st.session_state.raw_results.get(message_idx, [])
-                
-                # If we have raw results, convert to DataFrame
-                if raw_results:
-                    df = get_formatted_dataframe(raw_results)
-                    if not df.empty:
-                        st.dataframe(df, use_container_width=True)
-                        
-                        if expandable_content:
-                            with st.expander("View Query Details"):
-                                st.code(expandable_content, language="sql")
-                        return
+                store = st.session_state.result_store
+                if message_idx in store:
+                    if not eager:
+                        st.markdown(content)
+                    if eager or st.toggle("Show table", key=f"show_table_{message_idx}"):
+                        df = store.get(message_idx)
+                        if df is not None and not df.empty:
+                            st.dataframe(df, use_container_width=True)
+                    
+                    if expandable_content:
+                        with st.expander("View Query Details"):
+                            st.code(expandable_content, language="sql")
+                    return
+                content += "\n\n_These results were released to save memory; ask again to see them._"
             except Exception as e:
                 logger.error(f"Error displaying table: {str(e)}", exc_info=True)
                 # Fall back to text display if there's an error
@@ -95,15 +91,52 @@ def is_data_query(prompt: str) -> bool:
         "po", "non-po", "touchless", "automation", "activation"
     ]
     
-    return any(keyword in prompt_lower for keyword in data_keywords)
+    # Follow-ups like "only the ones on SAP" narrow the previous data answer
+    return any(keyword in prompt_lower for keyword in data_keywords) or is_refinement(prompt)
+
+def display_replica_status():
+    """Show how fresh the local replica is in the sidebar"""
+    replica = get_replica()
+    if replica is None:
+        return
+    staleness = replica.staleness_seconds()
+    if staleness is None:
+        st.caption("🗄️ Local replica: not synced yet, querying Salesforce live")
+    elif replica.is_fresh():
+        st.caption(f"🗄️ Local replica: synced {int(staleness // 60)} min ago")
+    else:
+        st.warning(f"🗄️ Local replica is stale (synced {int(staleness // 60)} min ago), querying Salesforce live")
+
+def display_debug_panel():
+    """Per-stage latency percentiles for this process (enabled with DEBUG_PANEL)"""
+    if not settings.DEBUG_PANEL:
+        return
+    with st.expander("🛠️ Stage latency"):
+        rows = stage_summary()
+        if rows:
+            st.dataframe(rows, hide_index=True, use_container_width=True)
+        else:
+            st.caption("No requests yet")
+
+def start_metrics_endpoint():
+    """Expose /metrics once per process when METRICS_PORT is set"""
+    if not settings.METRICS_PORT:
+        return
+    try:
+        start_metrics_server(settings.METRICS_PORT, settings.METRICS_HOST)
+    except OSError as e:
+        logger.warning(f"Metrics endpoint not started on port {settings.METRICS_PORT}: {str(e)}")
 
 def initialize_session_state():
     """Initialize or reset session state"""
     if "messages" not in st.session_state:
         st.session_state.messages = []
-        st.session_state.raw_results = {}
+        st.session_state.result_store = SessionResultStore(
+            settings.SESSION_RESULTS_MAX_BYTES, settings.CHAT_RECENT_TABLES, settings.SESSION_RESULTS_SPILL
+        )
         st.session_state.soql_queries = {}
         st.session_state.message_types = {}  # Add this to track message types
+        st.session_state.conversation = ConversationState()  # Last criteria and rows, for follow-ups
         st.session_state.messages.append({
             "role": "assistant", 
             "content": f"👋 Hi! I'm your Customer Reference Assistant.\n\n{get_capabilities_message()}"
@@ -119,15 +152,21 @@ def main():
     
     # Initialize session state
     initialize_session_state()
+    start_metrics_endpoint()
     
     # Clear chat button in sidebar
     with st.sidebar:
         if st.button("🧹 Clear Conversation", use_container_width=True, type="primary"):
+            st.session_state.result_store.clear()
             st.session_state.clear()
             initialize_session_state()
             st.rerun()
+        display_replica_status()
+        display_debug_panel()
     
-    # Display chat history
+    # Display chat history; only the newest tables render without being opened
+    table_indices = [i for i, kind in st.session_state.message_types.items() if kind == "table"]
+    recent_tables = set(sorted(table_indices)[-settings.CHAT_RECENT_TABLES:])
     for i, message in enumerate(st.session_state.messages):
         # For assistant messages with stored queries, show expandable content
         expandable = st.session_state.soql_queries.get(i)
@@ -135,7 +174,8 @@ def main():
             message["role"], 
             message["content"],
             i,  # Pass the message index
-            expandable_content=expandable
+            expandable_content=expandable,
+            eager=i in recent_tables
         )
     
     # Chat input
@@ -154,12 +194,16 @@ def main():
                 # Then check if it's a data query
                 elif is_data_query(prompt):
                     # Process data query
-                    formatted_results, raw_results, soql_query, message_type = customer_reference_agent(prompt)
+                    # Tables are rendered from the store, so the agent returns only a summary for them
+                    formatted_results, raw_results, soql_query, message_type = customer_reference_agent(
+                        prompt, st.session_state.conversation, text=False
+                    )
                     response = formatted_results
                     
-                    # Store raw data and query for this message index
+                    # Store the display table (built once) and query for this message index
                     idx = len(st.session_state.messages)
-                    st.session_state.raw_results[idx] = raw_results
+                    if message_type == "table":
+                        st.session_state.result_store.put(idx, raw_results)
                     st.session_state.soql_queries[idx] = soql_query
                     st.session_state.message_types[idx] = message_type
                 else:
@@ -190,13 +234,21 @@ def main():
                 
             except Exception as e:
                 logger.error(f"Error processing query: {str(e)}", exc_info=True)
-                error_msg = (
-                    "⚠️ **Sorry, I encountered an error processing your request.**\n\n"
-                    "Please try:\n"
-                    "- Rephrasing your query\n"
-                    "- Using simpler criteria\n"
-                    "- Contacting support if the issue persists"
-                )
+                if isinstance(e, (BackendUnavailableError, TimeoutError)):
+                    # An outage or stall, not a problem with the question
+                    service = "Salesforce" if getattr(e, "backend", None) == "salesforce" else "The search service"
+                    error_msg = (
+                        f"⚠️ **{service} is not responding right now.**\n\n"
+                        "Your request could not be completed. Please try again in a minute."
+                    )
+                else:
+                    error_msg = (
+                        "⚠️ **Sorry, I encountered an error processing your request.**\n\n"
+                        "Please try:\n"
+                        "- Rephrasing your query\n"
+                        "- Using simpler criteria\n"
+                        "- Contacting support if the issue persists"
+                    )
                 st.session_state.messages.append({
                     "role": "assistant", 
                     "content": error_msg
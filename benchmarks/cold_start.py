@@ -0,0 +1,97 @@
+"""Measure cold-start cost: per-module import time and the first agent response.
+
+Every measurement runs in a fresh interpreter so nothing is already imported.
+By default the first response uses an in-process fake LLM and Salesforce tool,
+so only local work (imports, prompt/chain construction, formatting) is timed;
+pass --live to go through the configured backends instead.
+
+Run from the repository root:
+    python -m benchmarks.cold_start [--runs N] [--live]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+MODULES = [
+    "config.settings",
+    "utils.formatter",
+    "services.parser",
+    "services.pipeline",
+    "agent",
+]
+
+# Modules that should only load once a request actually needs them
+HEAVY_MODULES = [
+    "pandas", "numpy", "langchain_core", "langchain_openai",
+    "langchain_salesforce", "simple_salesforce", "httpx",
+]
+
+IMPORT_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+FIRST_RESPONSE_PROBE = """
+import json, os, sys, time
+started = time.perf_counter()
+from services.pipeline import customer_reference_agent
+imported = time.perf_counter()
+if not {live!r}:
+    from langchain_core.language_models import FakeListChatModel
+    from benchmarks.synthetic import synthetic_records
+    from services.clients import clients
+
+    class FakeSalesforceTool:
+        def run(self, payload):
+            return {{"records": synthetic_records(5)}}
+
+    clients.set_llm(FakeListChatModel(responses=['{{"industry": "Manufacturing", "limit": 5}}']))
+    clients.set_salesforce_tool(FakeSalesforceTool())
+ready = time.perf_counter()
+text, results, soql, kind = customer_reference_agent("Which manufacturing customers could be good references?")
+finished = time.perf_counter()
+print(json.dumps({{
+    "import": imported - started,
+    "first_response": finished - ready,
+    "rows": len(results),
+}}))
+"""
+
+def run_probe(code: str, env=None) -> dict:
+    completed = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", code],
+        capture_output=True, text=True, check=True, env=env
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start benchmark")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per measurement")
+    parser.add_argument("--live", action="store_true", help="Use the configured Salesforce and Azure OpenAI")
+    args = parser.parse_args()
+
+    print(f"{'module':<20} {'median ms':>10} {'max ms':>8}  heavy modules loaded")
+    for module in MODULES:
+        samples = [run_probe(IMPORT_PROBE.format(module=module, heavy=HEAVY_MODULES)) for _ in range(args.runs)]
+        seconds = [s["seconds"] for s in samples]
+        loaded = ", ".join(samples[-1]["loaded"]) or "-"
+        print(f"{module:<20} {statistics.median(seconds) * 1000:>10.1f} {max(seconds) * 1000:>8.1f}  {loaded}")
+
+    # Force the LLM path so the chain is built as part of the first response
+    import os
+    env = dict(os.environ, RULE_PARSER_MIN_CONFIDENCE="2")
+    samples = [run_probe(FIRST_RESPONSE_PROBE.format(live=args.live), env=env) for _ in range(args.runs)]
+    print(
+        f"first response ({'live' if args.live else 'fake backends'}): "
+        f"import {statistics.median(s['import'] for s in samples) * 1000:.1f} ms, "
+        f"response {statistics.median(s['first_response'] for s in samples) * 1000:.1f} ms, "
+        f"{samples[-1]['rows']} rows"
+    )
+
+if __name__ == "__main__":
+    main()
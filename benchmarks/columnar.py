@@ -0,0 +1,51 @@
+"""Benchmark the columnar snapshot against the SQLite replica on synthetic data.
+
+Run from the repository root:
+    python -m benchmarks.columnar [rows]
+"""
+import sys
+import tempfile
+import time
+from models.criteria import CustomerCriteria
+from services.columnar import CustomerSnapshot
+from services.replica import CustomerReplica
+from benchmarks.synthetic import synthetic_records
+
+CRITERIA = [
+    CustomerCriteria(industry="Retail", po_touchless_percentage={"value": 30, "operator": "<"},
+                     invoice_volume={"value": 10000, "operator": ">"}, limit=20),
+    CustomerCriteria(erp_system="SAP", product_activations="Readsoft Invoices", limit=20),
+    CustomerCriteria(erp_system="Oracle NetSuite", automatic_distribution={"value": 50, "operator": ">="},
+                     non_po_percentage={"value": 40, "operator": "<="}, limit=20),
+    CustomerCriteria(customer_name="gmbh", po_percentage={"value": 80.5, "operator": ">"}, limit=20),
+]
+
+def timed(fn, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    records = synthetic_records(rows)
+
+    started = time.perf_counter()
+    snapshot = CustomerSnapshot(records)
+    print(f"snapshot build: {rows} rows in {time.perf_counter() - started:.2f}s")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        replica = CustomerReplica(f"{tmp}/replica.db")
+        replica.full_load(records)
+        for criteria in CRITERIA:
+            cold = timed(lambda: snapshot.evaluate(criteria), 1)
+            expected = sorted(r["Id"] for r in replica.query(criteria.copy(update={"limit": rows})))
+            actual = sorted(snapshot.records[i]["Id"] for i in snapshot.mask(criteria).nonzero()[0])
+            status = "ok" if expected == actual else "MISMATCH"
+            columnar = timed(lambda: snapshot.evaluate(criteria), 200)
+            sqlite = timed(lambda: replica.query(criteria), 5)
+            print(f"{status:8} {len(actual):6} matches  columnar {columnar * 1e3:7.3f} ms "
+                  f"(first call {cold * 1e3:7.3f} ms)  sqlite {sqlite * 1e3:8.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,432 @@
+"""Offline stand-ins for Azure OpenAI and Salesforce.
+
+FakeChatModel answers the parser prompt with canned criteria JSON after a
+configurable latency. FakeSalesforce evaluates the generated SOQL (SELECT
+projection, WHERE with AND/OR/parentheses, LIKE, INCLUDES/EXCLUDES, IN,
+comparisons, ORDER BY, LIMIT) over in-memory records, paging like the REST API;
+query subrequests of a Composite batch and Bulk API 2.0 query jobs are
+answered the same way.
+
+install_fakes() plugs both into the shared ClientManager:
+
+    from benchmarks.fakes import install_fakes
+    install_fakes(synthetic_records(10_000), responses={"retail": '{"industry": "Retail"}'})
+"""
+import asyncio
+import csv
+import os
+import re
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+USER_REQUEST = re.compile(r"User request:\s*(.*?)\s*$", re.S)
+
+class FakeChatModel(BaseChatModel):
+    """Chat model returning canned criteria JSON for the parser prompt.
+
+    `responses` maps a lower-case substring of the user request to the JSON
+    to return; the first match wins and `default` is returned otherwise.
+    """
+
+    responses: Dict[str, str] = {}
+    default: str = "{}"
+    latency: float = 0.0
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-criteria"
+
+    def _answer(self, messages: List[BaseMessage]) -> ChatResult:
+        text = messages[-1].content if messages else ""
+        match = USER_REQUEST.search(text)
+        request = (match.group(1) if match else text).lower()
+        content = next((json for key, json in self.responses.items() if key in request), self.default)
+        self.calls += 1
+        usage = {"input_tokens": len(text) // 4, "output_tokens": len(content) // 4,
+                 "total_tokens": (len(text) + len(content)) // 4}
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content, usage_metadata=usage))])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._answer(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._answer(messages)
+
+# --- SOQL evaluation -------------------------------------------------------
+
+_TOKEN = re.compile(
+    r"\s*(?:(?P<string>'(?:\\.|[^'\\])*')"
+    r"|(?P<datetime>\d{4}-\d{2}-\d{2}(?:T[\d:.]+(?:Z|[+-]\d{2}:?\d{2})?)?)"
+    r"|(?P<number>-?\d+(?:\.\d+)?)|(?P<op><=|>=|!=|<>|=|<|>)|(?P<punct>[(),])|(?P<word>[\w.]+))",
+    re.S
+)
+_ESCAPES = {"n": "\n", "r": "\r", "t": "\t", "b": "\b", "f": "\f"}
+# \% and \_ only mean something inside LIKE; they become private-use
+# characters so _like can tell them from wildcards and from an escaped backslash
+_LIKE_ESCAPES = {"%": "\ue000", "_": "\ue001"}
+_LIKE_LITERALS = {"\ue000": "%", "\ue001": "_"}
+
+def _tokenize(text: str) -> List[Tuple[str, Any]]:
+    tokens, position = [], 0
+    text = text.strip()
+    while position < len(text):
+        match = _TOKEN.match(text, position)
+        if not match or match.end() == position:
+            raise ValueError(f"Cannot parse SOQL near: {text[position:position + 30]!r}")
+        position = match.end()
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "string":
+            value = re.sub(r"\\(.)", lambda m: _ESCAPES.get(m.group(1)) or _LIKE_ESCAPES.get(m.group(1), m.group(1)), value[1:-1])
+        elif kind == "number":
+            value = float(value)
+        tokens.append((kind, value))
+    return tokens
+
+Predicate = Callable[[Dict], bool]
+
+def _get(record: Dict, path: str) -> Any:
+    value: Any = record
+    for key in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+def _like(pattern: str) -> "re.Pattern":
+    regex = "".join(
+        ".*" if c == "%" else "." if c == "_" else re.escape(_LIKE_LITERALS.get(c, c)) for c in pattern
+    )
+    return re.compile(f"^{regex}$", re.I | re.S)
+
+def _compare(value: Any, operator: str, literal: Any) -> bool:
+    if value is None or literal is None:
+        if operator == "=":
+            return value is None and literal is None
+        if operator in ("!=", "<>"):
+            return (value is None) != (literal is None)
+        return False
+    if isinstance(literal, str) and isinstance(value, str):
+        value, literal = value.lower(), literal.lower()
+    try:
+        if operator == "=":
+            return value == literal
+        if operator in ("!=", "<>"):
+            return value != literal
+        if operator == "<":
+            return value < literal
+        if operator == "<=":
+            return value <= literal
+        if operator == ">":
+            return value > literal
+        return value >= literal
+    except TypeError:
+        return False
+
+class _WhereParser:
+    """Recursive descent over the WHERE tokens: or := and (OR and)*, and := atom (AND atom)*"""
+
+    def __init__(self, tokens: List[Tuple[str, Any]]):
+        self.tokens = tokens
+        self.position = 0
+
+    def _peek_word(self) -> Optional[str]:
+        if self.position < len(self.tokens) and self.tokens[self.position][0] == "word":
+            return self.tokens[self.position][1].upper()
+        return None
+
+    def _next(self) -> Tuple[str, Any]:
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def parse(self) -> Predicate:
+        predicate = self._or()
+        if self.position != len(self.tokens):
+            raise ValueError(f"Unexpected SOQL token {self.tokens[self.position]}")
+        return predicate
+
+    def _or(self) -> Predicate:
+        terms = [self._and()]
+        while self._peek_word() == "OR":
+            self._next()
+            terms.append(self._and())
+        return terms[0] if len(terms) == 1 else (lambda r: any(t(r) for t in terms))
+
+    def _and(self) -> Predicate:
+        terms = [self._atom()]
+        while self._peek_word() == "AND":
+            self._next()
+            terms.append(self._atom())
+        return terms[0] if len(terms) == 1 else (lambda r: all(t(r) for t in terms))
+
+    def _literal(self) -> Any:
+        kind, value = self._next()
+        if kind in ("string", "number", "datetime"):
+            return value
+        if kind == "word" and value.lower() in ("true", "false"):
+            return value.lower() == "true"
+        if kind == "word" and value.lower() == "null":
+            return None
+        raise ValueError(f"Unsupported SOQL literal {value!r}")
+
+    def _list(self) -> List[Any]:
+        if self._next() != ("punct", "("):
+            raise ValueError("Expected '(' in SOQL value list")
+        values = [self._literal()]
+        while self.tokens[self.position] == ("punct", ","):
+            self._next()
+            values.append(self._literal())
+        if self._next() != ("punct", ")"):
+            raise ValueError("Expected ')' in SOQL value list")
+        return values
+
+    def _atom(self) -> Predicate:
+        if self._peek_word() == "NOT":
+            self._next()
+            inner = self._atom()
+            return lambda r: not inner(r)
+        if self.tokens[self.position] == ("punct", "("):
+            self._next()
+            inner = self._or()
+            if self._next() != ("punct", ")"):
+                raise ValueError("Unbalanced parentheses in SOQL")
+            return inner
+        _, field = self._next()
+        keyword = self._peek_word()
+        if keyword == "NOT":
+            self._next()
+            keyword = "NOT " + (self._peek_word() or "")
+        if keyword in ("LIKE", "NOT LIKE"):
+            self._next()
+            pattern = _like(self._literal())
+            negate = keyword == "NOT LIKE"
+            return lambda r: (_get(r, field) is not None and bool(pattern.match(str(_get(r, field))))) != negate
+        if keyword in ("INCLUDES", "EXCLUDES"):
+            self._next()
+            # Each value may itself be 'a;b', meaning all of those are selected
+            wanted = [{part.strip().lower() for part in value.split(";")} for value in self._list()]
+            def includes(r: Dict) -> bool:
+                selected = {item.strip().lower() for item in (_get(r, field) or "").split(";") if item.strip()}
+                return any(group <= selected for group in wanted)
+            return includes if keyword == "INCLUDES" else (lambda r: not includes(r))
+        if keyword in ("IN", "NOT IN"):
+            self._next()
+            values = [v.lower() if isinstance(v, str) else v for v in self._list()]
+            def member(r: Dict) -> bool:
+                value = _get(r, field)
+                return (value.lower() if isinstance(value, str) else value) in values
+            return member if keyword == "IN" else (lambda r: _get(r, field) is not None and not member(r))
+        kind, operator = self._next()
+        if kind != "op":
+            raise ValueError(f"Unsupported SOQL operator {operator!r}")
+        literal = self._literal()
+        return lambda r: _compare(_get(r, field), operator, literal)
+
+_QUERY = re.compile(
+    r"^SELECT\s+(?P<fields>.+?)\s+FROM\s+(?P<object>\w+)"
+    r"(?:\s+WHERE\s+(?P<where>.+?))?(?:\s+ORDER\s+BY\s+(?P<order>.+?))?(?:\s+LIMIT\s+(?P<limit>\d+))?\s*$",
+    re.I | re.S
+)
+
+def _mask_strings(text: str) -> str:
+    """Blank out string literals so clause keywords inside values are not matched"""
+    return re.sub(r"'(?:\\.|[^'\\])*'", lambda m: "'" + "_" * (len(m.group(0)) - 2) + "'", text)
+
+class CompiledQuery:
+    def __init__(self, soql: str):
+        soql = " ".join(soql.split())
+        match = _QUERY.match(_mask_strings(soql))
+        if not match:
+            raise ValueError(f"Unsupported SOQL: {soql[:80]}")
+        section = lambda name: soql[match.start(name):match.end(name)] if match.group(name) else None
+        self.fields = [field.strip() for field in section("fields").split(",")]
+        self.object = match.group("object")
+        where = section("where")
+        self.predicate: Predicate = _WhereParser(_tokenize(where)).parse() if where else (lambda r: True)
+        self.order: List[Tuple[str, bool, bool]] = []
+        for part in (section("order") or "").split(","):
+            words = [word.upper() for word in part.split()]
+            if words:
+                # SOQL sorts nulls first ascending and last descending unless NULLS is given
+                descending = "DESC" in words
+                nulls_last = "LAST" in words or (descending and "FIRST" not in words)
+                words[0] = part.split()[0]
+                self.order.append((words[0], descending, nulls_last))
+        self.limit = int(match.group("limit")) if match.group("limit") else None
+
+    def project(self, record: Dict) -> Dict:
+        out: Dict[str, Any] = {"attributes": {"type": self.object}}
+        for field in self.fields:
+            *parents, leaf = field.split(".")
+            source, target = record, out
+            for parent in parents:
+                source = source.get(parent) if isinstance(source, dict) else None
+                target = target.setdefault(parent, {})
+            target[leaf] = source.get(leaf) if isinstance(source, dict) else None
+        return out
+
+    def execute(self, records: List[Dict]) -> List[Dict]:
+        if self.order or self.limit is None:
+            rows = [r for r in records if self.predicate(r)]
+        else:
+            rows = []
+            for record in records:
+                if self.predicate(record):
+                    rows.append(record)
+                    if len(rows) >= self.limit:
+                        break
+        for field, descending, nulls_last in reversed(self.order):
+            present = [r for r in rows if _get(r, field) is not None]
+            missing = [r for r in rows if _get(r, field) is None]
+            present.sort(key=lambda r: _get(r, field), reverse=descending)
+            rows = present + missing if nulls_last else missing + present
+        if self.limit is not None:
+            rows = rows[:self.limit]
+        return [self.project(r) for r in rows]
+
+def _flatten(record: Dict, prefix: str = "") -> Dict[str, Any]:
+    """Nested query record as Bulk API CSV columns: Account__r.Name and so on"""
+    columns: Dict[str, Any] = {}
+    for key, value in record.items():
+        if key == "attributes":
+            continue
+        if isinstance(value, dict):
+            columns.update(_flatten(value, f"{prefix}{key}."))
+        else:
+            columns[f"{prefix}{key}"] = value
+    return columns
+
+class FakeBulk2Type:
+    """One sObject of FakeBulk2: download() writes the query results as CSV files"""
+
+    def __init__(self, salesforce: "FakeSalesforce"):
+        self.salesforce = salesforce
+
+    def download(self, query: str, path: str, max_records: int = 50000, **kwargs) -> List[Dict]:
+        compiled = CompiledQuery(query)
+        rows = compiled.execute(self.salesforce.records)
+        self.salesforce.bulk_jobs += 1
+        results = []
+        # Like Salesforce, an empty result is still one (header-only) file
+        for offset in range(0, max(len(rows), 1), max_records):
+            chunk = rows[offset:offset + max_records]
+            file = os.path.join(path, f"{uuid.uuid4().hex}.csv")
+            with open(file, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(compiled.fields)
+                for row in chunk:
+                    columns = _flatten(row)
+                    # Bulk API CSV writes nulls as empty strings
+                    writer.writerow(["" if columns.get(field) is None else columns[field] for field in compiled.fields])
+            more = offset + max_records < len(rows)
+            results.append({"locator": str(offset + max_records) if more else "", "number_of_records": len(chunk),
+                            "file": file})
+        return results
+
+class FakeBulk2:
+    def __init__(self, salesforce: "FakeSalesforce"):
+        self.salesforce = salesforce
+
+    def __getattr__(self, name: str) -> FakeBulk2Type:
+        return FakeBulk2Type(self.salesforce)
+
+class FakeSalesforce:
+    """Stand-in for simple_salesforce.Salesforce answering SOQL from in-memory records"""
+
+    sf_instance = "fake.my.salesforce.com"
+    sf_version = "59.0"
+
+    def __init__(self, records: List[Dict], latency: float = 0.0, page_size: int = 2000):
+        self.records = records
+        self.latency = latency
+        self.page_size = page_size
+        self.queries = 0
+        self.query_mores = 0
+        self.batches = 0
+        self.bulk_jobs = 0
+        self.bulk2 = FakeBulk2(self)
+        self._cursors: Dict[str, List[Dict]] = {}
+        self._compiled: Dict[str, CompiledQuery] = {}
+
+    def _page(self, rows: List[Dict], offset: int, cursor: str) -> Dict:
+        page = rows[offset:offset + self.page_size]
+        done = offset + self.page_size >= len(rows)
+        result = {"totalSize": len(rows), "done": done, "records": page}
+        if not done:
+            result["nextRecordsUrl"] = f"/services/data/v59.0/query/{cursor}-{offset + self.page_size}"
+        return result
+
+    def query(self, soql: str, include_deleted: bool = False, **kwargs) -> Dict:
+        if self.latency:
+            time.sleep(self.latency)
+        self.queries += 1
+        compiled = self._compiled.get(soql)
+        if compiled is None:
+            compiled = self._compiled[soql] = CompiledQuery(soql)
+        rows = compiled.execute(self.records)
+        cursor = f"01g{self.queries:015d}"
+        self._cursors[cursor] = rows
+        return self._page(rows, 0, cursor)
+
+    def query_more(self, next_records_identifier: str, identifier_is_url: bool = False, **kwargs) -> Dict:
+        if self.latency:
+            time.sleep(self.latency)
+        self.query_mores += 1
+        cursor, offset = next_records_identifier.rsplit("/", 1)[-1].rsplit("-", 1)
+        return self._page(self._cursors[cursor], int(offset), cursor)
+
+    def restful(self, path: str, params: Optional[Dict] = None, method: str = "GET", **kwargs) -> Dict:
+        """Composite batch of query subrequests, answered in one round trip"""
+        if path != "composite/batch" or method != "POST":
+            raise ValueError(f"Unsupported REST call: {method} {path}")
+        if self.latency:
+            time.sleep(self.latency)
+        results = []
+        for request in kwargs["json"]["batchRequests"]:
+            soql = parse_qs(urlsplit(request["url"]).query)["q"][0]
+            try:
+                compiled = self._compiled.get(soql)
+                if compiled is None:
+                    compiled = self._compiled[soql] = CompiledQuery(soql)
+            except ValueError as e:
+                results.append({"statusCode": 400, "result": [{"errorCode": "MALFORMED_QUERY", "message": str(e)}]})
+                continue
+            self.queries += 1
+            rows = compiled.execute(self.records)
+            cursor = f"01g{self.queries:015d}"
+            self._cursors[cursor] = rows
+            results.append({"statusCode": 200, "result": self._page(rows, 0, cursor)})
+        self.batches += 1
+        return {"hasErrors": any(r["statusCode"] != 200 for r in results), "results": results}
+
+    def query_all_iter(self, soql: str, include_deleted: bool = False, **kwargs) -> Iterator[Dict]:
+        result = self.query(soql)
+        while True:
+            yield from result["records"]
+            if result["done"]:
+                return
+            result = self.query_more(result["nextRecordsUrl"], identifier_is_url=True)
+
+def install_fakes(records: List[Dict], responses: Optional[Dict[str, str]] = None,
+                  llm_latency: float = 0.0, salesforce_latency: float = 0.0) -> Tuple[FakeChatModel, FakeSalesforce]:
+    """Point the shared clients at a FakeChatModel and a SalesforceTool over FakeSalesforce"""
+    from langchain_salesforce import SalesforceTool
+    from services.clients import clients
+
+    llm = FakeChatModel(responses=responses or {}, latency=llm_latency)
+    salesforce = FakeSalesforce(records, latency=salesforce_latency)
+    clients.set_llm(llm)
+    clients.set_salesforce_tool(SalesforceTool("fake", "fake", "fake", salesforce_client=salesforce))
+    return llm, salesforce
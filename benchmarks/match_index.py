@@ -0,0 +1,73 @@
+"""Micro-benchmark and parity check for services.matcher.MatchIndex.
+
+Run from the repository root:
+    python -m benchmarks.match_index
+"""
+import difflib
+import random
+import string
+import timeit
+from typing import List, Optional
+from config.static_lists import ERP_SYSTEMS
+from services.matcher import MatchIndex
+
+def difflib_best_match(input_value: str, possible_values: List[str]) -> Optional[str]:
+    """The original linear-scan implementation of find_best_match"""
+    input_lower = input_value.lower()
+    for value in possible_values:
+        if value.lower() == input_lower:
+            return value
+    matches = difflib.get_close_matches(input_lower, [v.lower() for v in possible_values], n=1, cutoff=0.6)
+    if matches:
+        return possible_values[[v.lower() for v in possible_values].index(matches[0])]
+    return None
+
+NO_SHARED_TRIGRAM_QUERIES = ["deltek", "ncr inc", "aptean "]
+
+def mutate(value: str, rng: random.Random) -> str:
+    """Apply one random typo: deletion, substitution, insertion or transposition"""
+    if len(value) < 2:
+        return value + rng.choice(string.ascii_lowercase)
+    i = rng.randrange(len(value) - 1)
+    edit = rng.randrange(4)
+    if edit == 0:
+        return value[:i] + value[i + 1:]
+    if edit == 1:
+        return value[:i] + rng.choice(string.ascii_lowercase) + value[i + 1:]
+    if edit == 2:
+        return value[:i] + rng.choice(string.ascii_lowercase) + value[i:]
+    return value[:i] + value[i + 1] + value[i] + value[i + 2:]
+
+def synthetic_vocabulary(size: int, rng: random.Random) -> List[str]:
+    """Picklist-like names built from the ERP vocabulary words"""
+    words = sorted({word for value in ERP_SYSTEMS for word in value.split()})
+    names = set(ERP_SYSTEMS)
+    while len(names) < size:
+        names.add(" ".join(rng.sample(words, rng.randint(1, 3))))
+    return sorted(names)
+
+def run(vocabulary: List[str], queries: List[str], label: str):
+    index = MatchIndex(vocabulary)
+    mismatches = [q for q in queries if index.lookup(q) != difflib_best_match(q, vocabulary)]
+    n = len(queries)
+    linear = timeit.timeit(lambda: [difflib_best_match(q, vocabulary) for q in queries], number=1) / n
+    indexed = timeit.timeit(lambda: [index.lookup(q) for q in queries], number=1) / n
+    print(f"{label}: {len(vocabulary)} values, {n} queries, {len(mismatches)} mismatches")
+    print(f"  difflib scan: {linear * 1e6:9.1f} us/lookup")
+    print(f"  match index:  {indexed * 1e6:9.1f} us/lookup ({linear / indexed:.1f}x)")
+    for q in mismatches[:10]:
+        print(f"  mismatch: {q!r} -> {index.lookup(q)!r} vs {difflib_best_match(q, vocabulary)!r}")
+
+def main():
+    rng = random.Random(42)
+    queries = [mutate(value.lower(), rng) for value in ERP_SYSTEMS]
+    queries += [value.upper() for value in ERP_SYSTEMS[:50]] + ["sap s4 hana", "ms dynamics 365", "netsuite", "xyz"]
+    # The best ratio belongs to a value sharing no trigram with the input
+    queries += NO_SHARED_TRIGRAM_QUERIES
+    run(ERP_SYSTEMS, queries, "ERP_SYSTEMS")
+
+    vocabulary = synthetic_vocabulary(5000, rng)
+    run(vocabulary, [mutate(rng.choice(vocabulary).lower(), rng) for _ in range(500)], "synthetic picklist")
+
+if __name__ == "__main__":
+    main()
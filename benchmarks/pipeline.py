@@ -0,0 +1,202 @@
+"""Offline latency/throughput benchmark of the agent pipeline and its stages.
+
+Runs customer_reference_agent, the criteria parser, the SOQL builder and the
+formatter at 1, 10 and 100 concurrent users against the fakes in
+benchmarks.fakes (no Azure or Salesforce needed) and reports throughput and
+p50/p95/p99. Results can be saved as a baseline and later runs compared
+against it; the comparison exits non-zero when a p95 regresses.
+
+Run from the repository root:
+    python -m benchmarks.pipeline [--save benchmarks/baseline.json]
+    python -m benchmarks.pipeline --compare benchmarks/baseline.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+from benchmarks.fakes import install_fakes
+from benchmarks.synthetic import synthetic_records
+
+# (prompt, JSON the fake LLM answers with when the rule parser defers to it)
+WORKLOAD = [
+    ("Show me 5 retail customers with less than 30% po touchless and more than 10k invoices", "{}"),
+    ("Find clients using SAP with over 10,000 invoices", "{}"),
+    ("Which manufacturing customers could be good references for an Oracle rollout?",
+     '{"industry": "Manufacturing", "erp_system": "Oracle", "limit": 5}'),
+    ("Customers similar to a mid-size food company with strong PO automation",
+     '{"industry": "Food and Beverage", "po_percentage": {"value": 70, "operator": ">="}}'),
+    ("Give me 10 references on NetSuite that activated Readsoft Invoices",
+     '{"erp_system": "Oracle NetSuite", "product_activations": "Readsoft Invoices", "limit": 10}'),
+    ("Who are our biggest healthcare customers by invoice volume?",
+     '{"industry": "Healthcare", "invoice_volume": {"value": 50000, "operator": ">="}}'),
+    ("List 20 customers with at least 80% automatic distribution", "{}"),
+    ("Any retail customers on Microsoft Dynamics with low non-PO share?",
+     '{"industry": "Retail", "erp_system": "MS Dynamics NAV", "non_po_percentage": {"value": 20, "operator": "<"}}'),
+]
+USER_COUNTS = [1, 10, 100]
+
+def percentile(samples: List[float], q: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+def summarize(latencies: List[float], elapsed: float) -> Dict[str, float]:
+    return {
+        "requests": len(latencies),
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+    }
+
+def run_threads(operation: Callable[[int], object], users: int, requests_per_user: int) -> Dict[str, float]:
+    """Each of `users` threads calls operation(i) requests_per_user times"""
+    def user(offset: int) -> List[float]:
+        latencies = []
+        for i in range(requests_per_user):
+            started = time.perf_counter()
+            operation(offset + i)
+            latencies.append(time.perf_counter() - started)
+        return latencies
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as pool:
+        per_user = list(pool.map(user, range(0, users * requests_per_user, requests_per_user)))
+    return summarize([l for latencies in per_user for l in latencies], time.perf_counter() - started)
+
+def run_agent(users: int, requests_per_user: int) -> Dict[str, float]:
+    """`users` concurrent tasks on one event loop, as the app and the batch CLI serve them"""
+    from services.pipeline import acustomer_reference_agent
+
+    async def user(offset: int) -> List[float]:
+        latencies = []
+        for i in range(requests_per_user):
+            prompt = WORKLOAD[(offset + i) % len(WORKLOAD)][0]
+            started = time.perf_counter()
+            await acustomer_reference_agent(prompt)
+            latencies.append(time.perf_counter() - started)
+        return latencies
+
+    async def main() -> Dict[str, float]:
+        started = time.perf_counter()
+        per_user = await asyncio.gather(*(user(u * requests_per_user) for u in range(users)))
+        return summarize([l for latencies in per_user for l in latencies], time.perf_counter() - started)
+
+    return asyncio.run(main())
+
+def disable_caches():
+    """Measure the uncached pipeline: every request parses and queries"""
+    from services.cache import criteria_cache, result_cache
+    criteria_cache.max_size = 0
+    criteria_cache.clear()
+    result_cache.ttl_seconds = 0
+    result_cache.clear()
+
+def run_suite(args) -> Dict:
+    from services.parser import parse_criteria
+    from services.query_builder import build_soql_query
+    from utils.formatter import format_results
+
+    records = synthetic_records(args.rows)
+    install_fakes(records, responses={prompt.lower(): answer for prompt, answer in WORKLOAD},
+                  llm_latency=args.llm_latency, salesforce_latency=args.salesforce_latency)
+    if not args.with_cache:
+        disable_caches()
+
+    criteria = [parse_criteria(prompt) for prompt, _ in WORKLOAD]
+    sample_rows = records[:20]
+    components = {
+        "agent": None,
+        "parser": lambda i: parse_criteria(WORKLOAD[i % len(WORKLOAD)][0]),
+        "query_builder": lambda i: build_soql_query(criteria[i % len(criteria)]),
+        "formatter": lambda i: format_results(sample_rows),
+    }
+
+    results: Dict[str, Dict[str, Dict[str, float]]] = {}
+    for name, operation in components.items():
+        if args.only and name not in args.only:
+            continue
+        # Warm up lazy imports and clients so the first sample is not a cold start
+        if operation is None:
+            run_agent(1, 1)
+        else:
+            operation(0)
+        results[name] = {}
+        for users in args.users:
+            if operation is None:
+                summary = run_agent(users, args.requests_per_user)
+            else:
+                summary = run_threads(operation, users, args.requests_per_user)
+            results[name][str(users)] = summary
+            print(f"{name:<14} users={users:<4} {summary['throughput_rps']:>9.1f} req/s  "
+                  f"p50 {summary['p50_ms']:>9.2f} ms  p95 {summary['p95_ms']:>9.2f} ms  p99 {summary['p99_ms']:>9.2f} ms")
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "rows": args.rows,
+            "requests_per_user": args.requests_per_user,
+            "llm_latency": args.llm_latency,
+            "salesforce_latency": args.salesforce_latency,
+            "with_cache": args.with_cache,
+        },
+        "results": results,
+    }
+
+def compare(current: Dict, baseline: Dict, tolerance: float, min_delta_ms: float) -> List[str]:
+    """Component/user-count pairs whose p95 grew by more than tolerance and min_delta_ms"""
+    regressions = []
+    for name, by_users in current["results"].items():
+        for users, summary in by_users.items():
+            before = baseline.get("results", {}).get(name, {}).get(users)
+            if not before:
+                continue
+            change = summary["p95_ms"] / before["p95_ms"] - 1 if before["p95_ms"] else 0.0
+            # Sub-millisecond stages are too noisy for a relative threshold alone
+            regressed = change > tolerance and summary["p95_ms"] - before["p95_ms"] > min_delta_ms
+            marker = "REGRESSION" if regressed else ""
+            print(f"{name:<14} users={users:<4} p95 {before['p95_ms']:>9.2f} -> {summary['p95_ms']:>9.2f} ms "
+                  f"({change:+.0%}) {marker}")
+            if regressed:
+                regressions.append(f"{name}@{users}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline pipeline benchmark")
+    parser.add_argument("--users", type=int, nargs="+", default=USER_COUNTS)
+    parser.add_argument("--requests-per-user", type=int, default=10)
+    parser.add_argument("--rows", type=int, default=20_000, help="Synthetic Usage_statistic__c rows")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Fake LLM latency in seconds")
+    parser.add_argument("--salesforce-latency", type=float, default=0.02, help="Fake Salesforce latency in seconds")
+    parser.add_argument("--with-cache", action="store_true", help="Keep the criteria and result caches on")
+    parser.add_argument("--only", nargs="+", choices=["agent", "parser", "query_builder", "formatter"])
+    parser.add_argument("--save", help="Write the results as a baseline JSON file")
+    parser.add_argument("--compare", help="Baseline JSON file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative p95 growth")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="Ignore p95 growth below this many ms")
+    args = parser.parse_args()
+
+    # Log I/O is not what is being measured
+    logging.disable(logging.INFO)
+    current = run_suite(args)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+        print(f"Baseline written to {args.save}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.tolerance, args.min_delta_ms)
+        if regressions:
+            print(f"p95 regressions: {', '.join(regressions)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
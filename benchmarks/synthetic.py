@@ -0,0 +1,38 @@
+"""Synthetic Usage_statistic__c records shaped like Salesforce query results."""
+import random
+from typing import Dict, List
+from config.static_lists import ERP_SYSTEMS, INDUSTRIES, PRODUCT_ACTIVATIONS
+
+def _maybe(rng: random.Random, value, null_rate: float = 0.05):
+    return None if rng.random() < null_rate else value
+
+def synthetic_records(count: int, seed: int = 42) -> List[Dict]:
+    """Generate `count` latest-row records with realistic value distributions"""
+    rng = random.Random(seed)
+    popular_erps = ["SAP", "Oracle", "MS Dynamics NAV", "Oracle NetSuite", "Infor M3", "Epicor"]
+    records = []
+    for i in range(count):
+        erps = rng.sample(popular_erps, rng.randint(0, 2)) + rng.sample(ERP_SYSTEMS, rng.randint(0, 1))
+        products = rng.sample(PRODUCT_ACTIVATIONS, rng.randint(0, 4))
+        po_share = round(rng.uniform(0, 100), 1)
+        records.append({
+            "attributes": {"type": "Usage_statistic__c"},
+            "Id": f"a0X{i:015d}",
+            "SystemModstamp": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T10:00:00.000+0000",
+            "IsLatest__c": True,
+            "Account__r": {
+                "Name": f"Customer {i:06d} {rng.choice(['AB', 'Inc', 'GmbH', 'Ltd', 'Oy'])}",
+                "Account_Owner_TEXT__c": rng.choice(["Alex Smith", "Sam Lee", "Kim Berg", "Robin Diaz"]),
+                "Industry": _maybe(rng, rng.choice(INDUSTRIES)),
+                "ERP__c": ";".join(dict.fromkeys(erps)) or None,
+                "Product_Activations__c": ";".join(products) or None,
+                "Account_URL_Link__c": f"https://example.my.salesforce.com/{i:015d}",
+                "Type": rng.choices(["Customer", "Prospect", "Partner"], weights=[8, 1, 1])[0],
+            },
+            "archived_invoice_count_R12__c": _maybe(rng, float(int(rng.lognormvariate(8.5, 1.5)))),
+            "po_I_E_Percent__c": _maybe(rng, po_share),
+            "non_po_I_E_percent__c": _maybe(rng, round(100 - po_share, 1)),
+            "po_Touchless_Percent__c": _maybe(rng, round(rng.uniform(0, 100), 1)),
+            "Automatic_distribution_percent__c": _maybe(rng, round(rng.uniform(0, 100), 1)),
+        })
+    return records
@@ -1,23 +1,192 @@
-import streamlit as st
-from dotenv import load_dotenv
+import os
+import sys
+from typing import Any, Callable, Optional
 
-load_dotenv()
+try:
+    from dotenv import load_dotenv
+except ImportError:  # python-dotenv is optional outside the app
+    load_dotenv = None
+
+if load_dotenv is not None:
+    load_dotenv()
+
+_REQUIRED = object()
+
+def _streamlit_secrets():
+    """st.secrets when the app already imported streamlit, without importing it ourselves"""
+    st = sys.modules.get("streamlit")
+    if st is None:
+        return None
+    try:
+        return st.secrets if st.secrets.load_if_toml_exists() else None
+    except Exception:
+        return None
+
+def _as_bool(value: Any) -> bool:
+    if isinstance(value, str):
+        return value.strip().lower() not in ("", "0", "false", "no", "off")
+    return bool(value)
+
+class Setting:
+    """A value read on first access from the environment (or .env), then Streamlit secrets.
+
+    Resolution is lazy so services can be imported headless, without streamlit
+    or credentials; a required setting that is missing only fails when used.
+    Assigning the attribute on the settings instance overrides it.
+    """
+
+    def __init__(self, default: Any = _REQUIRED, cast: Optional[Callable[[Any], Any]] = None):
+        self.default = default
+        self.cast = cast
+
+    def __set_name__(self, owner, name: str):
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        value = os.environ.get(self.name)
+        if value is None:
+            secrets = _streamlit_secrets()
+            if secrets is not None and self.name in secrets:
+                value = secrets[self.name]
+        if value is None:
+            if self.default is _REQUIRED:
+                raise KeyError(f"Setting '{self.name}' is not configured (environment, .env or st.secrets)")
+            value = self.default
+        if value is not None and self.cast is not None:
+            value = self.cast(value)
+        # Cache on the instance; a plain attribute shadows this non-data descriptor
+        instance.__dict__[self.name] = value
+        return value
 
 class Settings:
     # Salesforce credentials
-    SALESFORCE_USERNAME = st.secrets["SALESFORCE_USERNAME"]
-    SALESFORCE_PASSWORD = st.secrets["SALESFORCE_PASSWORD"]
-    SALESFORCE_SECURITY_TOKEN = st.secrets["SALESFORCE_SECURITY_TOKEN"]
-    SALESFORCE_DOMAIN = st.secrets.get("SALESFORCE_DOMAIN", "login")
-    
+    SALESFORCE_USERNAME = Setting()
+    SALESFORCE_PASSWORD = Setting()
+    SALESFORCE_SECURITY_TOKEN = Setting()
+    SALESFORCE_DOMAIN = Setting("login")
+
     # Azure OpenAI settings
-    AZURE_OPENAI_API_KEY = st.secrets["AZURE_OPENAI_API_KEY"]
-    AZURE_OPENAI_ENDPOINT = st.secrets["AZURE_OPENAI_ENDPOINT"]
-    AZURE_OPENAI_DEPLOYMENT = st.secrets["AZURE_OPENAI_DEPLOYMENT"]
-    AZURE_OPENAI_API_VERSION = st.secrets["AZURE_OPENAI_API_VERSION"]
-    
+    AZURE_OPENAI_API_KEY = Setting()
+    AZURE_OPENAI_ENDPOINT = Setting()
+    AZURE_OPENAI_DEPLOYMENT = Setting()
+    AZURE_OPENAI_API_VERSION = Setting()
+
+    # Shared client pools and concurrency caps
+    HTTP_POOL_SIZE = Setting(20, int)
+    SALESFORCE_MAX_CONCURRENCY = Setting(8, int)
+    LLM_MAX_CONCURRENCY = Setting(8, int)
+    # Deadline of a single backend call (each retry and hedge gets its own); in the
+    # async pipeline an LLM call is also cut to its share of the stage time left
+    LLM_REQUEST_TIMEOUT_SECONDS = Setting(20, float)
+    SALESFORCE_REQUEST_TIMEOUT_SECONDS = Setting(30, float)
+    # Calls per second to each backend (0 = unlimited)
+    SALESFORCE_RATE_LIMIT_PER_SECOND = Setting(0, float)
+    LLM_RATE_LIMIT_PER_SECOND = Setting(0, float)
+
+    # Per-stage timeouts for the async pipeline
+    PARSE_TIMEOUT_SECONDS = Setting(30, float)
+    QUERY_TIMEOUT_SECONDS = Setting(60, float)
+
+    # Retries of timeouts, connection errors, 429 and 5xx (full-jitter backoff)
+    RETRY_ATTEMPTS = Setting(3, int)
+    RETRY_BASE_DELAY_SECONDS = Setting(0.2, float)
+    RETRY_MAX_DELAY_SECONDS = Setting(2.0, float)
+    # Fail fast for CIRCUIT_RESET_SECONDS after this many failures in a row
+    CIRCUIT_FAILURE_THRESHOLD = Setting(5, int)
+    CIRCUIT_RESET_SECONDS = Setting(30, float)
+    # Send a duplicate LLM request once the first outlives the LLM's p95 latency
+    # (LLM_HEDGE_AFTER_SECONDS until LLM_HEDGE_MIN_SAMPLES calls were measured)
+    LLM_HEDGING = Setting(True, _as_bool)
+    LLM_HEDGE_AFTER_SECONDS = Setting(3.0, float)
+    LLM_HEDGE_MIN_SAMPLES = Setting(20, int)
+
+    # Logging: queued writer, rotating JSON log file, payload dumps
+    LOG_LEVEL = Setting("INFO")
+    LOG_FILE = Setting("customer_reference_agent.log")  # empty to log to the console only
+    LOG_ROTATION = Setting("size")  # "size" or "time"
+    LOG_MAX_BYTES = Setting(10 * 1024 * 1024, int)
+    LOG_ROTATE_WHEN = Setting("midnight")
+    LOG_BACKUP_COUNT = Setting(5, int)
+    LOG_CONSOLE_JSON = Setting(False, _as_bool)
+    LOG_RAW_PAYLOADS = Setting(True, _as_bool)  # raw Salesforce responses; turn off in production
+    LOG_PAYLOAD_SAMPLE_RATE = Setting(1.0, float)
+    LOG_PAYLOAD_MAX_ITEMS = Setting(5, int)
+    LOG_PAYLOAD_MAX_CHARS = Setting(2000, int)
+
+    # Prometheus metrics endpoint (0 = off) and the Streamlit sidebar debug panel
+    METRICS_PORT = Setting(0, int)
+    METRICS_HOST = Setting("127.0.0.1")
+    DEBUG_PANEL = Setting(False, _as_bool)
+
     # Default query limits
     DEFAULT_RESULT_LIMIT = 5
     MAX_RESULT_LIMIT = 20
 
+    # Prompt -> criteria cache (set CRITERIA_CACHE_DB to persist across restarts)
+    CRITERIA_CACHE_SIZE = Setting(1024, int)
+    CRITERIA_CACHE_TTL_SECONDS = Setting(24 * 60 * 60, int)
+    CRITERIA_CACHE_DB = Setting(None)
+
+    # Salesforce result cache shared by every session in the process
+    RESULT_CACHE_TTL_SECONDS = Setting(5 * 60, int)
+    RESULT_CACHE_MAX_BYTES = Setting(50 * 1024 * 1024, int)
+    # SQLite file that shares results between processes (e.g. API workers)
+    RESULT_CACHE_DB = Setting(None)
+
+    # Skip the LLM when the rule-based parser explains at least this share of the prompt
+    RULE_PARSER_MIN_CONFIDENCE = Setting(1.0, float)
+
+    # Vocabulary values per list retrieved into the LLM prompt
+    PROMPT_CANDIDATES_PER_LIST = Setting(15, int)
+    # Share of a value's trigrams the prompt must contain (unless it names one of the value's words)
+    PROMPT_CANDIDATE_MIN_SCORE = Setting(0.6, float)
+
+    # Local Usage_statistic__c replica (disabled unless REPLICA_DB_PATH is set)
+    REPLICA_DB_PATH = Setting(None)
+    REPLICA_MAX_STALENESS_SECONDS = Setting(15 * 60, int)
+    REPLICA_FULL_RELOAD_SECONDS = Setting(24 * 60 * 60, int)
+    # Filter an in-memory columnar snapshot of the replica instead of querying SQLite
+    COLUMNAR_SNAPSHOT = Setting(True, _as_bool)
+
+    # Rank matches by relevance instead of returning the first `limit` rows;
+    # Salesforce returns this many candidates (largest invoice volume first)
+    RANKED_RESULTS = Setting(True, _as_bool)
+    RANKING_CANDIDATE_POOL = Setting(200, int)
+
+    # Chat result tables: the newest few render eagerly and stay as DataFrames,
+    # older ones are kept as Arrow tables within a per-session memory budget
+    # and spilled to disk (or dropped when spilling is off) beyond it
+    CHAT_RECENT_TABLES = Setting(3, int)
+    SESSION_RESULTS_MAX_BYTES = Setting(32 * 1024 * 1024, int)
+    SESSION_RESULTS_SPILL = Setting(True, _as_bool)
+
+    # While the LLM parses a prompt, prefetch the rows of a rule-based guess at
+    # its criteria and filter the answer from them when the guess was broader
+    SPECULATIVE_PREFETCH = Setting(False, _as_bool)
+    SPECULATIVE_PREFETCH_POOL = Setting(2000, int)
+
+    # HTTP API (services/api.py): requests each endpoint runs at once per worker
+    # and how many more may wait before it answers 429
+    API_HOST = Setting("127.0.0.1")
+    API_PORT = Setting(8000, int)
+    API_WORKERS = Setting(1, int)
+    API_CRITERIA_CONCURRENCY = Setting(16, int)
+    API_SOQL_CONCURRENCY = Setting(16, int)
+    API_SEARCH_CONCURRENCY = Setting(8, int)
+    API_QUEUE_DEPTH = Setting(32, int)
+    # Serve from the stand-in backends in benchmarks.fakes instead of Azure and Salesforce
+    API_FAKE_BACKENDS = Setting(False, _as_bool)
+    API_FAKE_ROWS = Setting(20_000, int)
+    API_FAKE_LLM_LATENCY = Setting(0.05, float)
+    API_FAKE_SALESFORCE_LATENCY = Setting(0.02, float)
+
+    # Record LLM and Salesforce responses to REPLAY_STORE, or answer from it
+    # offline: REPLAY_MODE is "off", "record" or "replay", and REPLAY_LATENCY
+    # replays with the "original" recorded latency or "zero"
+    REPLAY_MODE = Setting("off")
+    REPLAY_STORE = Setting("replay.db")
+    REPLAY_LATENCY = Setting("original")
+
 settings = Settings()
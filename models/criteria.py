@@ -1,12 +1,22 @@
 #models/criteria.py
 
-from typing import Optional, Dict, Any, Union
+from typing import Optional, Dict, Any, List, Set, Union
 from pydantic import BaseModel, Field, validator, root_validator
 
 class NumericCriteria(BaseModel):
     value: Union[int, float]
     operator: str = ">="
 
+def criteria_values(value: Optional[Union[str, List[str]]]) -> List[str]:
+    """The values of a single- or multi-valued criterion as a list"""
+    if value is None:
+        return []
+    return [value] if isinstance(value, str) else list(value)
+
+def stated_fields(criteria: "CustomerCriteria") -> Set[str]:
+    """Fields the prompt actually specified (set explicitly and not None)"""
+    return {field for field in criteria.__fields_set__ if getattr(criteria, field) is not None}
+
 class CustomerCriteria(BaseModel):
     account_owner_text: Optional[str] = Field(None, description="Account owner")
     customer_name: Optional[str] = Field(None, description="Name of the customer")
@@ -18,9 +28,10 @@ class CustomerCriteria(BaseModel):
     po_touchless_percentage: Optional[Union[float, NumericCriteria]] = Field(None, description="Percentage of touchless POs")
     automatic_distribution: Optional[Union[float, NumericCriteria]] = Field(None, description="Percentage of automatic distribution")
 
-    erp_system: Optional[str] = Field(None, description="ERP system used by the customer")
-    industry: Optional[str] = Field(None, description="Industry of the customer")
-    product_activations: Optional[str] = Field(None, description="Product activations")
+    # A list means any of the values
+    erp_system: Optional[Union[str, List[str]]] = Field(None, description="ERP system used by the customer")
+    industry: Optional[Union[str, List[str]]] = Field(None, description="Industry of the customer")
+    product_activations: Optional[Union[str, List[str]]] = Field(None, description="Product activations")
     account_url_link: Optional[str] = Field(None, description="Account URL link")
 
     limit: Optional[int] = Field(5, description="Number of results to return", gt=0, le=20)
@@ -29,6 +40,12 @@ class CustomerCriteria(BaseModel):
     def lowercase_strings(cls, v):
         if isinstance(v, str):
             return v.lower()
+        if isinstance(v, (list, tuple)):
+            # Sorted and deduplicated so equivalent lists share cache keys and plans
+            values = sorted({item.lower() if isinstance(item, str) else item for item in v if item})
+            if not values:
+                return None
+            return values[0] if len(values) == 1 else values
         return v
     
     @validator('invoice_volume', pre=True)
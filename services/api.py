@@ -0,0 +1,200 @@
+#services/api.py
+
+import argparse
+import asyncio
+import json
+import os
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, Response
+from starlette.routing import Route
+from config.settings import settings
+from models.criteria import CustomerCriteria
+from services.errors import BackendRequestError, BackendUnavailableError, CircuitOpenError
+from services.parser import aparse_criteria
+from services.pipeline import acustomer_reference_agent, run_stage
+from services.query_builder import build_soql_query
+from utils.formatter import projector_for
+from utils.logger import logger, new_request_id, request_id_var
+from utils.metrics import registry
+
+class Overloaded(Exception):
+    """Raised when an endpoint already has as many requests in flight and waiting as it accepts"""
+
+class ConcurrencyLimit:
+    """At most `limit` requests of one endpoint run at once and `queue` more wait.
+
+    Requests beyond that are rejected immediately (429) instead of queuing
+    without bound, so a busy worker pushes back on its callers.
+    """
+
+    def __init__(self, name: str, limit: int, queue: int):
+        self.name = name
+        self.limit = limit
+        self.queue = queue
+        self.in_flight = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._slots = asyncio.Semaphore(limit)
+
+    @asynccontextmanager
+    async def slot(self):
+        if self._slots.locked() and self.waiting >= self.queue:
+            self.rejected += 1
+            raise Overloaded(self.name)
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+
+    def stats(self) -> Dict[str, float]:
+        return {"in_flight": self.in_flight, "waiting": self.waiting, "rejected": self.rejected}
+
+LIMITS = {
+    "criteria": ConcurrencyLimit("criteria", settings.API_CRITERIA_CONCURRENCY, settings.API_QUEUE_DEPTH),
+    "soql": ConcurrencyLimit("soql", settings.API_SOQL_CONCURRENCY, settings.API_QUEUE_DEPTH),
+    "search": ConcurrencyLimit("search", settings.API_SEARCH_CONCURRENCY, settings.API_QUEUE_DEPTH),
+}
+
+def error(status: int, message: str, headers: Optional[Dict[str, str]] = None) -> JSONResponse:
+    return JSONResponse({"error": message, "request_id": request_id_var.get()}, status_code=status, headers=headers)
+
+async def read_prompt(request: Request) -> str:
+    try:
+        body = await request.json()
+    except ValueError:
+        raise ValueError("Request body must be JSON")
+    prompt = body.get("prompt") if isinstance(body, dict) else None
+    if not isinstance(prompt, str) or not prompt.strip():
+        raise ValueError("'prompt' must be a non-empty string")
+    return prompt.strip()
+
+def criteria_json(criteria: CustomerCriteria) -> Dict[str, Any]:
+    # Not criteria.dict(), which renders numeric criteria as "> 10000" for logging
+    return json.loads(criteria.json(exclude_none=True))
+
+async def handle(request: Request, endpoint: str, answer) -> Response:
+    """Run an endpoint handler in its concurrency slot, mapping failures to status codes"""
+    new_request_id()
+    try:
+        prompt = await read_prompt(request)
+    except ValueError as e:
+        return error(400, str(e))
+    try:
+        async with LIMITS[endpoint].slot():
+            body = await answer(prompt)
+    except Overloaded:
+        logger.warning(f"API /{endpoint} overloaded; rejecting request")
+        return error(429, f"Too many /{endpoint} requests in progress", {"Retry-After": "1"})
+    except TimeoutError as e:
+        return error(504, str(e))
+    except CircuitOpenError as e:
+        return error(503, str(e), {"Retry-After": str(int(settings.CIRCUIT_RESET_SECONDS))})
+    except BackendUnavailableError as e:
+        return error(503, str(e))
+    except BackendRequestError as e:
+        return error(502, str(e))
+    except Exception as e:
+        logger.error(f"API /{endpoint} failed: {str(e)}", exc_info=True)
+        return error(500, f"{type(e).__name__}: {e}")
+    return JSONResponse({**body, "request_id": request_id_var.get()})
+
+async def parse(prompt: str) -> CustomerCriteria:
+    return await run_stage("parse_criteria", aparse_criteria(prompt), settings.PARSE_TIMEOUT_SECONDS)
+
+async def criteria_endpoint(request: Request) -> Response:
+    """POST {"prompt"}: the criteria the prompt parses to"""
+    async def answer(prompt: str) -> Dict[str, Any]:
+        return {"criteria": criteria_json(await parse(prompt))}
+    return await handle(request, "criteria", answer)
+
+async def soql_endpoint(request: Request) -> Response:
+    """POST {"prompt"}: the criteria and the SOQL a search would run, without running it"""
+    async def answer(prompt: str) -> Dict[str, Any]:
+        criteria = await parse(prompt)
+        soql_query = build_soql_query(criteria, ranked=settings.RANKED_RESULTS)
+        return {"criteria": criteria_json(criteria), "soql": soql_query}
+    return await handle(request, "soql", answer)
+
+async def search_endpoint(request: Request) -> Response:
+    """POST {"prompt"}: the matching customers as display columns and rows"""
+    async def answer(prompt: str) -> Dict[str, Any]:
+        _, results, soql_query, _ = await acustomer_reference_agent(prompt, text=False)
+        projector = projector_for(results)
+        return {
+            "soql": soql_query,
+            "count": len(results),
+            "columns": projector.labels,
+            "rows": list(projector.rows(results)),
+        }
+    return await handle(request, "search", answer)
+
+async def health(request: Request) -> Response:
+    return JSONResponse({"status": "ok"})
+
+async def metrics(request: Request) -> Response:
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@asynccontextmanager
+async def lifespan(app: Starlette):
+    # Registered here rather than at import: a spawned worker imports this module twice
+    for name, limit in LIMITS.items():
+        registry.gauge_callback(f"reference_agent_api_{name}", f"API /{name} concurrency", limit.stats)
+    if settings.API_FAKE_BACKENDS:
+        # Stand-in LLM and Salesforce (benchmarks.fakes) for local testing
+        from benchmarks.fakes import install_fakes
+        from benchmarks.pipeline import WORKLOAD
+        from benchmarks.synthetic import synthetic_records
+        install_fakes(
+            synthetic_records(settings.API_FAKE_ROWS),
+            responses={prompt.lower(): answer for prompt, answer in WORKLOAD},
+            llm_latency=settings.API_FAKE_LLM_LATENCY,
+            salesforce_latency=settings.API_FAKE_SALESFORCE_LATENCY
+        )
+        logger.info(f"API worker {os.getpid()} using fake LLM and Salesforce backends")
+    yield
+
+app = Starlette(
+    routes=[
+        Route("/criteria", criteria_endpoint, methods=["POST"]),
+        Route("/soql", soql_endpoint, methods=["POST"]),
+        Route("/search", search_endpoint, methods=["POST"]),
+        Route("/healthz", health, methods=["GET"]),
+        Route("/metrics", metrics, methods=["GET"]),
+    ],
+    lifespan=lifespan
+)
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the reference agent as an HTTP API")
+    parser.add_argument("--host", default=settings.API_HOST)
+    parser.add_argument("--port", type=int, default=settings.API_PORT)
+    parser.add_argument("--workers", type=int, default=settings.API_WORKERS, help="Worker processes")
+    parser.add_argument("--cache-dir", help="Share the criteria and result caches between worker processes through SQLite files here")
+    parser.add_argument("--fake", action="store_true", help="Use stand-in LLM and Salesforce backends")
+    args = parser.parse_args()
+
+    # Workers are separate processes that read their settings from the environment
+    if args.cache_dir:
+        os.makedirs(args.cache_dir, exist_ok=True)
+        os.environ["CRITERIA_CACHE_DB"] = os.path.join(args.cache_dir, "criteria_cache.db")
+        os.environ["RESULT_CACHE_DB"] = os.path.join(args.cache_dir, "result_cache.db")
+    elif args.workers > 1 and not (settings.CRITERIA_CACHE_DB and settings.RESULT_CACHE_DB):
+        logger.warning("Workers will not share caches; set --cache-dir or CRITERIA_CACHE_DB and RESULT_CACHE_DB")
+    if args.fake:
+        os.environ["API_FAKE_BACKENDS"] = "1"
+
+    import uvicorn
+    uvicorn.run("services.api:app", host=args.host, port=args.port, workers=args.workers)
+
+if __name__ == "__main__":
+    main()
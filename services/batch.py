@@ -0,0 +1,108 @@
+#services/batch.py
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import time
+from typing import Dict, Iterator, List, Set, TextIO
+from services.clients import clients
+from services.pipeline import acustomer_reference_agent
+from utils.logger import logger
+from utils.metrics import start_metrics_server
+
+def read_prompts(path: str, prompt_field: str = "prompt", id_field: str = "id") -> Iterator[Dict[str, str]]:
+    """Yield {"id", "prompt"} items from a CSV or JSONL file.
+
+    Items without an id column are numbered by their position in the file, so
+    re-reading the same file yields the same ids for the checkpoint.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.lower().endswith((".jsonl", ".ndjson")):
+            rows = (json.loads(line) for line in f if line.strip())
+        else:
+            rows = csv.DictReader(f)
+        for position, row in enumerate(rows, start=1):
+            prompt = (row.get(prompt_field) or "").strip()
+            if not prompt:
+                logger.warning(f"Skipping row {position}: no '{prompt_field}' value")
+                continue
+            yield {"id": str(row.get(id_field) or position), "prompt": prompt}
+
+def load_checkpoint(path: str) -> Set[str]:
+    """Ids of the prompts a previous run finished"""
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8") as f:
+        return {line.rstrip("\n") for line in f if line.strip()}
+
+async def run_one(item: Dict[str, str]) -> Dict:
+    started = time.perf_counter()
+    try:
+        _, results, soql_query, message_type = await acustomer_reference_agent(item["prompt"], text=False)
+        outcome = {"status": "ok", "soql": soql_query, "message_type": message_type, "results": results}
+    except Exception as e:
+        logger.error(f"Batch prompt {item['id']} failed: {str(e)}")
+        outcome = {"status": "error", "error": f"{type(e).__name__}: {e}"}
+    return {**item, **outcome, "elapsed_seconds": round(time.perf_counter() - started, 3)}
+
+async def run_batch(items: List[Dict[str, str]], output: TextIO, checkpoint: TextIO, concurrency: int) -> Dict[str, int]:
+    """Run the prompts with at most `concurrency` in flight, appending each result as it finishes.
+
+    A result line is flushed to the output before its id goes into the
+    checkpoint, so a killed run never checkpoints a prompt whose result was
+    lost. Failed prompts are written but not checkpointed and are retried on
+    the next run.
+    """
+    slots = asyncio.Semaphore(concurrency)
+    counts = {"ok": 0, "error": 0}
+
+    async def bounded(item: Dict[str, str]) -> Dict:
+        async with slots:
+            return await run_one(item)
+
+    for finished in asyncio.as_completed([bounded(item) for item in items]):
+        record = await finished
+        output.write(json.dumps(record, default=str) + "\n")
+        output.flush()
+        if record["status"] == "ok":
+            checkpoint.write(record["id"] + "\n")
+            checkpoint.flush()
+        counts[record["status"]] += 1
+        logger.info(f"Batch progress: {sum(counts.values())}/{len(items)} ({counts['error']} failed)")
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description="Run reference prompts from a CSV or JSONL file")
+    parser.add_argument("input", help="CSV or JSONL file with a prompt column (and optionally an id)")
+    parser.add_argument("output", help="JSONL file the results are appended to")
+    parser.add_argument("--checkpoint", help="Finished ids (default: OUTPUT.checkpoint)")
+    parser.add_argument("--prompt-field", default="prompt")
+    parser.add_argument("--id-field", default="id")
+    parser.add_argument("--concurrency", type=int, default=8, help="Prompts in flight at once")
+    parser.add_argument("--llm-rate", type=float, help="LLM calls per second (default: LLM_RATE_LIMIT_PER_SECOND)")
+    parser.add_argument("--salesforce-rate", type=float,
+                        help="Salesforce calls per second (default: SALESFORCE_RATE_LIMIT_PER_SECOND)")
+    parser.add_argument("--metrics-port", type=int, help="Serve Prometheus metrics on this port while running")
+    args = parser.parse_args()
+
+    if args.metrics_port:
+        start_metrics_server(args.metrics_port)
+    if args.llm_rate is not None:
+        clients.llm_rate.rate = args.llm_rate
+    if args.salesforce_rate is not None:
+        clients.salesforce_rate.rate = args.salesforce_rate
+
+    checkpoint_path = args.checkpoint or f"{args.output}.checkpoint"
+    done = load_checkpoint(checkpoint_path)
+    items = [item for item in read_prompts(args.input, args.prompt_field, args.id_field) if item["id"] not in done]
+    logger.info(f"Batch: {len(items)} prompts to run, {len(done)} already finished")
+
+    started = time.time()
+    with open(args.output, "a", encoding="utf-8") as output, open(checkpoint_path, "a", encoding="utf-8") as checkpoint:
+        counts = asyncio.run(run_batch(items, output, checkpoint, args.concurrency))
+    print(f"{counts['ok']} succeeded, {counts['error']} failed in {time.time() - started:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+#services/cache.py
+
+import json
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from models.criteria import CustomerCriteria
+from config.settings import settings
+from utils.logger import logger
+from utils.metrics import registry
+
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_prompt(prompt: str) -> str:
+    """Normalize a prompt so trivially different phrasings share a cache key"""
+    normalized = unicodedata.normalize("NFKC", prompt).casefold()
+    normalized = _WHITESPACE.sub(" ", normalized)
+    return normalized.strip(" .!?")
+
+def criteria_key(criteria: CustomerCriteria) -> str:
+    """Canonical cache key for criteria: unset fields dropped, keys sorted, numbers as floats"""
+    def canonical(value: Any) -> Any:
+        if isinstance(value, dict):
+            return {k: canonical(v) for k, v in value.items() if v is not None}
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return float(value)
+        return value
+    return json.dumps(canonical(json.loads(criteria.json())), sort_keys=True, separators=(",", ":"))
+
+def soql_key(soql_query: str) -> str:
+    """Cache key for a raw SOQL string, insensitive to whitespace"""
+    return _WHITESPACE.sub(" ", soql_query).strip()
+
+def _connect_shared(db_path: str) -> sqlite3.Connection:
+    """SQLite connection that several worker processes can read and write at once"""
+    db = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+    db.execute("PRAGMA journal_mode=WAL")
+    return db
+
+class CriteriaCache:
+    """LRU + TTL cache of parsed CustomerCriteria keyed on the normalized prompt.
+
+    Entries live in memory; when db_path is given they are also written to a
+    SQLite table so the cache survives Streamlit restarts.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: float = 86400, db_path: Optional[str] = None):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._db = None
+        if db_path:
+            self._db = _connect_shared(db_path)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS criteria_cache ("
+                "key TEXT PRIMARY KEY, payload TEXT NOT NULL, "
+                "created_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._db.commit()
+            logger.info(f"Criteria cache persisted to '{db_path}'")
+
+    def _is_expired(self, created_at: float, now: float) -> bool:
+        return now - created_at > self.ttl_seconds
+
+    def _load_from_db(self, key: str, now: float) -> Optional[Tuple[float, str]]:
+        row = self._db.execute(
+            "SELECT created_at, payload FROM criteria_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if self._is_expired(row[0], now):
+            self._db.execute("DELETE FROM criteria_cache WHERE key = ?", (key,))
+            self._db.commit()
+            return None
+        self._db.execute("UPDATE criteria_cache SET last_access = ? WHERE key = ?", (now, key))
+        self._db.commit()
+        return row[0], row[1]
+
+    def _remember(self, key: str, entry: Tuple[float, str]):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def get(self, prompt: str) -> Optional[CustomerCriteria]:
+        """Return cached criteria for the prompt, or None on a miss"""
+        key = normalize_prompt(prompt)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._is_expired(entry[0], now):
+                del self._entries[key]
+                entry = None
+            if entry is None and self._db is not None:
+                entry = self._load_from_db(key, now)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._remember(key, entry)
+            self.hits += 1
+        return CustomerCriteria.parse_raw(entry[1])
+
+    def set(self, prompt: str, criteria: CustomerCriteria):
+        """Store the criteria parsed for the prompt"""
+        key = normalize_prompt(prompt)
+        now = time.time()
+        # Only explicitly set fields, so the copy keeps __fields_set__ (see stated_fields)
+        payload = criteria.json(exclude_unset=True)
+        with self._lock:
+            self._remember(key, (now, payload))
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO criteria_cache (key, payload, created_at, last_access) "
+                    "VALUES (?, ?, ?, ?)",
+                    (key, payload, now, now)
+                )
+                self._db.execute("DELETE FROM criteria_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+                self._db.execute(
+                    "DELETE FROM criteria_cache WHERE key NOT IN "
+                    "(SELECT key FROM criteria_cache ORDER BY last_access DESC LIMIT ?)",
+                    (self.max_size,)
+                )
+                self._db.commit()
+
+    def clear(self):
+        """Drop every cached entry, including persisted ones"""
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM criteria_cache")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, float]:
+        """Return hit/miss counters for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._entries),
+            }
+
+class _Flight:
+    """A query in progress that concurrent identical callers wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Optional[List[Dict]] = None
+        self.error: Optional[BaseException] = None
+
+# Expired rows and the byte budget of a shared result table are enforced at
+# most this often per process, not on every store
+SHARED_PRUNE_INTERVAL_SECONDS = 30
+
+class ResultCache:
+    """Process-wide TTL cache of query results with a memory budget.
+
+    Concurrent misses for the same key are collapsed into a single call to the
+    loader (single-flight); the other callers wait for its result. When db_path
+    is given, results are also written to a SQLite table, so API worker
+    processes answer from each other's queries. SQLite is only read and written
+    outside the process-wide lock, through one connection per thread, so a
+    write held up by another worker never stalls in-memory hits.
+    """
+
+    def __init__(self, ttl_seconds: float = 300, max_bytes: int = 50 * 1024 * 1024,
+                 db_path: Optional[str] = None):
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.total_bytes = 0
+        self._entries: "OrderedDict[str, Tuple[float, int, List[Dict]]]" = OrderedDict()
+        self._inflight: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self._db_path = db_path
+        self._local = threading.local()
+        self._last_prune = 0.0
+        if db_path:
+            db = self._connection()
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS result_cache ("
+                "key TEXT PRIMARY KEY, payload TEXT NOT NULL, "
+                "size INTEGER NOT NULL, created_at REAL NOT NULL)"
+            )
+            db.commit()
+            logger.info(f"Result cache shared through '{db_path}'")
+
+    def _connection(self) -> sqlite3.Connection:
+        """This thread's connection to the shared table"""
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = self._local.db = _connect_shared(self._db_path)
+        return db
+
+    def _lookup(self, key: str, now: float) -> Optional[List[Dict]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        created_at, size, records = entry
+        if now - created_at > self.ttl_seconds:
+            del self._entries[key]
+            self.total_bytes -= size
+            return None
+        self._entries.move_to_end(key)
+        return records
+
+    def _load_shared(self, key: str) -> Optional[List[Dict]]:
+        """Records another worker stored for key, also kept in memory; call without the lock"""
+        if self._db_path is None:
+            return None
+        row = self._connection().execute(
+            "SELECT created_at, size, payload FROM result_cache WHERE key = ? AND created_at >= ?",
+            (key, time.time() - self.ttl_seconds)
+        ).fetchone()
+        if row is None:
+            return None
+        created_at, size, payload = row
+        records = json.loads(payload)
+        with self._lock:
+            self._remember(key, (created_at, size, records))
+        return records
+
+    def _remember(self, key: str, entry: Tuple[float, int, List[Dict]]):
+        if key in self._entries:
+            self.total_bytes -= self._entries.pop(key)[1]
+        self._entries[key] = entry
+        self.total_bytes += entry[1]
+        while self.total_bytes > self.max_bytes:
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self.total_bytes -= evicted_size
+
+    def _store(self, key: str, records: List[Dict], payload: str):
+        """Keep the records in memory and, when shared, in SQLite; call without the lock"""
+        size = len(payload)
+        if self.ttl_seconds <= 0 or size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            self._remember(key, (now, size, records))
+        if self._db_path is None:
+            return
+        db = self._connection()
+        db.execute(
+            "INSERT OR REPLACE INTO result_cache (key, payload, size, created_at) VALUES (?, ?, ?, ?)",
+            (key, payload, size, now)
+        )
+        db.commit()
+        if now - self._last_prune >= SHARED_PRUNE_INTERVAL_SECONDS:
+            self._last_prune = now
+            db.execute("DELETE FROM result_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+            # Same byte budget as memory, newest entries kept
+            db.execute(
+                "DELETE FROM result_cache WHERE key IN (SELECT key FROM ("
+                "SELECT key, SUM(size) OVER (ORDER BY created_at DESC) AS running FROM result_cache"
+                ") WHERE running > ?)",
+                (self.max_bytes,)
+            )
+            db.commit()
+
+    def get_or_load(self, key: str, loader: Callable[[], List[Dict]]) -> List[Dict]:
+        """Return cached records for key, calling loader at most once per key at a time"""
+        with self._lock:
+            records = self._lookup(key, time.time())
+            if records is not None:
+                self.hits += 1
+                return list(records)
+            flight = self._inflight.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                flight = self._inflight[key] = _Flight()
+                leader = True
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return list(flight.result)
+
+        try:
+            records = self._load_shared(key)
+            if records is not None:
+                with self._lock:
+                    self.hits += 1
+            else:
+                with self._lock:
+                    self.misses += 1
+                records = loader()
+                # Approximate footprint of the records, measured outside the lock
+                self._store(key, records, json.dumps(records, default=str))
+            flight.result = records
+            return list(records)
+        except BaseException as e:
+            # Failures are shared with the waiters but never cached
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            flight.done.set()
+
+    def get(self, key: str) -> Optional[List[Dict]]:
+        """Cached records for key, or None (counted as a miss) without loading"""
+        with self._lock:
+            records = self._lookup(key, time.time())
+            if records is not None:
+                self.hits += 1
+                return list(records)
+        records = self._load_shared(key)
+        with self._lock:
+            if records is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return list(records)
+
+    def set(self, key: str, records: List[Dict]):
+        self._store(key, records, json.dumps(records, default=str))
+
+    def clear(self):
+        """Drop every cached entry, including shared ones"""
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+        if self._db_path is not None:
+            db = self._connection()
+            db.execute("DELETE FROM result_cache")
+            db.commit()
+
+    def stats(self) -> Dict[str, float]:
+        """Return hit/miss/coalesced counters for tuning the TTL"""
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+                "size": len(self._entries),
+                "bytes": self.total_bytes,
+            }
+
+criteria_cache = CriteriaCache(
+    max_size=settings.CRITERIA_CACHE_SIZE,
+    ttl_seconds=settings.CRITERIA_CACHE_TTL_SECONDS,
+    db_path=settings.CRITERIA_CACHE_DB
+)
+
+result_cache = ResultCache(
+    ttl_seconds=settings.RESULT_CACHE_TTL_SECONDS,
+    max_bytes=settings.RESULT_CACHE_MAX_BYTES,
+    db_path=settings.RESULT_CACHE_DB
+)
+
+registry.gauge_callback("reference_agent_criteria_cache", "Criteria cache counters", criteria_cache.stats)
+registry.gauge_callback("reference_agent_result_cache", "Result cache counters", result_cache.stats)
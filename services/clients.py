@@ -0,0 +1,202 @@
+#services/clients.py
+
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Callable, Dict, TypeVar
+from config.settings import settings
+from utils.logger import logger
+
+T = TypeVar("T")
+
+class RateLimiter:
+    """Spaces calls at least 1/rate seconds apart across threads; rate <= 0 disables it.
+
+    reserve() books the next free slot and returns how long the caller must
+    wait for it, so sync code can sleep and async code can await the delay.
+    """
+
+    def __init__(self, rate: float = 0):
+        self.rate = rate
+        self._next_free = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_free)
+            self._next_free = slot + 1 / self.rate
+            return slot - now
+
+    def wait(self):
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def await_slot(self):
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+class ClientManager:
+    """Lazily created Salesforce and Azure OpenAI clients shared by every session.
+
+    Nothing connects at import time: clients are built on first use behind a
+    lock, reuse pooled keep-alive HTTP connections, and a Salesforce session
+    that expires is replaced transparently. Semaphores cap the number of
+    concurrent calls to each backend, and rate limiters space them out.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._salesforce_tool = None
+        self._llm = None
+        self._salesforce_slots = threading.BoundedSemaphore(settings.SALESFORCE_MAX_CONCURRENCY)
+        self._llm_slots = threading.BoundedSemaphore(settings.LLM_MAX_CONCURRENCY)
+        self.salesforce_rate = RateLimiter(settings.SALESFORCE_RATE_LIMIT_PER_SECOND)
+        self.llm_rate = RateLimiter(settings.LLM_RATE_LIMIT_PER_SECOND)
+
+    def _connect_salesforce(self):
+        import requests
+        from requests.adapters import HTTPAdapter
+        from simple_salesforce import Salesforce
+        from langchain_salesforce import SalesforceTool
+
+        class TimeoutHTTPAdapter(HTTPAdapter):
+            # simple_salesforce passes no timeout, so every request gets the per-call deadline
+            def send(self, request, **kwargs):
+                if kwargs.get("timeout") is None:
+                    kwargs["timeout"] = settings.SALESFORCE_REQUEST_TIMEOUT_SECONDS
+                return super().send(request, **kwargs)
+
+        session = requests.Session()
+        adapter = TimeoutHTTPAdapter(pool_connections=1, pool_maxsize=settings.HTTP_POOL_SIZE)
+        session.mount("https://", adapter)
+        client = Salesforce(
+            username=settings.SALESFORCE_USERNAME,
+            password=settings.SALESFORCE_PASSWORD,
+            security_token=settings.SALESFORCE_SECURITY_TOKEN,
+            domain=settings.SALESFORCE_DOMAIN,
+            session=session
+        )
+        logger.info(f"Logged in to Salesforce instance {client.sf_instance}")
+        return SalesforceTool(
+            username=settings.SALESFORCE_USERNAME,
+            password=settings.SALESFORCE_PASSWORD,
+            security_token=settings.SALESFORCE_SECURITY_TOKEN,
+            domain=settings.SALESFORCE_DOMAIN,
+            salesforce_client=client
+        )
+
+    def get_salesforce_tool(self):
+        """Return the shared SalesforceTool, logging in on first use"""
+        if self._salesforce_tool is None:
+            with self._lock:
+                if self._salesforce_tool is None:
+                    self._salesforce_tool = self._connect_salesforce()
+        return self._salesforce_tool
+
+    def set_salesforce_tool(self, tool):
+        """Use the given SalesforceTool instead of logging in (benchmarks, offline runs)"""
+        with self._lock:
+            self._salesforce_tool = tool
+
+    def get_salesforce_client(self):
+        """Return the underlying simple_salesforce client (queryMore, Bulk API)"""
+        return self.get_salesforce_tool()._sf
+
+    def refresh_salesforce(self, stale_tool=None):
+        """Log in again, unless another thread already replaced stale_tool"""
+        with self._lock:
+            if stale_tool is None or self._salesforce_tool is stale_tool:
+                logger.info("Refreshing Salesforce session")
+                self._salesforce_tool = self._connect_salesforce()
+        return self._salesforce_tool
+
+    def call_salesforce(self, operation: Callable[[Any], T]) -> T:
+        """Call operation(simple_salesforce client) in a concurrency slot, re-authenticating once if the session expired"""
+        from simple_salesforce import SalesforceExpiredSession
+
+        with self._salesforce_slots:
+            self.salesforce_rate.wait()
+            tool = self.get_salesforce_tool()
+            try:
+                return operation(tool._sf)
+            except SalesforceExpiredSession:
+                return operation(self.refresh_salesforce(tool)._sf)
+
+    def run_salesforce(self, payload: Dict[str, Any]) -> Any:
+        """Run a SalesforceTool operation, re-authenticating once if the session expired"""
+        from simple_salesforce import SalesforceExpiredSession
+
+        with self._salesforce_slots:
+            self.salesforce_rate.wait()
+            tool = self.get_salesforce_tool()
+            try:
+                return tool.run(payload)
+            except SalesforceExpiredSession:
+                return self.refresh_salesforce(tool).run(payload)
+
+    def _create_llm(self):
+        import httpx
+        from langchain_openai import AzureChatOpenAI
+
+        http_client = httpx.Client(
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_POOL_SIZE,
+                max_keepalive_connections=settings.HTTP_POOL_SIZE
+            ),
+            timeout=settings.LLM_REQUEST_TIMEOUT_SECONDS
+        )
+        return AzureChatOpenAI(
+            api_key=settings.AZURE_OPENAI_API_KEY,
+            api_version=settings.AZURE_OPENAI_API_VERSION,
+            azure_endpoint=settings.AZURE_OPENAI_ENDPOINT,
+            deployment_name=settings.AZURE_OPENAI_DEPLOYMENT,
+            temperature=0,
+            timeout=settings.LLM_REQUEST_TIMEOUT_SECONDS,
+            # Retries are done by services.resilience, which also hedges and breaks the circuit
+            max_retries=0,
+            http_client=http_client
+        )
+
+    def get_llm(self):
+        """Return the shared AzureChatOpenAI client, creating it on first use"""
+        if self._llm is None:
+            with self._lock:
+                if self._llm is None:
+                    self._llm = self._create_llm()
+        return self._llm
+
+    def set_llm(self, llm):
+        """Use the given chat model instead of Azure OpenAI (benchmarks, offline runs)"""
+        with self._lock:
+            self._llm = llm
+
+    @contextmanager
+    def llm_slot(self):
+        """Hold one of the LLM concurrency slots"""
+        with self._llm_slots:
+            self.llm_rate.wait()
+            yield
+
+    @asynccontextmanager
+    async def allm_slot(self):
+        """Async llm_slot; waits for a slot without blocking the event loop"""
+        acquire = asyncio.ensure_future(asyncio.to_thread(self._llm_slots.acquire))
+        try:
+            await asyncio.shield(acquire)
+        except asyncio.CancelledError:
+            # The worker thread may still get the slot; hand it back when it does
+            acquire.add_done_callback(lambda done: done.cancelled() or self._llm_slots.release())
+            raise
+        try:
+            await self.llm_rate.await_slot()
+            yield
+        finally:
+            self._llm_slots.release()
+
+clients = ClientManager()
@@ -0,0 +1,193 @@
+#services/columnar.py
+
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+from config.field_mapping import FIELD_MAPPING
+from models.criteria import CustomerCriteria, NumericCriteria, criteria_values
+from utils.formatter import compile_accessor
+from utils.logger import logger
+
+NUMERIC_FIELDS = [
+    "invoice_volume", "po_percentage", "non_po_percentage",
+    "po_touchless_percentage", "automatic_distribution"
+]
+MULTI_SELECT_FIELDS = ["erp_system", "product_activations"]
+# Criteria attribute -> FIELD_MAPPING key for the LIKE '%value%' filters
+LIKE_FIELDS = {
+    "account_owner_text": "account_owner",
+    "customer_name": "customer_name",
+    "industry": "industry",
+}
+
+# LIKE masks kept per text column for repeated searches
+MASK_CACHE_SIZE = 64
+
+COMPARISONS = {
+    "=": np.equal,
+    # NaN != value holds, so rows without a value match, as with SOQL !=
+    "!=": np.not_equal,
+    "<": np.less,
+    "<=": np.less_equal,
+    ">": np.greater,
+    ">=": np.greater_equal,
+}
+
+def _column(records: List[Dict], field: str) -> list:
+    get = compile_accessor(FIELD_MAPPING[field], default=None)
+    return [get(record) for record in records]
+
+class TextColumn:
+    """Dictionary-encoded text column; LIKE runs once per distinct value"""
+
+    def __init__(self, values: List[Optional[str]]):
+        lowered = pd.Series(values, dtype=object).str.lower()
+        codes, uniques = pd.factorize(lowered)
+        self.codes = codes
+        self.uniques = np.asarray(uniques, dtype=str)
+        self._masks: "OrderedDict[str, np.ndarray]" = OrderedDict()
+
+    def equals(self, value: str) -> np.ndarray:
+        # Code -1 (null) indexes the trailing False
+        return np.append(self.uniques == value.lower(), False)[self.codes]
+
+    def isin(self, values: List[str]) -> np.ndarray:
+        """IN semantics: case-insensitive equality with any of the values"""
+        wanted = np.isin(self.uniques, [value.lower() for value in values])
+        return np.append(wanted, False)[self.codes]
+
+    def contains(self, needle: str) -> np.ndarray:
+        needle = needle.lower()
+        mask = self._masks.get(needle)
+        if mask is None:
+            matches = np.char.find(self.uniques, needle) >= 0
+            mask = np.append(matches, False)[self.codes]
+            self._masks[needle] = mask
+            if len(self._masks) > MASK_CACHE_SIZE:
+                self._masks.popitem(last=False)
+        return mask
+
+class MultiSelectColumn:
+    """Multi-select picklist stored as one bitset row per record"""
+
+    def __init__(self, values: List[Optional[str]]):
+        self.vocabulary: Dict[str, int] = {}
+        parsed = []
+        for value in values:
+            items = [item.strip().lower() for item in value.split(";")] if value else []
+            parsed.append([self.vocabulary.setdefault(item, len(self.vocabulary)) for item in items if item])
+        # Word-major layout: each 64-value word is a contiguous array over the rows
+        words = max(1, (len(self.vocabulary) + 63) // 64)
+        self.bits = np.zeros((words, len(values)), dtype=np.uint64)
+        for row, positions in enumerate(parsed):
+            for position in positions:
+                self.bits[position // 64, row] |= np.uint64(1 << (position % 64))
+
+    def includes(self, *needles: str) -> np.ndarray:
+        """INCLUDES semantics: the row has at least one of the values selected"""
+        query: Dict[int, int] = {}
+        for needle in needles:
+            position = self.vocabulary.get(needle.lower())
+            if position is not None:
+                query[position // 64] = query.get(position // 64, 0) | (1 << (position % 64))
+        mask = np.zeros(self.bits.shape[1], dtype=bool)
+        for word, bits in query.items():
+            mask |= (self.bits[word] & np.uint64(bits)) != 0
+        return mask
+
+class CustomerSnapshot:
+    """In-memory columnar copy of the customer records.
+
+    evaluate() applies a CustomerCriteria with the same semantics as the SOQL
+    from build_soql_query: case-insensitive LIKE '%value%' (IN for a list),
+    INCLUDES on the multi-select picklists, numeric comparisons that never
+    match nulls, the Type = 'Customer' filter and LIMIT.
+    """
+
+    def __init__(self, records: List[Dict], prefiltered: bool = False):
+        """prefiltered=True skips the Type = 'Customer' filter for records that
+        already passed it, such as a previous result without that field"""
+        self.records = records
+        self.size = len(records)
+        self.numeric = {
+            field: np.array(
+                _column(records, field), dtype=float
+            )
+            for field in NUMERIC_FIELDS
+        }
+        self.text = {
+            field: TextColumn(_column(records, field))
+            for field in LIKE_FIELDS.values()
+        }
+        self.multi_select = {
+            field: MultiSelectColumn(_column(records, field))
+            for field in MULTI_SELECT_FIELDS
+        }
+        if prefiltered:
+            self.base_mask = np.ones(self.size, dtype=bool)
+        else:
+            customer_type = TextColumn(
+                _column(records, "customer_type")
+            )
+            self.base_mask = customer_type.equals("Customer")
+
+    def mask(self, criteria: CustomerCriteria) -> np.ndarray:
+        """Boolean mask of the rows matching the criteria, ignoring the limit"""
+        mask = self.base_mask.copy()
+        for attr_name, field in LIKE_FIELDS.items():
+            value = getattr(criteria, attr_name)
+            if isinstance(value, list):
+                mask &= self.text[field].isin(value)
+            elif value is not None:
+                mask &= self.text[field].contains(value)
+        for field in MULTI_SELECT_FIELDS:
+            values = criteria_values(getattr(criteria, field))
+            if values:
+                mask &= self.multi_select[field].includes(*values)
+        for field in NUMERIC_FIELDS:
+            attr_value = getattr(criteria, field)
+            if attr_value is None:
+                continue
+            if isinstance(attr_value, NumericCriteria):
+                value, operator = attr_value.value, attr_value.operator
+            else:
+                value, operator = attr_value, ">="
+            if operator not in COMPARISONS:
+                raise ValueError(f"Unsupported operator '{operator}' for {field}")
+            mask &= COMPARISONS[operator](self.numeric[field], value)
+        return mask
+
+    def evaluate(self, criteria: CustomerCriteria) -> np.ndarray:
+        """Row positions of the first `limit` matches"""
+        return np.flatnonzero(self.mask(criteria))[:criteria.limit]
+
+    def query(self, criteria: CustomerCriteria) -> List[Dict]:
+        return [self.records[i] for i in self.evaluate(criteria)]
+
+    def candidates(self, criteria: CustomerCriteria, pool: int) -> List[Dict]:
+        """Up to `pool` matches with the largest invoice volume, like the ranked SOQL"""
+        positions = np.flatnonzero(self.mask(criteria))
+        if len(positions) > pool:
+            # Nulls sort last, as with DESC NULLS LAST
+            volume = np.nan_to_num(self.numeric["invoice_volume"][positions], nan=-np.inf)
+            keep = np.argpartition(-volume, pool - 1)[:pool]
+            positions = positions[np.sort(keep)]
+        return [self.records[i] for i in positions]
+
+_snapshot: Optional[CustomerSnapshot] = None
+_snapshot_version: Optional[float] = None
+_snapshot_lock = threading.Lock()
+
+def get_snapshot(replica) -> CustomerSnapshot:
+    """Return a snapshot of the replica, rebuilding it after each sync"""
+    global _snapshot, _snapshot_version
+    version = replica.last_sync_at()
+    with _snapshot_lock:
+        if _snapshot is None or _snapshot_version != version:
+            records = replica.records()
+            _snapshot = CustomerSnapshot(records)
+            _snapshot_version = version
+            logger.info(f"Built columnar snapshot of {len(records)} records")
+        return _snapshot
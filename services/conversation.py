@@ -0,0 +1,123 @@
+#services/conversation.py
+
+import threading
+from typing import Dict, List, Optional, Tuple
+from models.criteria import CustomerCriteria, NumericCriteria, criteria_values, stated_fields
+from utils.logger import logger
+
+NUMERIC_FIELDS = [
+    "invoice_volume", "po_percentage", "non_po_percentage",
+    "po_touchless_percentage", "automatic_distribution"
+]
+MULTI_SELECT_FIELDS = ["erp_system", "product_activations"]
+TEXT_FIELDS = ["account_owner_text", "customer_name", "industry"]
+# Fields that do not filter rows
+NON_FILTER_FIELDS = {"limit", "account_url_link"}
+
+# (low, low inclusive, high, high inclusive)
+Interval = Tuple[float, bool, float, bool]
+
+def _interval(criterion: NumericCriteria) -> Interval:
+    value, operator = criterion.value, criterion.operator
+    if operator == "=":
+        return value, True, value, True
+    if operator in (">", ">="):
+        return value, operator == ">=", float("inf"), False
+    if operator in ("<", "<="):
+        return float("-inf"), False, value, operator == "<="
+    # "!=" and anything unknown: only an identical criterion is known to be narrower
+    raise ValueError(operator)
+
+def _numeric_narrower(new: NumericCriteria, old: NumericCriteria) -> bool:
+    if (new.value, new.operator) == (old.value, old.operator):
+        return True
+    try:
+        new_low, new_low_in, new_high, new_high_in = _interval(new)
+        old_low, old_low_in, old_high, old_high_in = _interval(old)
+    except ValueError:
+        return False
+    low_ok = new_low > old_low or (new_low == old_low and (old_low_in or not new_low_in))
+    high_ok = new_high < old_high or (new_high == old_high and (old_high_in or not new_high_in))
+    return low_ok and high_ok
+
+def _text_narrower(new, old) -> bool:
+    """A single value means LIKE '%value%', a list means IN (...)"""
+    if isinstance(old, list):
+        return isinstance(new, list) and set(new) <= set(old)
+    # Every value containing the new substring (or equal to a listed value) contains the old one
+    return all(old.lower() in value.lower() for value in criteria_values(new))
+
+def is_narrower(new: CustomerCriteria, old: CustomerCriteria) -> bool:
+    """Whether every row matching `new` also matches `old`"""
+    new_fields, old_fields = stated_fields(new), stated_fields(old)
+    for field in old_fields - NON_FILTER_FIELDS:
+        if field not in new_fields:
+            return False
+        new_value, old_value = getattr(new, field), getattr(old, field)
+        if field in NUMERIC_FIELDS:
+            if not _numeric_narrower(new_value, old_value):
+                return False
+        elif field in MULTI_SELECT_FIELDS:
+            # INCLUDES any of the values: fewer values is narrower
+            if not set(criteria_values(new_value)) <= set(criteria_values(old_value)):
+                return False
+        elif field in TEXT_FIELDS:
+            if not _text_narrower(new_value, old_value):
+                return False
+        elif new_value != old_value:
+            return False
+    return True
+
+def filter_candidates(candidates: List[Dict], criteria: CustomerCriteria) -> List[Dict]:
+    """The rows of an earlier, broader fetch that match the criteria"""
+    if not candidates:
+        return []
+    # numpy/pandas are only loaded once rows are actually filtered locally
+    from services.columnar import CustomerSnapshot
+    snapshot = CustomerSnapshot(candidates, prefiltered=True)
+    return [candidates[i] for i in snapshot.mask(criteria).nonzero()[0]]
+
+class ConversationState:
+    """The last criteria and fetched rows of one chat session.
+
+    A follow-up such as "only the ones on SAP" is parsed as a delta and merged
+    into the previous criteria. When the merged criteria are narrower and the
+    previous fetch was complete (every matching row, not a truncated page),
+    the answer is filtered from the kept rows without calling Salesforce.
+    """
+
+    def __init__(self):
+        self.criteria: Optional[CustomerCriteria] = None
+        self.candidates: List[Dict] = []
+        self.complete = False
+        self._lock = threading.Lock()
+
+    def merge(self, delta: CustomerCriteria) -> CustomerCriteria:
+        """Previous criteria with the fields the refinement states replaced"""
+        with self._lock:
+            previous = self.criteria
+        if previous is None:
+            return delta
+        updates = {field: getattr(delta, field) for field in stated_fields(delta)}
+        merged = previous.copy(update=updates)
+        logger.info(f"Refined criteria with {sorted(updates)}: {merged}")
+        return merged
+
+    def local_candidates(self, criteria: CustomerCriteria) -> Optional[List[Dict]]:
+        """Rows matching the criteria filtered from the previous result, or None"""
+        with self._lock:
+            previous, candidates, complete = self.criteria, self.candidates, self.complete
+        if previous is None or not complete or not is_narrower(criteria, previous):
+            return None
+        filtered = filter_candidates(candidates, criteria)
+        logger.info(f"Refinement answered locally: {len(filtered)} of {len(candidates)} previous rows")
+        return filtered
+
+    def remember(self, criteria: CustomerCriteria, candidates: List[Dict], complete: bool):
+        with self._lock:
+            self.criteria = criteria
+            self.candidates = candidates
+            self.complete = complete
+
+    def clear(self):
+        self.remember(None, [], False)
@@ -0,0 +1,26 @@
+#services/errors.py
+
+from typing import Optional
+
+class BackendError(Exception):
+    """A call to the LLM or Salesforce failed; `backend` names which"""
+
+    def __init__(self, backend: str, message: str):
+        super().__init__(f"{backend}: {message}")
+        self.backend = backend
+
+class BackendTimeoutError(BackendError, TimeoutError):
+    """The backend did not answer within the per-call deadline"""
+
+class BackendUnavailableError(BackendError):
+    """The backend is failing (connection errors, 429 or 5xx) and retries did not help"""
+
+class CircuitOpenError(BackendUnavailableError):
+    """Calls fail fast because the backend failed repeatedly in a row"""
+
+class BackendRequestError(BackendError):
+    """The backend rejected the request itself (e.g. malformed SOQL); retrying will not help"""
+
+    def __init__(self, backend: str, message: str, status: Optional[int] = None):
+        super().__init__(backend, message)
+        self.status = status
@@ -0,0 +1,119 @@
+#services/export.py
+
+import argparse
+import csv
+import os
+import time
+from typing import Dict, Iterable, Iterator, List
+from config.field_mapping import FIELD_MAPPING
+from models.criteria import CustomerCriteria
+from services.clients import clients
+from services.query_builder import build_soql_query
+from services.query_executor import iter_salesforce_records
+from services.resilience import salesforce_policy
+from utils.formatter import ColumnSpec, RowProjector
+from utils.logger import logger
+
+# Export columns use the SOQL field paths, matching the Bulk API 2.0 CSV header
+EXPORT_COLUMNS = list(FIELD_MAPPING.values())
+export_projector = RowProjector([ColumnSpec(path, path) for path in EXPORT_COLUMNS], default="")
+EXPORT_FORMATS = ("csv", "parquet")
+DEFAULT_CHUNK_ROWS = 50_000
+SOBJECT = "Usage_statistic__c"
+
+def _chunks(records: Iterable[Dict], size: int) -> Iterator[List[Dict]]:
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _part_path(out_dir: str, part: int, fmt: str) -> str:
+    return os.path.join(out_dir, f"part-{part:05d}.{fmt}")
+
+def _csv_to_parquet(csv_path: str, parquet_path: str):
+    """Convert one chunk; needs pandas with pyarrow (or fastparquet) installed"""
+    import pandas as pd
+    pd.read_csv(csv_path, dtype=str, keep_default_na=False).to_parquet(parquet_path, index=False)
+    os.remove(csv_path)
+
+def export_records(records: Iterable[Dict], out_dir: str, fmt: str = "csv",
+                   chunk_rows: int = DEFAULT_CHUNK_ROWS) -> List[str]:
+    """Write records to numbered chunk files, holding at most one chunk in memory"""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format '{fmt}'")
+    os.makedirs(out_dir, exist_ok=True)
+    files = []
+    for part, chunk in enumerate(_chunks(records, chunk_rows), start=1):
+        csv_path = _part_path(out_dir, part, "csv")
+        with open(csv_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(EXPORT_COLUMNS)
+            writer.writerows(export_projector.rows(chunk))
+        if fmt == "parquet":
+            _csv_to_parquet(csv_path, _part_path(out_dir, part, "parquet"))
+        files.append(_part_path(out_dir, part, fmt))
+        logger.info(f"Wrote {len(chunk)} records to {files[-1]}")
+    return files
+
+def stream_export(soql_query: str, out_dir: str, fmt: str = "csv",
+                  chunk_rows: int = DEFAULT_CHUNK_ROWS) -> List[str]:
+    """Export through the REST API, paging with queryMore"""
+    return export_records(iter_salesforce_records(soql_query), out_dir, fmt, chunk_rows)
+
+def bulk_export(soql_query: str, out_dir: str, fmt: str = "csv",
+                chunk_rows: int = DEFAULT_CHUNK_ROWS) -> List[str]:
+    """Export through a Bulk API 2.0 query job, downloading results straight to disk.
+
+    Salesforce serializes the job results as CSV chunks of up to chunk_rows
+    records; they are renamed to part files and optionally converted to Parquet
+    one at a time.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format '{fmt}'")
+    os.makedirs(out_dir, exist_ok=True)
+
+    def download(sf) -> List[Dict]:
+        return getattr(sf.bulk2, SOBJECT).download(soql_query, path=out_dir, max_records=chunk_rows)
+
+    # The job holds a Salesforce concurrency slot until its results are downloaded
+    results = salesforce_policy.call(lambda: clients.call_salesforce(download))
+    files = []
+    for part, result in enumerate(results, start=1):
+        csv_path = _part_path(out_dir, part, "csv")
+        os.replace(result["file"], csv_path)
+        if fmt == "parquet":
+            _csv_to_parquet(csv_path, _part_path(out_dir, part, "parquet"))
+        files.append(_part_path(out_dir, part, fmt))
+        logger.info(f"Bulk job chunk {part}: {result['number_of_records']} records in {files[-1]}")
+    return files
+
+def export_criteria(criteria: CustomerCriteria, out_dir: str, fmt: str = "csv",
+                    chunk_rows: int = DEFAULT_CHUNK_ROWS, bulk: bool = False) -> List[str]:
+    """Export every record matching the criteria, ignoring criteria.limit"""
+    soql_query = build_soql_query(criteria, include_limit=False, fields=EXPORT_COLUMNS)
+    started = time.time()
+    export = bulk_export if bulk else stream_export
+    files = export(soql_query, out_dir, fmt, chunk_rows)
+    logger.info(f"Export finished: {len(files)} files in {time.time() - started:.1f}s")
+    return files
+
+def main():
+    parser = argparse.ArgumentParser(description="Export every customer matching a reference request")
+    parser.add_argument("prompt", help="Natural-language request, e.g. 'manufacturing customers on Oracle'")
+    parser.add_argument("--out", required=True, help="Output directory for the chunk files")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="csv")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS, help="Records per output file")
+    parser.add_argument("--bulk", action="store_true", help="Use a Bulk API 2.0 job for very large extracts")
+    args = parser.parse_args()
+
+    from services.parser import parse_criteria
+    criteria = parse_criteria(args.prompt)
+    for path in export_criteria(criteria, args.out, args.format, args.chunk_rows, bulk=args.bulk):
+        print(path)
+
+if __name__ == "__main__":
+    main()
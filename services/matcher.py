@@ -0,0 +1,131 @@
+#services/matcher.py
+
+import difflib
+import heapq
+import re
+from collections import Counter, defaultdict
+from itertools import chain
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from config.static_lists import ERP_SYSTEMS, INDUSTRIES, PRODUCT_ACTIVATIONS
+
+# Inputs shorter than this are compared against every value
+SHORT_INPUT_LENGTH = 5
+
+# Words shorter than this ("ap", "ms", "of") do not make a value relevant on their own
+MIN_TOKEN_LENGTH = 3
+
+_PUNCTUATION = re.compile(r"[^\w\s/&().+\-]")
+_WORD = re.compile(r"\w+")
+
+def words(text: str) -> Set[str]:
+    """Lowercased words of at least MIN_TOKEN_LENGTH characters"""
+    return {word for word in _WORD.findall(text.lower()) if len(word) >= MIN_TOKEN_LENGTH}
+
+def trigrams(text: str) -> Set[str]:
+    """Character trigrams of a lowercased string, padded with one space on each side"""
+    padded = f" {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class MatchIndex:
+    """Precompiled lookup structure for one vocabulary list.
+
+    Exact (case-insensitive) hits are answered from a dict. Fuzzy lookups score
+    values sharing trigrams with the input first, then check the rest only
+    against the best ratio found, using the same SequenceMatcher ratio, cutoff
+    and tie-breaking as difflib.get_close_matches.
+    """
+
+    def __init__(self, values: List[str], cutoff: float = 0.6):
+        self.values = values
+        self.cutoff = cutoff
+        self._exact: Dict[str, str] = {}
+        for value in values:
+            self._exact.setdefault(value.lower(), value)
+        self._lowered: List[str] = list(self._exact)
+        self._lengths: List[int] = [len(lowered) for lowered in self._lowered]
+        self._gram_counts: List[int] = []
+        self._words: List[Set[str]] = [words(lowered) for lowered in self._lowered]
+        self._postings: Dict[str, List[int]] = defaultdict(list)
+        for position, lowered in enumerate(self._lowered):
+            grams = trigrams(lowered)
+            self._gram_counts.append(len(grams))
+            for gram in grams:
+                self._postings[gram].append(position)
+
+    def candidates(self, text: str) -> Counter:
+        """Positions of values sharing trigrams with text, with the shared trigram count"""
+        return Counter(chain.from_iterable(self._postings.get(gram, ()) for gram in trigrams(text)))
+
+    def retrieve(self, text: str, k: int, min_score: float = 0.6) -> List[str]:
+        """Top-k values mentioned in free text, ranked by the share of their trigrams it contains.
+
+        A value counts as mentioned when the text contains at least `min_score`
+        of its trigrams or one of its words whole; values that merely share a
+        trigram or two with the text ("good" and "Softbase") are left out.
+        """
+        lowered = _PUNCTUATION.sub(" ", text.lower())
+        counts = self.candidates(lowered)
+        text_words = words(lowered)
+        scored = (
+            (count / self._gram_counts[position], self._lowered[position])
+            for position, count in counts.items()
+            if count >= min_score * self._gram_counts[position] or not self._words[position].isdisjoint(text_words)
+        )
+        return [self._exact[value] for _, value in heapq.nlargest(k, scored)]
+
+    def lookup(self, input_value: str) -> Optional[str]:
+        """Return the best matching value in its original case, or None"""
+        if not input_value:
+            return None
+        word = input_value.lower()
+        exact = self._exact.get(word)
+        if exact is not None:
+            return exact
+
+        if len(word) < SHORT_INPUT_LENGTH:
+            # Short strings can be close without sharing a trigram: score everything
+            best = self._score(word, range(len(self._lowered)))
+        else:
+            candidates = self.candidates(word)
+            # Most shared trigrams first so the best score rises early
+            best = self._score(word, (p for p, _ in candidates.most_common()))
+            # A value sharing no trigram can still have a higher ratio ("deltek" and
+            # "elite"); the bounds below skip nearly all of them once best is high
+            best = self._score(word, (p for p in range(len(self._lowered)) if p not in candidates), best)
+        return self._exact[best[1]] if best else None
+
+    def _score(self, word: str, positions: Iterable[int],
+               best: Optional[Tuple[float, str]] = None) -> Optional[Tuple[float, str]]:
+        """Highest (ratio, value) at or above the cutoff and `best`, as get_close_matches ranks them"""
+        matcher = difflib.SequenceMatcher()
+        matcher.set_seq2(word)
+        word_length = len(word)
+        threshold = self.cutoff if best is None else best[0]
+        for position in positions:
+            # real_quick_ratio() and quick_ratio() bound ratio() from above, so
+            # anything below the best score so far cannot win
+            length = self._lengths[position]
+            if 2.0 * min(length, word_length) / (length + word_length) < threshold:
+                continue
+            candidate = self._lowered[position]
+            matcher.set_seq1(candidate)
+            if matcher.quick_ratio() < threshold:
+                continue
+            scored = (matcher.ratio(), candidate)
+            if scored[0] >= threshold and (best is None or scored > best):
+                best = scored
+                threshold = scored[0]
+        return best
+
+ERP_INDEX = MatchIndex(ERP_SYSTEMS)
+INDUSTRY_INDEX = MatchIndex(INDUSTRIES)
+PRODUCT_INDEX = MatchIndex(PRODUCT_ACTIVATIONS)
+
+_PREBUILT = [ERP_INDEX, INDUSTRY_INDEX, PRODUCT_INDEX]
+
+def get_match_index(possible_values: List[str]) -> MatchIndex:
+    """Return the prebuilt index for a static list, building one for other lists"""
+    for index in _PREBUILT:
+        if index.values is possible_values:
+            return index
+    return MatchIndex(possible_values)
@@ -1,66 +1,21 @@
 from typing import Dict, Any, List, Optional
 import json
-import difflib
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
-from langchain_openai import AzureChatOpenAI
+import threading
 from models.criteria import CustomerCriteria
 from config.settings import settings
 from utils.logger import logger, log_json  
+from utils.metrics import record_llm_usage, timed
 from config.static_lists import ERP_SYSTEMS, INDUSTRIES, PRODUCT_ACTIVATIONS
+from services.cache import criteria_cache
+from services.rule_parser import parse_criteria_rules
+from services.matcher import MatchIndex, ERP_INDEX, INDUSTRY_INDEX, PRODUCT_INDEX, get_match_index
+from services.clients import clients
+from services.replay import get_replay_store
+from services.resilience import llm_hedge_delay, llm_policy
 
-
-llm = AzureChatOpenAI(
-    api_key=settings.AZURE_OPENAI_API_KEY,
-    api_version=settings.AZURE_OPENAI_API_VERSION,
-    azure_endpoint=settings.AZURE_OPENAI_ENDPOINT,
-    deployment_name=settings.AZURE_OPENAI_DEPLOYMENT,
-    temperature=0
-)
-
-def find_best_match(input_value: str, possible_values: List[str]) -> Optional[str]:
-    """Find the best match for the input value in the list of possible values."""
-    if not input_value or not possible_values:
-        return None
-        
-    # Convert input to lowercase for case-insensitive matching
-    input_lower = input_value.lower()
-    
-    # Try exact match first (case insensitive)
-    for value in possible_values:
-        if value.lower() == input_lower:
-            return value
-    
-    # Try to find the closest match
-    matches = difflib.get_close_matches(input_lower, [v.lower() for v in possible_values], n=1, cutoff=0.6)
-    if matches:
-        # Find the original case version
-        match_index = [v.lower() for v in possible_values].index(matches[0])
-        return possible_values[match_index]
-    
-    return None
-
-def clean_json_response(response: str) -> Dict[str, Any]:
-    """Clean the JSON response by removing markdown code blocks."""
-    logger.info(f"Raw LLM response:\n{response}")
-    
-    if response.startswith('```json') and response.endswith('```'):
-        response = response[7:-3].strip()
-    elif response.startswith('```') and response.endswith('```'):
-        response = response[3:-3].strip()
-    
-    logger.info(f"Cleaned JSON string:\n{response}")
-    return json.loads(response)
-
-def parse_criteria(prompt: str) -> CustomerCriteria:
-    logger.info(f"Starting criteria parsing for prompt: '{prompt}'")
-    
-    # Format the static lists for inclusion in the prompt
-    erp_list = "\n".join([f"- {erp}" for erp in sorted(ERP_SYSTEMS)])
-    industry_list = "\n".join([f"- {industry}" for industry in sorted(INDUSTRIES)])
-    product_list = "\n".join([f"- {product}" for product in sorted(PRODUCT_ACTIVATIONS)])
-    
-    parser_prompt = ChatPromptTemplate.from_template("""
+# The full vocabulary lists are built once at import; the langchain prompt and
+# chain are built on first use so importing the parser stays cheap
+PARSER_TEMPLATE = """
     Extract the following parameters from the user's request. Return only a JSON object with the extracted values.
     
     For numeric parameters (invoice_volume, po_percentage, non_po_percentage, po_touchless_percentage, automatic_distribution), 
@@ -75,13 +30,13 @@ def parse_criteria(prompt: str) -> CustomerCriteria:
     - "value": The numeric value
     - "operator": One of "=", "<", "<=", ">", ">=" based on the user's intent
     
-    Available ERP Systems (must match exactly one of these):
+    Available ERP Systems (most relevant candidates; must match exactly one of these):
     {erp_systems}
     
-    Available Industries (must match exactly one of these):
+    Available Industries (most relevant candidates; must match exactly one of these):
     {industries}
     
-    Available Product Activations (must match exactly one of these):
+    Available Product Activations (most relevant candidates; must match exactly one of these):
     {product_activations}
     
     Parameters to extract:
@@ -96,55 +51,175 @@ def parse_criteria(prompt: str) -> CustomerCriteria:
     - product_activations: Product activations (must match one from the Product Activations list above)
     - limit: Number of results to return (default 5, max 20)
     
+    If the user accepts any of several values for erp_system, industry or product_activations
+    (e.g. "SAP or Oracle"), return a JSON list of the values instead of a single string.
+    
     Return ONLY valid JSON. Do not include any additional text or explanation.
     
     Example output format for numeric fields:
     "invoice_volume": {{"value": 1000, "operator": ">="}}
     "po_percentage": {{"value": 50, "operator": "="}}
+    "erp_system": ["SAP", "Oracle"]
     
     User request: {prompt}
-    """)
+    """
+
+def format_vocabulary(values: List[str]) -> str:
+    """Format vocabulary values as a bulleted list for the prompt"""
+    return "\n".join([f"- {value}" for value in values])
+
+_parser_prompt = None
+_parser_prompt_lock = threading.Lock()
+
+def get_parser_prompt():
+    """Compile PARSER_TEMPLATE into a ChatPromptTemplate once, on first use"""
+    global _parser_prompt
+    if _parser_prompt is None:
+        with _parser_prompt_lock:
+            if _parser_prompt is None:
+                from langchain_core.prompts import ChatPromptTemplate
+                _parser_prompt = ChatPromptTemplate.from_template(PARSER_TEMPLATE)
+    return _parser_prompt
+
+def get_parser_chain():
+    """Prompt | shared LLM client; the client is created on first use"""
+    return get_parser_prompt() | clients.get_llm()
+
+def response_text(message) -> str:
+    """Text of the chat model reply, counting its token usage"""
+    record_llm_usage(getattr(message, "usage_metadata", None))
+    return message.content
+
+FULL_ERP_LIST = format_vocabulary(sorted(ERP_SYSTEMS))
+FULL_INDUSTRY_LIST = format_vocabulary(sorted(INDUSTRIES))
+FULL_PRODUCT_LIST = format_vocabulary(sorted(PRODUCT_ACTIVATIONS))
+
+def candidate_list(index: MatchIndex, prompt: str, full_list: str) -> str:
+    """Format the top-k values the prompt mentions, or the full list when it mentions none"""
+    candidates = index.retrieve(prompt, settings.PROMPT_CANDIDATES_PER_LIST, settings.PROMPT_CANDIDATE_MIN_SCORE)
+    if not candidates:
+        return full_list
+    return format_vocabulary(candidates)
+
+def find_best_match(input_value: str, possible_values: List[str]) -> Optional[str]:
+    """Find the best match for the input value in the list of possible values."""
+    if not input_value or not possible_values:
+        return None
     
-    parser_chain = parser_prompt | llm | StrOutputParser()
-    json_response = parser_chain.invoke({
-        "prompt": prompt,
-        "erp_systems": erp_list,
-        "industries": industry_list,
-        "product_activations": product_list
-    })
+    # Exact (case-insensitive) match first, then the closest difflib match
+    return get_match_index(possible_values).lookup(input_value)
+
+def map_to_vocabulary(json_data: Dict[str, Any], field: str, possible_values: List[str], label: str):
+    """Replace json_data[field] (a value or a list of values) with the closest vocabulary values"""
+    value = json_data.get(field)
+    if not value:
+        return
+    mapped = []
+    for item in (value if isinstance(value, list) else [value]):
+        best_match = find_best_match(item, possible_values) if isinstance(item, str) else None
+        if best_match:
+            mapped.append(best_match)
+            logger.info(f"Mapped {label} to '{best_match}'")
+        else:
+            logger.warning(f"No close match found for {label} '{item}'")
+            mapped.append(item)
+    json_data[field] = mapped if isinstance(value, list) else mapped[0]
+
+def clean_json_response(response: str) -> Dict[str, Any]:
+    """Clean the JSON response by removing markdown code blocks."""
+    log_json(response, "Raw LLM response", raw=True)
     
+    if response.startswith('```json') and response.endswith('```'):
+        response = response[7:-3].strip()
+    elif response.startswith('```') and response.endswith('```'):
+        response = response[3:-3].strip()
+    
+    log_json(response, "Cleaned LLM response", raw=True)
+    return json.loads(response)
+
+def parse_criteria_locally(prompt: str) -> Optional[CustomerCriteria]:
+    """Answer from the criteria cache or the rule-based parser, without the LLM"""
+    cached = criteria_cache.get(prompt)
+    if cached is not None:
+        logger.info(f"Criteria cache hit: {cached}")
+        return cached
+    
+    # Fast path: common phrasings are handled locally without an LLM round trip
+    rule_criteria, confidence = parse_criteria_rules(prompt)
+    if rule_criteria is not None and confidence >= settings.RULE_PARSER_MIN_CONFIDENCE:
+        logger.info(f"Using rule-based criteria (confidence {confidence:.2f})")
+        return rule_criteria
+    return None
+
+def build_chain_input(prompt: str) -> Dict[str, str]:
+    """Template variables for the parser chain"""
+    # Only the vocabulary values relevant to this prompt go into the template
+    return {
+        "prompt": prompt,
+        "erp_systems": candidate_list(ERP_INDEX, prompt, FULL_ERP_LIST),
+        "industries": candidate_list(INDUSTRY_INDEX, prompt, FULL_INDUSTRY_LIST),
+        "product_activations": candidate_list(PRODUCT_INDEX, prompt, FULL_PRODUCT_LIST)
+    }
+
+def criteria_from_response(prompt: str, json_response: str) -> CustomerCriteria:
+    """Turn the raw LLM response into criteria mapped onto the static vocabularies"""
     try:
         json_data = clean_json_response(json_response)
         log_json(json_data, "Parsed criteria")
         
         # Apply fuzzy matching to ERP system, industry, and product activations
-        if 'erp_system' in json_data and json_data['erp_system']:
-            best_match = find_best_match(json_data['erp_system'], ERP_SYSTEMS)
-            if best_match:
-                json_data['erp_system'] = best_match
-                logger.info(f"Mapped ERP system to '{best_match}'")
-            else:
-                logger.warning(f"No close match found for ERP system '{json_data['erp_system']}'")
-        
-        if 'industry' in json_data and json_data['industry']:
-            best_match = find_best_match(json_data['industry'], INDUSTRIES)
-            if best_match:
-                json_data['industry'] = best_match
-                logger.info(f"Mapped industry to '{best_match}'")
-            else:
-                logger.warning(f"No close match found for industry '{json_data['industry']}'")
-        
-        if 'product_activations' in json_data and json_data['product_activations']:
-            best_match = find_best_match(json_data['product_activations'], PRODUCT_ACTIVATIONS)
-            if best_match:
-                json_data['product_activations'] = best_match
-                logger.info(f"Mapped product activations to '{best_match}'")
-            else:
-                logger.warning(f"No close match found for product activations '{json_data['product_activations']}'")
+        map_to_vocabulary(json_data, 'erp_system', ERP_SYSTEMS, "ERP system")
+        map_to_vocabulary(json_data, 'industry', INDUSTRIES, "industry")
+        map_to_vocabulary(json_data, 'product_activations', PRODUCT_ACTIVATIONS, "product activations")
         
         criteria = CustomerCriteria(**json_data)
         logger.info(f"Successfully created criteria object: {criteria}")
+        criteria_cache.set(prompt, criteria)
         return criteria
     except Exception as e:
-        logger.error(f"Error parsing criteria: {e}\nRaw response: {json_response}")
-        return CustomerCriteria()
\ No newline at end of file
+        logger.error(f"Error parsing criteria: {e}")
+        log_json(json_response, "Unparseable LLM response", raw=True)
+        return CustomerCriteria()
+
+def replay_request(chain_input: Dict[str, str]) -> Dict[str, str]:
+    """What identifies an LLM call in the replay store; a template change misses old recordings"""
+    return {"template": PARSER_TEMPLATE, **chain_input}
+
+def parse_criteria(prompt: str) -> CustomerCriteria:
+    logger.info(f"Starting criteria parsing for prompt: '{prompt}'")
+    
+    criteria = parse_criteria_locally(prompt)
+    if criteria is not None:
+        return criteria
+    
+    chain_input = build_chain_input(prompt)
+    
+    def invoke() -> str:
+        with clients.llm_slot(), timed("llm"):
+            return response_text(get_parser_chain().invoke(chain_input))
+    json_response = get_replay_store().call("llm", replay_request(chain_input), lambda: llm_policy.call(invoke))
+    return criteria_from_response(prompt, json_response)
+
+async def aparse_criteria(prompt: str) -> CustomerCriteria:
+    """Async variant of parse_criteria using the chain's ainvoke path"""
+    logger.info(f"Starting async criteria parsing for prompt: '{prompt}'")
+    
+    criteria = parse_criteria_locally(prompt)
+    if criteria is not None:
+        return criteria
+    return await aparse_criteria_with_llm(prompt)
+
+async def aparse_criteria_with_llm(prompt: str) -> CustomerCriteria:
+    """The LLM half of aparse_criteria, for callers that already tried parse_criteria_locally"""
+    chain_input = build_chain_input(prompt)
+    
+    async def ainvoke() -> str:
+        async with clients.allm_slot():
+            with timed("llm"):
+                return response_text(await get_parser_chain().ainvoke(chain_input))
+
+    async def resilient_ainvoke() -> str:
+        # A hedged duplicate is sent once the call outlives the LLM's p95 latency
+        return await llm_policy.acall(ainvoke, hedge_after=llm_hedge_delay if settings.LLM_HEDGING else None)
+    json_response = await get_replay_store().acall("llm", replay_request(chain_input), resilient_ainvoke)
+    return criteria_from_response(prompt, json_response)
@@ -0,0 +1,241 @@
+#services/pipeline.py
+
+import asyncio
+import threading
+from typing import Awaitable, Dict, List, Optional, Tuple, TypeVar
+from config.settings import settings
+from models.criteria import CustomerCriteria, stated_fields
+from services.conversation import ConversationState
+from services.parser import aparse_criteria, aparse_criteria_with_llm, parse_criteria_locally
+from services.query_builder import build_soql_query
+from services.query_executor import aquery_salesforce, aquery_salesforce_batch
+from services.ranking import candidate_pool_size, top_k
+from services.replica import get_replica
+from services.resilience import deadline
+from services.rule_parser import is_refinement, split_comparison
+from services.speculation import Speculation, start_speculation
+from utils.formatter import GROUP_FIELD, format_results
+from utils.logger import logger, new_request_id
+from utils.metrics import REQUESTS, timed
+
+T = TypeVar("T")
+
+AgentResult = Tuple[str, List[Dict], str, str]
+
+async def run_stage(stage: str, awaitable: Awaitable[T], timeout: float) -> T:
+    """Await one pipeline stage, failing with a TimeoutError that names the stage.
+
+    Awaiting a coroutine is cancelled at the timeout, but a blocking call in a
+    worker thread cannot be: it keeps running and only sees the stage deadline,
+    which stops its retries and interrupts replica queries. Pass a coroutine,
+    not a task or gather(), so the work started for it sees the deadline too.
+    """
+    try:
+        with timed(stage), deadline(timeout):
+            return await asyncio.wait_for(awaitable, timeout=timeout)
+    except asyncio.TimeoutError:
+        logger.error(f"Stage '{stage}' timed out after {timeout}s")
+        raise TimeoutError(f"{stage} timed out after {timeout}s") from None
+
+def fetch_local_results(criteria: CustomerCriteria, ranked: bool = False) -> Optional[List[Dict]]:
+    """Answer from the local replica when it is enabled and recently synced.
+
+    When ranked, return the ranking candidate pool rather than the first matches.
+    """
+    replica = get_replica()
+    if replica is None or not replica.is_fresh():
+        return None
+    pool = candidate_pool_size(criteria) if ranked else None
+    if settings.COLUMNAR_SNAPSHOT:
+        # numpy/pandas are only loaded once a replica is actually in use
+        from services.columnar import get_snapshot
+        snapshot = get_snapshot(replica)
+        return snapshot.candidates(criteria, pool) if ranked else snapshot.query(criteria)
+    return replica.query(criteria, pool=pool)
+
+async def afetch_candidates(criteria_list: List[CustomerCriteria], soql_queries: List[str],
+                            ranked: bool = False) -> List[List[Dict]]:
+    """Rows for independent queries; those the replica cannot answer share one Composite batch"""
+    # Snapshot rebuilds and replica queries block, so they stay off the event loop
+    groups = await asyncio.to_thread(lambda: [fetch_local_results(criteria, ranked) for criteria in criteria_list])
+    # Candidate pools are cached on the SOQL so they never stand in for a plain result
+    cache_criteria = [None if ranked else criteria for criteria in criteria_list]
+    pending = [i for i, results in enumerate(groups) if results is None]
+    if len(pending) == 1:
+        i = pending[0]
+        groups[i] = await aquery_salesforce(soql_queries[i], cache_criteria[i])
+    elif pending:
+        fetched = await aquery_salesforce_batch(
+            [soql_queries[i] for i in pending], [cache_criteria[i] for i in pending]
+        )
+        for i, results in zip(pending, fetched):
+            groups[i] = results
+    return groups
+
+def select_results(candidates: List[Dict], criteria: CustomerCriteria, ranked: bool = False) -> List[Dict]:
+    """The criteria.limit rows to show: the best ranked, or the first"""
+    if not ranked:
+        return candidates[:criteria.limit]
+    with timed("rank_results"):
+        return top_k(candidates, criteria, criteria.limit)
+
+def is_complete(candidates: List[Dict], criteria: CustomerCriteria, ranked: bool = False) -> bool:
+    """Whether the fetch returned every matching row rather than stopping at its LIMIT"""
+    return len(candidates) < (candidate_pool_size(criteria) if ranked else criteria.limit)
+
+async def afetch_many(criteria_list: List[CustomerCriteria], soql_queries: List[str],
+                      ranked: bool = False) -> List[List[Dict]]:
+    groups = await afetch_candidates(criteria_list, soql_queries, ranked)
+    return [select_results(candidates, criteria, ranked) for candidates, criteria in zip(groups, criteria_list)]
+
+def share_criteria(sides: List[CustomerCriteria]) -> List[CustomerCriteria]:
+    """Give every side of a comparison the criteria only some sides state.
+
+    In "retail customers on SAP vs Oracle" the industry is said once but applies
+    to both sides; a field a side sets itself is never overridden.
+    """
+    stated = [stated_fields(criteria) for criteria in sides]
+    shared: Dict[str, object] = {}
+    for criteria, fields in zip(sides, stated):
+        for field in fields:
+            shared.setdefault(field, getattr(criteria, field))
+    return [
+        criteria.copy(update={field: value for field, value in shared.items() if field not in fields})
+        for criteria, fields in zip(sides, stated)
+    ]
+
+def format_response(results: List[Dict], soql_query: str, text: bool = True) -> AgentResult:
+    """Without text, a table answer carries a one-line summary instead of the rendered table"""
+    # Format results differently based on whether we found matches
+    if not results:
+        return "No customers found matching your criteria.", [], soql_query, "text"
+    elif not text:
+        return f"Found {len(results)} matching customers.", results, soql_query, "table"
+    else:
+        return format_results(results), results, soql_query, "table"
+
+def format_comparison(labels: List[str], groups: List[List[Dict]], soql_queries: List[str],
+                      text: bool = True) -> AgentResult:
+    """One table with a leading column naming the side each row belongs to"""
+    results = [{**record, GROUP_FIELD: label} for label, records in zip(labels, groups) for record in records]
+    return format_response(results, "\n\n".join(soql_queries), text)
+
+async def acompare(sides: List[str], text: bool = True) -> AgentResult:
+    """Answer a side-by-side comparison: parse the sides concurrently, query them in one batch"""
+    logger.info(f"Comparing {len(sides)} groups: {sides}")
+    async def parse_sides() -> List[CustomerCriteria]:
+        return await asyncio.gather(*(aparse_criteria(side) for side in sides))
+    parsed = await run_stage("parse_criteria", parse_sides(), settings.PARSE_TIMEOUT_SECONDS)
+    criteria_list = share_criteria(parsed)
+    ranked = settings.RANKED_RESULTS
+    with timed("build_soql_query"):
+        soql_queries = [build_soql_query(criteria, ranked=ranked) for criteria in criteria_list]
+    groups = await run_stage(
+        "query_salesforce", afetch_many(criteria_list, soql_queries, ranked), settings.QUERY_TIMEOUT_SECONDS
+    )
+    with timed("format_results"):
+        return format_comparison(sides, groups, soql_queries, text)
+
+def speculate(prompt: str, refining: bool) -> Optional[Speculation]:
+    """Start a speculative prefetch unless it is off or cannot help this prompt"""
+    if not settings.SPECULATIVE_PREFETCH or refining:
+        # A refinement's criteria are merged with the previous ones after parsing
+        return None
+    replica = get_replica()
+    if replica is not None and replica.is_fresh():
+        return None
+    return start_speculation(prompt)
+
+async def asearch(prompt: str, conversation: Optional[ConversationState] = None, text: bool = True) -> AgentResult:
+    """Answer a single search, refining the conversation's previous one when the prompt asks to"""
+    # Only a previous answer can be refined; without one the prompt is a new search
+    refining = conversation is not None and conversation.criteria is not None and is_refinement(prompt)
+    # A cached or confidently rule-parsed prompt skips the LLM, so there is no parse to overlap
+    criteria = parse_criteria_locally(prompt)
+    speculation = None
+    if criteria is None:
+        speculation = speculate(prompt, refining)
+        try:
+            criteria = await run_stage(
+                "parse_criteria", aparse_criteria_with_llm(prompt), settings.PARSE_TIMEOUT_SECONDS
+            )
+        except BaseException:
+            if speculation is not None:
+                speculation.cancel()
+            raise
+    candidates = None
+    if refining:
+        criteria = conversation.merge(criteria)
+        candidates = conversation.local_candidates(criteria)
+    ranked = settings.RANKED_RESULTS
+    with timed("build_soql_query"):
+        soql_query = build_soql_query(criteria, ranked=ranked)
+    if candidates is None and speculation is not None:
+        candidates = await run_stage(
+            "query_salesforce", speculation.candidates(criteria), settings.QUERY_TIMEOUT_SECONDS
+        )
+    if candidates is None:
+        candidates = (await run_stage(
+            "query_salesforce", afetch_candidates([criteria], [soql_query], ranked), settings.QUERY_TIMEOUT_SECONDS
+        ))[0]
+    if conversation is not None:
+        conversation.remember(criteria, candidates, is_complete(candidates, criteria, ranked))
+    results = select_results(candidates, criteria, ranked)
+    with timed("format_results"):
+        return format_response(results, soql_query, text)
+
+async def acustomer_reference_agent(prompt: str, conversation: Optional[ConversationState] = None,
+                                    text: bool = True) -> AgentResult:
+    """Async core agent: returns formatted results, raw data, SOQL query and message type.
+
+    Each stage has its own timeout; cancelling the task cancels the stage in progress,
+    except for blocking Salesforce and replica calls, which stop at the stage deadline.
+    With a conversation, follow-ups narrow the previous answer (see ConversationState).
+    Callers that render the raw data themselves pass text=False to skip the text table.
+    """
+    new_request_id()
+    logger.info(f"Processing prompt: '{prompt}'")
+    try:
+        with timed("request"):
+            sides = split_comparison(prompt)
+            if sides:
+                response = await acompare(sides, text)
+            else:
+                response = await asearch(prompt, conversation, text)
+    except BaseException:
+        REQUESTS.inc(status="error")
+        raise
+    REQUESTS.inc(status="ok" if response[1] else "empty")
+    return response
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+def get_agent_loop() -> asyncio.AbstractEventLoop:
+    """The event loop sync callers run the agent on, started in a daemon thread on first use.
+
+    The shared LLM client keeps its async connections open across requests, and
+    those are bound to the loop that opened them; asyncio.run would close that
+    loop after each request and break the next one.
+    """
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="agent-loop", daemon=True).start()
+                _loop = loop
+    return _loop
+
+def customer_reference_agent(prompt: str, conversation: Optional[ConversationState] = None,
+                             text: bool = True) -> AgentResult:
+    """Core agent function that returns formatted results, raw data, SOQL query and message type"""
+    future = asyncio.run_coroutine_threadsafe(
+        acustomer_reference_agent(prompt, conversation, text), get_agent_loop()
+    )
+    try:
+        return future.result()
+    except BaseException:
+        # E.g. the caller was interrupted: stop the request rather than leave it running
+        future.cancel()
+        raise
@@ -1,37 +1,174 @@
-from typing import List, Dict
-from langchain_salesforce import SalesforceTool
-from config.settings import settings
+import asyncio
+from typing import Any, Iterator, List, Dict, Optional
+from urllib.parse import quote
+from services.clients import clients
+from services.errors import BackendError, BackendRequestError, BackendUnavailableError
+from services.replay import get_replay_store
+from services.resilience import RETRYABLE_STATUSES, salesforce_policy
+from models.criteria import CustomerCriteria
+from services.cache import result_cache, criteria_key, soql_key
 from utils.logger import logger, log_json  
+from utils.metrics import SALESFORCE_ROWS
 
-salesforce_tool = SalesforceTool(
-    username=settings.SALESFORCE_USERNAME,
-    password=settings.SALESFORCE_PASSWORD,
-    security_token=settings.SALESFORCE_SECURITY_TOKEN,
-    domain=settings.SALESFORCE_DOMAIN
-)
+def _query_more(result: Dict) -> List[Dict]:
+    """The records of a query response plus those of its remaining pages, fetched with queryMore"""
+    replay = get_replay_store()
+    records = list(result.get("records", []))
+    while not result.get("done", True) and result.get("nextRecordsUrl"):
+        next_url = result["nextRecordsUrl"]
+        result = replay.call(
+            "salesforce_query_more", {"url": next_url},
+            lambda: salesforce_policy.call(
+                lambda: clients.call_salesforce(lambda sf: sf.query_more(next_url, identifier_is_url=True))
+            )
+        )
+        records.extend(result.get("records", []))
+    return records
 
-def query_salesforce(soql_query: str) -> List[Dict]:
+def _run_query(soql_query: str) -> List[Dict]:
+    payload = {
+        "operation": "query",
+        "query": soql_query
+    }
+    result = get_replay_store().call(
+        "salesforce", payload, lambda: salesforce_policy.call(lambda: clients.run_salesforce(payload))
+    )
+    
+    logger.info("Raw Salesforce response received")
+    log_json(result, "Salesforce raw response", raw=True)
+    
+    # Ensure we're returning a list of records, every page of them
+    if isinstance(result, dict) and 'records' in result:
+        records = _query_more(result)
+        logger.info(f"Found {len(records)} records")
+        SALESFORCE_ROWS.observe(len(records))
+        return records
+    elif isinstance(result, list):
+        logger.info(f"Found {len(result)} records")
+        SALESFORCE_ROWS.observe(len(result))
+        return result
+    else:
+        raise BackendRequestError("salesforce", f"unexpected response format: {type(result).__name__}")
+
+def query_salesforce(soql_query: str, criteria: Optional[CustomerCriteria] = None) -> List[Dict]:
+    """Run a SOQL query through the shared result cache.
+
+    Results are keyed on the canonical criteria when given (so equivalent
+    criteria share an entry), otherwise on the whitespace-normalized SOQL.
+    A failure raises a BackendError (see services.errors); an empty list
+    always means nothing matched.
+    """
     logger.info(f"Executing Salesforce query: {soql_query}")
+    key = criteria_key(criteria) if criteria is not None else soql_key(soql_query)
     
     try:
-        result = salesforce_tool.run({
-            "operation": "query",
-            "query": soql_query
-        })
-        
-        logger.info("Raw Salesforce response received")
-        log_json(result, "Salesforce raw response")
-        
-        # Ensure we're returning a list of records
-        if isinstance(result, dict) and 'records' in result:
-            logger.info(f"Found {len(result['records'])} records")
-            return result['records']
-        elif isinstance(result, list):
-            logger.info(f"Found {len(result)} records")
-            return result
-        else:
-            logger.warning(f"Unexpected Salesforce response format: {type(result)}")
-            return []
-    except Exception as e:
+        return result_cache.get_or_load(key, lambda: _run_query(soql_query))
+    except BackendError as e:
+        logger.error(f"Error querying Salesforce: {str(e)}")
+        raise
+
+# Subrequests per Composite batch call (the API maximum)
+COMPOSITE_BATCH_SIZE = 25
+
+def _composite_batch(sf: Any, soql_queries: List[str]) -> List[Dict]:
+    payload = {"batchRequests": [
+        {"method": "GET", "url": f"v{sf.sf_version}/query?q={quote(soql_query)}"} for soql_query in soql_queries
+    ]}
+    return sf.restful("composite/batch", method="POST", json=payload)["results"]
+
+def _composite_results(soql_queries: List[str]) -> List[Dict]:
+    """Subrequest responses of one Composite batch; a failed subrequest fails the batch"""
+    responses = clients.call_salesforce(lambda sf: _composite_batch(sf, soql_queries))
+    for response in responses:
+        status = response.get("statusCode")
+        if status != 200:
+            message = f"Composite subrequest failed with {status}: {response.get('result')}"
+            if status in RETRYABLE_STATUSES:
+                raise BackendUnavailableError("salesforce", message)
+            raise BackendRequestError("salesforce", message, status)
+    return responses
+
+def _run_batch(soql_queries: List[str]) -> List[List[Dict]]:
+    """Run independent queries as Composite batch subrequests, 25 per round trip"""
+    replay = get_replay_store()
+    results = []
+    for start in range(0, len(soql_queries), COMPOSITE_BATCH_SIZE):
+        chunk = soql_queries[start:start + COMPOSITE_BATCH_SIZE]
+        responses = replay.call(
+            "salesforce_batch", {"queries": chunk}, lambda: salesforce_policy.call(lambda: _composite_results(chunk))
+        )
+        for soql_query, response in zip(chunk, responses):
+            records = _query_more(response["result"])
+            logger.info(f"Found {len(records)} records for batched query: {soql_query}")
+            SALESFORCE_ROWS.observe(len(records))
+            results.append(records)
+    return results
+
+def query_salesforce_batch(soql_queries: List[str],
+                           criteria_list: Optional[List[Optional[CustomerCriteria]]] = None) -> List[List[Dict]]:
+    """Run several independent queries in one Composite API round trip.
+
+    Each query is cached like query_salesforce; only the misses are sent.
+    A failure raises a BackendError, as in query_salesforce.
+    """
+    criteria_list = criteria_list or [None] * len(soql_queries)
+    keys = [
+        criteria_key(criteria) if criteria is not None else soql_key(soql_query)
+        for soql_query, criteria in zip(soql_queries, criteria_list)
+    ]
+    results = [result_cache.get(key) for key in keys]
+    missing = [i for i, records in enumerate(results) if records is None]
+    if not missing:
+        return results
+    logger.info(f"Executing {len(missing)} Salesforce queries in a Composite batch")
+
+    try:
+        fetched = _run_batch([soql_queries[i] for i in missing])
+    except BackendError as e:
         logger.error(f"Error querying Salesforce: {str(e)}")
-        return []
\ No newline at end of file
+        raise
+    for i, records in zip(missing, fetched):
+        result_cache.set(keys[i], records)
+        results[i] = list(records)
+    return results
+
+async def aquery_salesforce_batch(soql_queries: List[str],
+                                  criteria_list: Optional[List[Optional[CustomerCriteria]]] = None) -> List[List[Dict]]:
+    """Async variant of query_salesforce_batch"""
+    return await asyncio.to_thread(query_salesforce_batch, soql_queries, criteria_list)
+
+async def aquery_salesforce(soql_query: str, criteria: Optional[CustomerCriteria] = None) -> List[Dict]:
+    """Async variant of query_salesforce.
+
+    simple_salesforce is synchronous, so the call runs in a worker thread and
+    the event loop stays free while Salesforce responds.
+    """
+    return await asyncio.to_thread(query_salesforce, soql_query, criteria)
+
+
+def stream_salesforce(soql_query: str) -> Iterator[List[Dict]]:
+    """Yield every page of a SOQL query, following nextRecordsUrl with queryMore.
+
+    Only one page (up to 2,000 records) is held at a time, so there is no
+    limit on how many records a caller can consume. Results bypass the cache.
+    """
+    logger.info(f"Streaming Salesforce query: {soql_query}")
+    result = salesforce_policy.call(lambda: clients.call_salesforce(lambda sf: sf.query(soql_query)))
+    pages = rows = 0
+    while True:
+        records = result.get("records", [])
+        pages += 1
+        rows += len(records)
+        yield records
+        next_url = result.get("nextRecordsUrl")
+        if result.get("done", True) or not next_url:
+            break
+        result = salesforce_policy.call(
+            lambda: clients.call_salesforce(lambda sf: sf.query_more(next_url, identifier_is_url=True))
+        )
+    logger.info(f"Streamed {rows} records in {pages} pages")
+
+def iter_salesforce_records(soql_query: str) -> Iterator[Dict]:
+    """Yield the records of a SOQL query one at a time across all pages"""
+    for page in stream_salesforce(soql_query):
+        yield from page
\ No newline at end of file
@@ -0,0 +1,167 @@
+#services/query_plan.py
+
+import math
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, List, NamedTuple, Optional, Sequence, Tuple
+from config.field_mapping import FIELD_MAPPING
+from models.criteria import CustomerCriteria, NumericCriteria
+from utils.formatter import DISPLAY_COLUMNS
+
+SOBJECT = "Usage_statistic__c"
+
+# Columns the chat table renders; the default projection
+DISPLAY_FIELDS = [column.path for column in DISPLAY_COLUMNS]
+
+COMPARISON_OPERATORS = ("=", "!=", "<", "<=", ">", ">=")
+
+# Predicate rank: lower runs first. Fixed equality filters, then picklist
+# INCLUDES/IN, then numeric comparisons, then LIKE '%...%' which no index can serve.
+RANK_FIXED = 0
+RANK_INCLUDES = 1
+RANK_EQUALS = 2
+RANK_RANGE = 3
+RANK_PICKLIST_LIKE = 4
+RANK_TEXT_LIKE = 5
+
+# Criteria attribute -> (FIELD_MAPPING key, rank) for the LIKE '%value%' filters
+LIKE_FILTERS = [
+    ("industry", "industry", RANK_PICKLIST_LIKE),
+    ("customer_name", "customer_name", RANK_TEXT_LIKE),
+    ("account_owner_text", "account_owner", RANK_TEXT_LIKE),
+]
+INCLUDES_FILTERS = ["erp_system", "product_activations"]
+NUMERIC_FILTERS = [
+    "invoice_volume", "po_percentage", "non_po_percentage",
+    "po_touchless_percentage", "automatic_distribution"
+]
+
+_STRING_ESCAPES = {
+    "\\": "\\\\", "'": "\\'", '"': '\\"',
+    "\n": "\\n", "\r": "\\r", "\t": "\\t", "\b": "\\b", "\f": "\\f",
+}
+_LIKE_ESCAPES = {**_STRING_ESCAPES, "%": "\\%", "_": "\\_"}
+
+def soql_string(value: str) -> str:
+    """Quote a string literal, escaping quotes, backslashes and control characters"""
+    return "'" + "".join(_STRING_ESCAPES.get(c, c) for c in value) + "'"
+
+def soql_like_contains(value: str) -> str:
+    """'%value%' with LIKE wildcards in the value matched literally"""
+    return "'%" + "".join(_LIKE_ESCAPES.get(c, c) for c in value) + "%'"
+
+def soql_number(value: Any) -> str:
+    """Fixed-point literal; SOQL has no exponent form (1e-05), NaN or infinity"""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"Expected a number, got {value!r}")
+    if isinstance(value, float) and not math.isfinite(value):
+        raise ValueError(f"Expected a finite number, got {value!r}")
+    if float(value).is_integer():
+        return str(int(value))
+    # repr() is the shortest round-tripping form; Decimal spells it out without an exponent
+    return format(Decimal(repr(float(value))), "f")
+
+def soql_literal(operator: str, value: Any) -> str:
+    """Render the right-hand side of a predicate"""
+    if operator == "LIKE":
+        return soql_like_contains(value)
+    if operator in ("INCLUDES", "EXCLUDES", "IN", "NOT IN"):
+        values = value if isinstance(value, (list, tuple)) else [value]
+        return "(" + ", ".join(soql_string(v) for v in values) + ")"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, str):
+        return soql_string(value)
+    return soql_number(value)
+
+class Predicate(NamedTuple):
+    rank: int
+    field: str
+    operator: str
+    value: Any
+
+class QueryPlan:
+    """A SOQL query as data: projection, ordered predicates, ORDER BY and LIMIT.
+
+    Plans with the same shape (fields, predicate fields and operators, order,
+    whether there is a limit) share one compiled template; only the literals
+    are rendered per query, always escaped.
+    """
+
+    def __init__(self, fields: Sequence[str], predicates: List[Predicate], limit: Optional[int] = None,
+                 order_by: Sequence[str] = (), sobject: str = SOBJECT):
+        self.fields = tuple(fields)
+        # Stable sort keeps the criteria order within a rank
+        self.predicates = sorted(predicates, key=lambda predicate: predicate.rank)
+        self.limit = limit
+        self.order_by = tuple(order_by)
+        self.sobject = sobject
+
+    @classmethod
+    def from_criteria(cls, criteria: CustomerCriteria, fields: Optional[Sequence[str]] = None,
+                      include_limit: bool = True, order_by: Sequence[str] = (),
+                      limit: Optional[int] = None) -> "QueryPlan":
+        """Plan for the criteria; `limit` replaces criteria.limit when include_limit is set"""
+        predicates = [
+            Predicate(RANK_FIXED, FIELD_MAPPING["is_latest"], "=", True),
+            Predicate(RANK_FIXED, FIELD_MAPPING["customer_type"], "=", "Customer"),
+        ]
+        for attr_name in INCLUDES_FILTERS:
+            value = getattr(criteria, attr_name)
+            if value:
+                predicates.append(Predicate(RANK_INCLUDES, FIELD_MAPPING[attr_name], "INCLUDES", value))
+        for attr_name in NUMERIC_FILTERS:
+            attr_value = getattr(criteria, attr_name)
+            if attr_value is None:
+                continue
+            if isinstance(attr_value, NumericCriteria):
+                value, operator = attr_value.value, attr_value.operator
+            else:
+                value, operator = attr_value, ">="
+            if operator not in COMPARISON_OPERATORS:
+                raise ValueError(f"Unsupported operator '{operator}' for {attr_name}")
+            rank = RANK_EQUALS if operator == "=" else RANK_RANGE
+            predicates.append(Predicate(rank, FIELD_MAPPING[attr_name], operator, value))
+        for attr_name, field_key, rank in LIKE_FILTERS:
+            value = getattr(criteria, attr_name)
+            if isinstance(value, list):
+                # Several picklist values: one exact IN instead of OR-ed LIKEs
+                predicates.append(Predicate(RANK_INCLUDES, FIELD_MAPPING[field_key], "IN", value))
+            elif value is not None:
+                predicates.append(Predicate(rank, FIELD_MAPPING[field_key], "LIKE", value))
+        if not include_limit:
+            limit = None
+        elif limit is None:
+            limit = criteria.limit
+        return cls(fields or DISPLAY_FIELDS, predicates, limit, order_by)
+
+    @property
+    def shape(self) -> Tuple:
+        return (
+            self.sobject,
+            self.fields,
+            tuple((p.field, p.operator) for p in self.predicates),
+            self.order_by,
+            self.limit is not None,
+        )
+
+    def to_soql(self) -> str:
+        template = compile_template(self.shape)
+        literals = [soql_literal(p.operator, p.value) for p in self.predicates]
+        if self.limit is not None:
+            literals.append(str(int(self.limit)))
+        return template.format(*literals)
+
+@lru_cache(maxsize=256)
+def compile_template(shape: Tuple) -> str:
+    """SOQL text for a plan shape with {} placeholders for the literals"""
+    sobject, fields, predicates, order_by, has_limit = shape
+    # Field names come from FIELD_MAPPING, never from user input; braces cannot occur in them
+    soql = f"SELECT {', '.join(fields)} FROM {sobject}"
+    if predicates:
+        soql += " WHERE " + " AND ".join(f"{field} {operator} {{}}" for field, operator in predicates)
+    if order_by:
+        soql += " ORDER BY " + ", ".join(order_by)
+    if has_limit:
+        soql += " LIMIT {}"
+    return soql
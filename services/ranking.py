@@ -0,0 +1,125 @@
+#services/ranking.py
+
+import heapq
+import math
+from typing import Callable, Dict, List, Optional
+from config.field_mapping import FIELD_MAPPING
+from config.settings import settings
+from models.criteria import CustomerCriteria, NumericCriteria, criteria_values
+from utils.formatter import compile_accessor
+
+# Candidates come back largest invoice volume first, so a bounded pool keeps the
+# strongest references; the heap then re-ranks the pool on the full score
+CANDIDATE_ORDER_BY = [f"{FIELD_MAPPING['invoice_volume']} DESC NULLS LAST"]
+
+# Share of the score from matching the request, invoice volume and automation
+MATCH_WEIGHT = 0.5
+VOLUME_WEIGHT = 0.3
+AUTOMATION_WEIGHT = 0.2
+
+# Invoice volume at which the volume score saturates (log scale)
+VOLUME_SCALE = 1_000_000
+AUTOMATION_FIELDS = ["po_touchless_percentage", "automatic_distribution"]
+NUMERIC_FIELDS = [
+    "invoice_volume", "po_percentage", "non_po_percentage",
+    "po_touchless_percentage", "automatic_distribution"
+]
+MULTI_SELECT_FIELDS = ["erp_system", "product_activations"]
+# Criteria attribute -> FIELD_MAPPING key for the LIKE '%value%' filters
+LIKE_FIELDS = {
+    "account_owner_text": "account_owner",
+    "customer_name": "customer_name",
+    "industry": "industry",
+}
+
+Scorer = Callable[[Dict], float]
+
+def candidate_pool_size(criteria: CustomerCriteria) -> int:
+    # SOQL caps a single query page at 2,000 rows
+    return min(2000, max(criteria.limit, settings.RANKING_CANDIDATE_POOL))
+
+def _number(value) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+def _text_scorer(path: str, needles: List[str]) -> Scorer:
+    """1 for an exact match, 0.75 for a prefix, 0.5 anywhere else"""
+    get = compile_accessor(path, default=None)
+    needles = [needle.lower() for needle in needles]
+
+    def score(record: Dict) -> float:
+        value = (get(record) or "").lower()
+        if value in needles:
+            return 1.0
+        return 0.75 if value.startswith(tuple(needles)) else 0.5
+    return score
+
+def _multi_select_scorer(path: str) -> Scorer:
+    """Customers on fewer other values are the clearer reference for this one"""
+    get = compile_accessor(path, default=None)
+
+    def score(record: Dict) -> float:
+        items = [item for item in (get(record) or "").split(";") if item.strip()]
+        return 0.5 + 0.5 / max(1, len(items))
+    return score
+
+def _numeric_scorer(path: str, value: float, operator: str) -> Scorer:
+    """How far past the threshold the record is, relative to the threshold"""
+    get = compile_accessor(path, default=None)
+    scale = max(abs(value), 1.0)
+
+    def score(record: Dict) -> float:
+        actual = _number(get(record))
+        if actual is None:
+            return 0.0
+        if operator in (">", ">="):
+            margin = actual - value
+        elif operator in ("<", "<="):
+            margin = value - actual
+        else:
+            return 1.0 if actual == value else 0.0
+        return 0.5 + 0.5 * min(1.0, max(0.0, margin / scale))
+    return score
+
+def compile_scorer(criteria: CustomerCriteria) -> Scorer:
+    """Score a record for the criteria: match quality, invoice volume and automation, each 0..1"""
+    match_scorers: List[Scorer] = []
+    for attr_name, field in LIKE_FIELDS.items():
+        values = criteria_values(getattr(criteria, attr_name))
+        if values:
+            match_scorers.append(_text_scorer(FIELD_MAPPING[field], values))
+    for field in MULTI_SELECT_FIELDS:
+        if getattr(criteria, field):
+            match_scorers.append(_multi_select_scorer(FIELD_MAPPING[field]))
+    for field in NUMERIC_FIELDS:
+        attr_value = getattr(criteria, field)
+        if attr_value is None:
+            continue
+        if isinstance(attr_value, NumericCriteria):
+            value, operator = attr_value.value, attr_value.operator
+        else:
+            value, operator = attr_value, ">="
+        match_scorers.append(_numeric_scorer(FIELD_MAPPING[field], value, operator))
+
+    get_volume = compile_accessor(FIELD_MAPPING["invoice_volume"], default=None)
+    get_automation = [compile_accessor(FIELD_MAPPING[field], default=None) for field in AUTOMATION_FIELDS]
+    volume_norm = math.log1p(VOLUME_SCALE)
+
+    def score(record: Dict) -> float:
+        match = sum(s(record) for s in match_scorers) / len(match_scorers) if match_scorers else 1.0
+        volume = _number(get_volume(record)) or 0.0
+        volume_score = min(1.0, math.log1p(max(volume, 0.0)) / volume_norm)
+        automation = sum((_number(get(record)) or 0.0) for get in get_automation) / (100.0 * len(get_automation))
+        return (
+            MATCH_WEIGHT * match
+            + VOLUME_WEIGHT * volume_score
+            + AUTOMATION_WEIGHT * min(1.0, max(0.0, automation))
+        )
+    return score
+
+def top_k(records: List[Dict], criteria: CustomerCriteria, k: int) -> List[Dict]:
+    """The k best-scoring records, best first, in O(n log k); ties keep the candidate order"""
+    score = compile_scorer(criteria)
+    return heapq.nlargest(k, records, key=score)
@@ -0,0 +1,137 @@
+#services/replay.py
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+from config.settings import settings
+from utils.logger import logger
+from utils.metrics import registry
+
+T = TypeVar("T")
+
+MODES = ("off", "record", "replay")
+LATENCIES = ("original", "zero")
+
+class ReplayMissError(LookupError):
+    """Raised in replay mode for a request that was never recorded"""
+
+def request_key(kind: str, request: Any) -> str:
+    """Content address of a request: SHA-256 of its canonical JSON"""
+    canonical = json.dumps({"kind": kind, "request": request}, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def _pack(value: Any) -> bytes:
+    return zlib.compress(json.dumps(value, separators=(",", ":"), default=str).encode("utf-8"))
+
+def _unpack(blob: bytes) -> Any:
+    return json.loads(zlib.decompress(blob))
+
+class ReplayStore:
+    """Recorded LLM and Salesforce responses, keyed on the content of the request.
+
+    In "record" mode each call goes to the backend and its JSON response is
+    stored zlib-compressed in a SQLite file with the call's latency. In
+    "replay" mode calls are answered from the file, after the recorded
+    latency ("original") or at once ("zero"), and never reach a backend; a
+    request that was not recorded raises ReplayMissError. "off" calls through.
+    """
+
+    def __init__(self, path: str, mode: str = "off", latency: str = "original"):
+        if mode not in MODES:
+            raise ValueError(f"Unknown replay mode '{mode}' (expected one of {MODES})")
+        if latency not in LATENCIES:
+            raise ValueError(f"Unknown replay latency '{latency}' (expected one of {LATENCIES})")
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self.recorded = 0
+        self.replayed = 0
+        self.missed = 0
+        self._lock = threading.Lock()
+        self._db = None
+        if mode != "off":
+            self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS replay ("
+                "key TEXT PRIMARY KEY, kind TEXT NOT NULL, request BLOB NOT NULL, "
+                "response BLOB NOT NULL, latency REAL NOT NULL, recorded_at REAL NOT NULL)"
+            )
+            self._db.commit()
+            logger.info(f"Replay store '{path}' in {mode} mode")
+
+    def _lookup(self, kind: str, request: Any) -> Tuple[Any, float]:
+        key = request_key(kind, request)
+        with self._lock:
+            row = self._db.execute("SELECT response, latency FROM replay WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.missed += 1
+                raise ReplayMissError(f"No recorded {kind} response for request {key[:12]}")
+            self.replayed += 1
+        response, latency = row
+        return _unpack(response), (latency if self.latency == "original" else 0.0)
+
+    def _record(self, kind: str, request: Any, response: Any, latency: float):
+        key = request_key(kind, request)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO replay (key, kind, request, response, latency, recorded_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, kind, _pack(request), _pack(response), latency, time.time())
+            )
+            self._db.commit()
+            self.recorded += 1
+
+    def call(self, kind: str, request: Any, compute: Callable[[], T]) -> T:
+        """compute() (the backend call for `request`) recorded or replayed per the mode"""
+        if self.mode == "replay":
+            response, delay = self._lookup(kind, request)
+            if delay > 0:
+                time.sleep(delay)
+            return response
+        started = time.perf_counter()
+        response = compute()
+        if self.mode == "record":
+            self._record(kind, request, response, time.perf_counter() - started)
+        return response
+
+    async def acall(self, kind: str, request: Any, compute: Callable[[], Awaitable[T]]) -> T:
+        """Async call(); the recorded latency is awaited without blocking the event loop"""
+        if self.mode == "replay":
+            response, delay = self._lookup(kind, request)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            return response
+        started = time.perf_counter()
+        response = await compute()
+        if self.mode == "record":
+            self._record(kind, request, response, time.perf_counter() - started)
+        return response
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {"recorded": self.recorded, "replayed": self.replayed, "missed": self.missed}
+
+_store: Optional[ReplayStore] = None
+_store_lock = threading.Lock()
+
+def get_replay_store() -> ReplayStore:
+    """The store configured by REPLAY_MODE, REPLAY_STORE and REPLAY_LATENCY"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ReplayStore(settings.REPLAY_STORE, settings.REPLAY_MODE, settings.REPLAY_LATENCY)
+                registry.gauge_callback("reference_agent_replay", "Replay store counters", _store.stats)
+    return _store
+
+def set_replay_store(store: ReplayStore):
+    """Use the given store instead of the configured one (benchmarks, load tests)"""
+    global _store
+    with _store_lock:
+        _store = store
@@ -0,0 +1,274 @@
+#services/replica.py
+
+import argparse
+import sqlite3
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from config.field_mapping import FIELD_MAPPING
+from config.settings import settings
+from models.criteria import CustomerCriteria, NumericCriteria, criteria_values
+from services.query_executor import iter_salesforce_records
+from services.query_plan import COMPARISON_OPERATORS
+from services.resilience import time_left
+from utils.formatter import get_nested_value
+from utils.logger import logger
+
+# Replicated columns: one per FIELD_MAPPING key, plus the record Id and modstamp
+REPLICA_COLUMNS = [key for key in FIELD_MAPPING if key != "is_latest"]
+NUMERIC_COLUMNS = [
+    "invoice_volume", "po_percentage", "non_po_percentage",
+    "po_touchless_percentage", "automatic_distribution"
+]
+MULTI_SELECT_COLUMNS = ["erp_system", "product_activations"]
+
+_SELECT_FIELDS = ", ".join(
+    ["Id", "SystemModstamp", FIELD_MAPPING["is_latest"], *(FIELD_MAPPING[c] for c in REPLICA_COLUMNS)]
+)
+
+def _soql_datetime(modstamp: str) -> str:
+    """Convert a Salesforce SystemModstamp to a SOQL datetime literal"""
+    parsed = datetime.strptime(modstamp, "%Y-%m-%dT%H:%M:%S.%f%z")
+    return parsed.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def _to_record(row: sqlite3.Row) -> Dict[str, Any]:
+    """Rebuild the nested Salesforce record shape the formatter expects"""
+    record: Dict[str, Any] = {"Id": row["id"]}
+    for column in REPLICA_COLUMNS:
+        target = record
+        *parents, leaf = FIELD_MAPPING[column].split(".")
+        for parent in parents:
+            target = target.setdefault(parent, {})
+        target[leaf] = row[column]
+    return record
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+class CustomerReplica:
+    """Local SQLite copy of the latest Usage_statistic__c rows.
+
+    A separate job keeps it current (see main()); the app only reads from it and
+    checks staleness_seconds() before trusting it over a live Salesforce query.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            columns = ", ".join(
+                f"{c} REAL" if c in NUMERIC_COLUMNS else f"{c} TEXT" for c in REPLICA_COLUMNS
+            )
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS usage_statistic "
+                f"(id TEXT PRIMARY KEY, system_modstamp TEXT, {columns})"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS replica_meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """A connection in a transaction that commits on success; closed on exit.
+
+        Under a stage deadline (see services.resilience.deadline) statements are
+        interrupted once it passes, and raise TimeoutError.
+        """
+        left = time_left()
+        conn = sqlite3.connect(self.db_path, timeout=30 if left is None else max(0.0, min(30, left)))
+        conn.row_factory = sqlite3.Row
+        if left is not None:
+            # Polled every few thousand VM instructions; a non-zero return interrupts the statement
+            conn.set_progress_handler(lambda: time_left() <= 0, 10_000)
+        try:
+            with conn:
+                yield conn
+        except sqlite3.OperationalError as e:
+            if left is not None and time_left() <= 0:
+                raise TimeoutError("Replica query abandoned: its stage deadline passed") from e
+            raise
+        finally:
+            conn.close()
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM replica_meta WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else None
+
+    @staticmethod
+    def _set_meta(conn: sqlite3.Connection, key: str, value: str):
+        conn.execute("INSERT OR REPLACE INTO replica_meta (key, value) VALUES (?, ?)", (key, value))
+
+    def last_sync_at(self) -> Optional[float]:
+        value = self._get_meta("last_sync_at")
+        return float(value) if value else None
+
+    def staleness_seconds(self) -> Optional[float]:
+        """Seconds since the last successful sync, or None if never synced"""
+        last_sync = self.last_sync_at()
+        return time.time() - last_sync if last_sync else None
+
+    def is_fresh(self) -> bool:
+        staleness = self.staleness_seconds()
+        return staleness is not None and staleness <= settings.REPLICA_MAX_STALENESS_SECONDS
+
+    def _apply(self, conn: sqlite3.Connection, records: Iterable[Dict]) -> Tuple[int, int, Optional[str]]:
+        """Upsert latest rows and drop rows that are no longer latest"""
+        upserted = deleted = 0
+        watermark = None
+        placeholders = ", ".join("?" for _ in range(len(REPLICA_COLUMNS) + 2))
+        for record in records:
+            modstamp = record.get("SystemModstamp")
+            if modstamp and (watermark is None or modstamp > watermark):
+                watermark = modstamp
+            if not record.get(FIELD_MAPPING["is_latest"]):
+                deleted += conn.execute("DELETE FROM usage_statistic WHERE id = ?", (record["Id"],)).rowcount
+                continue
+            values = [get_nested_value(record, FIELD_MAPPING[c], default=None) for c in REPLICA_COLUMNS]
+            conn.execute(
+                f"INSERT OR REPLACE INTO usage_statistic (id, system_modstamp, {', '.join(REPLICA_COLUMNS)}) "
+                f"VALUES ({placeholders})",
+                [record["Id"], modstamp, *values]
+            )
+            upserted += 1
+        return upserted, deleted, watermark
+
+    def full_load(self, records: Iterable[Dict]):
+        """Replace the replica contents with a full extract"""
+        started = time.time()
+        with self._connect() as conn:
+            conn.execute("DELETE FROM usage_statistic")
+            upserted, _, watermark = self._apply(conn, records)
+            self._set_meta(conn, "watermark", watermark or "")
+            self._set_meta(conn, "last_full_load_at", str(started))
+            self._set_meta(conn, "last_sync_at", str(started))
+        logger.info(f"Replica full load complete: {upserted} rows in {time.time() - started:.1f}s")
+
+    def apply_delta(self, records: Iterable[Dict]):
+        """Merge records modified since the last watermark"""
+        started = time.time()
+        with self._connect() as conn:
+            upserted, deleted, watermark = self._apply(conn, records)
+            if watermark:
+                self._set_meta(conn, "watermark", max(watermark, self._get_meta("watermark") or ""))
+            self._set_meta(conn, "last_sync_at", str(started))
+        logger.info(f"Replica delta sync complete: {upserted} upserted, {deleted} removed")
+
+    def needs_full_load(self) -> bool:
+        last_full_load = self._get_meta("last_full_load_at")
+        if not last_full_load or not self._get_meta("watermark"):
+            return True
+        return time.time() - float(last_full_load) > settings.REPLICA_FULL_RELOAD_SECONDS
+
+    def full_load_query(self) -> str:
+        return f"SELECT {_SELECT_FIELDS} FROM Usage_statistic__c WHERE {FIELD_MAPPING['is_latest']} = true"
+
+    def delta_query(self) -> str:
+        # Parent Account edits do not bump the child's SystemModstamp, so check both
+        since = _soql_datetime(self._get_meta("watermark"))
+        return (
+            f"SELECT {_SELECT_FIELDS} FROM Usage_statistic__c "
+            f"WHERE SystemModstamp >= {since} OR Account__r.SystemModstamp >= {since}"
+        )
+
+    def records(self) -> List[Dict]:
+        """Every replicated row in the Salesforce record shape"""
+        with self._connect() as conn:
+            return [_to_record(row) for row in conn.execute("SELECT * FROM usage_statistic")]
+
+    def query(self, criteria: CustomerCriteria, pool: Optional[int] = None) -> List[Dict]:
+        """Evaluate the criteria locally with the same semantics as build_soql_query.
+
+        With `pool`, return up to that many matches by largest invoice volume,
+        as build_soql_query(ranked=True) does, instead of the first criteria.limit.
+        """
+        conditions = ["customer_type = 'Customer' COLLATE NOCASE"]
+        params: List[Any] = []
+
+        like_fields = [
+            ("account_owner_text", "account_owner"),
+            ("customer_name", "customer_name"),
+            ("industry", "industry"),
+        ]
+        for attr_name, column in like_fields:
+            value = getattr(criteria, attr_name)
+            if isinstance(value, list):
+                conditions.append(f"lower({column}) IN ({', '.join('?' for _ in value)})")
+                params.extend(item.lower() for item in value)
+            elif value is not None:
+                # Wildcards in the value match literally, as soql_like_contains escapes them
+                conditions.append(f"{column} LIKE ? ESCAPE '\\'")
+                params.append(f"%{_escape_like(value)}%")
+        for column in MULTI_SELECT_COLUMNS:
+            values = criteria_values(getattr(criteria, column))
+            if values:
+                # INCLUDES: any of the values is selected
+                conditions.append(
+                    "(" + " OR ".join(f"(';' || lower({column}) || ';') LIKE ?" for _ in values) + ")"
+                )
+                params.extend(f"%;{value.lower()};%" for value in values)
+        for column in NUMERIC_COLUMNS:
+            attr_value = getattr(criteria, column)
+            if attr_value is None:
+                continue
+            if isinstance(attr_value, NumericCriteria):
+                value, operator = attr_value.value, attr_value.operator
+            else:
+                value, operator = attr_value, ">="
+            if operator not in COMPARISON_OPERATORS:
+                raise ValueError(f"Unsupported operator '{operator}' for {column}")
+            if operator == "!=":
+                # SOQL != also matches rows where the field is null
+                conditions.append(f"({column} IS NULL OR {column} != ?)")
+            else:
+                conditions.append(f"{column} {operator} ?")
+            params.append(value)
+
+        sql = f"SELECT * FROM usage_statistic WHERE {' AND '.join(conditions)}"
+        if pool is not None:
+            sql += " ORDER BY invoice_volume IS NULL, invoice_volume DESC"
+        sql += " LIMIT ?"
+        params.append(pool if pool is not None else criteria.limit)
+        started = time.perf_counter()
+        with self._connect() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        logger.info(f"Replica returned {len(rows)} records in {(time.perf_counter() - started) * 1000:.1f} ms")
+        return [_to_record(row) for row in rows]
+
+_replica: Optional[CustomerReplica] = None
+
+def get_replica() -> Optional[CustomerReplica]:
+    """Return the configured replica, or None when REPLICA_DB_PATH is not set"""
+    global _replica
+    if _replica is None and settings.REPLICA_DB_PATH:
+        _replica = CustomerReplica(settings.REPLICA_DB_PATH)
+    return _replica
+
+def sync_replica(replica: CustomerReplica, full: bool = False):
+    """Run one full or incremental sync against Salesforce"""
+    if full or replica.needs_full_load():
+        replica.full_load(iter_salesforce_records(replica.full_load_query()))
+    else:
+        replica.apply_delta(iter_salesforce_records(replica.delta_query()))
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync the local Usage_statistic__c replica")
+    parser.add_argument("--db", default=settings.REPLICA_DB_PATH, help="SQLite database path")
+    parser.add_argument("--full", action="store_true", help="Force a full reload")
+    parser.add_argument("--interval", type=int, default=0, help="Keep syncing every N seconds")
+    args = parser.parse_args()
+    if not args.db:
+        parser.error("Set REPLICA_DB_PATH or pass --db")
+
+    replica = CustomerReplica(args.db)
+    while True:
+        try:
+            sync_replica(replica, full=args.full)
+        except Exception as e:
+            logger.error(f"Replica sync failed: {str(e)}", exc_info=True)
+        if not args.interval:
+            break
+        args.full = False
+        time.sleep(args.interval)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+#services/resilience.py
+
+import asyncio
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Dict, Iterator, Optional, TypeVar
+from config.settings import settings
+from services.errors import (
+    BackendError, BackendRequestError, BackendTimeoutError, BackendUnavailableError, CircuitOpenError
+)
+from utils.logger import logger
+from utils.metrics import BACKEND_RETRIES, LLM_HEDGES, STAGE_SECONDS, registry
+
+T = TypeVar("T")
+
+# Statuses worth retrying: throttling and server-side failures
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+
+# Monotonic time the current pipeline stage must finish by; asyncio.to_thread
+# copies it into worker threads, which keep running after a stage times out
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+@contextmanager
+def deadline(seconds: float) -> Iterator[None]:
+    """Give work started in this context (tasks and worker threads too) `seconds` to finish"""
+    at = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(at if current is None else min(current, at))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+def time_left() -> Optional[float]:
+    """Seconds until the current deadline, or None when there is none"""
+    at = _deadline.get()
+    return None if at is None else at - time.monotonic()
+
+def check_deadline(what: str):
+    """Raise TimeoutError once the current deadline has passed"""
+    left = time_left()
+    if left is not None and left <= 0:
+        raise TimeoutError(f"{what} abandoned: its stage deadline passed")
+
+def classify(backend: str, error: BaseException) -> Optional[BackendError]:
+    """The BackendError for a failed call, or None for errors that are not the backend's (bugs)"""
+    import httpx
+    import openai
+    import requests
+
+    if isinstance(error, BackendError):
+        return error
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, requests.Timeout,
+                          httpx.TimeoutException, openai.APITimeoutError)):
+        return BackendTimeoutError(backend, f"no answer within the deadline ({type(error).__name__})")
+    if isinstance(error, (ConnectionError, requests.ConnectionError, httpx.TransportError, openai.APIConnectionError)):
+        return BackendUnavailableError(backend, f"connection failed: {error}")
+    # openai errors carry status_code, simple_salesforce errors status
+    status = getattr(error, "status_code", None) or getattr(error, "status", None)
+    if isinstance(status, int):
+        if status in RETRYABLE_STATUSES:
+            return BackendUnavailableError(backend, f"HTTP {status}: {error}")
+        return BackendRequestError(backend, f"HTTP {status}: {error}", status)
+    return None
+
+class CircuitBreaker:
+    """Fails calls fast once a backend has failed `threshold` times in a row.
+
+    The circuit stays open for `reset_seconds`; then one trial call is let
+    through (half-open) and its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, backend: str, threshold: int, reset_seconds: float):
+        self.backend = backend
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            return "half_open" if time.monotonic() - self.opened_at >= self.reset_seconds else "open"
+
+    def before_call(self):
+        with self._lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < self.reset_seconds or self._trial_in_flight:
+                raise CircuitOpenError(self.backend, f"failing fast after {self.failures} consecutive failures")
+            self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            if self.opened_at is not None:
+                logger.info(f"Circuit for {self.backend} closed")
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_in_flight or (self.opened_at is None and self.failures >= self.threshold):
+                logger.warning(f"Circuit for {self.backend} opened after {self.failures} consecutive failures")
+                self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def record_neutral(self):
+        """The call ended without telling whether the backend is healthy (e.g. it was cancelled)"""
+        with self._lock:
+            self._trial_in_flight = False
+
+class BackendPolicy:
+    """Per-call deadline, jittered retries and a circuit breaker for one backend.
+
+    Timeouts, connection errors, 429 and 5xx are retried up to `attempts`
+    times with full-jitter exponential backoff and count against the circuit;
+    rejected requests (other 4xx) fail at once. Every failure is raised as a
+    BackendError subclass.
+    """
+
+    def __init__(self, backend: str, timeout: float, attempts: int, base_delay: float, max_delay: float,
+                 breaker: CircuitBreaker):
+        self.backend = backend
+        self.timeout = timeout
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _failed(self, error: BaseException, attempt: int) -> float:
+        """Record a failed attempt; return the delay before retrying, or raise"""
+        backend_error = classify(self.backend, error)
+        if backend_error is None:
+            self.breaker.record_neutral()
+            raise error
+        if isinstance(backend_error, BackendRequestError):
+            # The request is at fault, not the backend
+            self.breaker.record_neutral()
+            raise backend_error from error
+        self.breaker.record_failure()
+        if attempt + 1 >= self.attempts:
+            raise backend_error from error
+        delay = self.backoff(attempt)
+        left = time_left()
+        if left is not None and left <= delay:
+            # The stage has given up (or will have) before another attempt could start
+            raise backend_error from error
+        BACKEND_RETRIES.inc(backend=self.backend)
+        logger.warning(f"{backend_error}; retrying in {delay:.2f}s (attempt {attempt + 2}/{self.attempts})")
+        return delay
+
+    def call(self, operation: Callable[[], T]) -> T:
+        """Run a blocking call; its client enforces the per-call timeout (see ClientManager).
+
+        No attempt starts after the stage deadline, so a worker thread whose
+        stage timed out stops instead of retrying on behalf of nobody.
+        """
+        for attempt in range(self.attempts):
+            check_deadline(f"{self.backend} call")
+            self.breaker.before_call()
+            try:
+                result = operation()
+            except Exception as e:
+                time.sleep(self._failed(e, attempt))
+                continue
+            self.breaker.record_success()
+            return result
+
+    def attempt_timeout(self, attempts_left: int) -> float:
+        """The per-call timeout, cut so the attempts still allowed share what is left of the stage.
+
+        Without this a stalled first call would use up most of the stage
+        timeout (a 20s LLM deadline in a 30s parse stage) and no retry could
+        finish before the stage gave up.
+        """
+        left = time_left()
+        if left is None:
+            return self.timeout
+        return max(0.0, min(self.timeout, left / attempts_left))
+
+    async def acall(self, operation: Callable[[], Awaitable[T]],
+                    hedge_after: Optional[Callable[[], float]] = None) -> T:
+        """Await a call under the per-call deadline; with hedge_after, each attempt is hedged"""
+        for attempt in range(self.attempts):
+            timeout = self.attempt_timeout(self.attempts - attempt)
+
+            async def attempt_once() -> T:
+                return await asyncio.wait_for(operation(), timeout)
+
+            self.breaker.before_call()
+            try:
+                if hedge_after is not None:
+                    result = await hedged(attempt_once, hedge_after())
+                else:
+                    result = await attempt_once()
+            except asyncio.CancelledError:
+                self.breaker.record_neutral()
+                raise
+            except Exception as e:
+                await asyncio.sleep(self._failed(e, attempt))
+                continue
+            self.breaker.record_success()
+            return result
+
+async def hedged(operation: Callable[[], Awaitable[T]], delay: float) -> T:
+    """Run operation(); if it has not finished after `delay` seconds, start a
+    duplicate and return whichever succeeds first, cancelling the other"""
+    first = asyncio.ensure_future(operation())
+    tasks = [first]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if done:
+            return first.result()
+        logger.info(f"LLM call still running after {delay:.2f}s; sending a hedged request")
+        tasks.append(asyncio.ensure_future(operation()))
+        pending = set(tasks)
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    LLM_HEDGES.inc(winner="original" if task is first else "hedge")
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+
+def llm_hedge_delay() -> float:
+    """The LLM's observed p95 latency, or LLM_HEDGE_AFTER_SECONDS until there are enough samples"""
+    if STAGE_SECONDS.count(stage="llm") < settings.LLM_HEDGE_MIN_SAMPLES:
+        return settings.LLM_HEDGE_AFTER_SECONDS
+    return STAGE_SECONDS.quantile(0.95, stage="llm")
+
+def _breaker_states() -> Dict[str, float]:
+    # 0 closed, 1 half-open, 2 open
+    codes = {"closed": 0, "half_open": 1, "open": 2}
+    return {policy.backend: codes[policy.breaker.state] for policy in (llm_policy, salesforce_policy)}
+
+llm_policy = BackendPolicy(
+    "llm", settings.LLM_REQUEST_TIMEOUT_SECONDS, settings.RETRY_ATTEMPTS,
+    settings.RETRY_BASE_DELAY_SECONDS, settings.RETRY_MAX_DELAY_SECONDS,
+    CircuitBreaker("llm", settings.CIRCUIT_FAILURE_THRESHOLD, settings.CIRCUIT_RESET_SECONDS)
+)
+salesforce_policy = BackendPolicy(
+    "salesforce", settings.SALESFORCE_REQUEST_TIMEOUT_SECONDS, settings.RETRY_ATTEMPTS,
+    settings.RETRY_BASE_DELAY_SECONDS, settings.RETRY_MAX_DELAY_SECONDS,
+    CircuitBreaker("salesforce", settings.CIRCUIT_FAILURE_THRESHOLD, settings.CIRCUIT_RESET_SECONDS)
+)
+
+registry.gauge_callback("reference_agent_circuit_state", "Circuit state (0 closed, 1 half-open, 2 open)", _breaker_states)
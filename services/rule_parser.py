@@ -0,0 +1,238 @@
+#services/rule_parser.py
+
+import re
+from typing import Dict, List, Optional, Tuple
+from models.criteria import CustomerCriteria
+from config.settings import settings
+from config.static_lists import ERP_SYSTEMS, INDUSTRIES, PRODUCT_ACTIVATIONS
+from utils.logger import logger
+
+# Operator phrases, mirroring the ones the LLM prompt template describes
+OPERATOR_PHRASES = {
+    "=": ["exactly", "equal to", "equals", "="],
+    "<": ["less than", "fewer than", "lower than", "below", "under", "<"],
+    "<=": ["at most", "no more than", "not more than", "maximum", "max", "up to", "<="],
+    ">": ["more than", "greater than", "higher than", "above", "over", "exceeding", ">"],
+    ">=": ["at least", "no less than", "not less than", "minimum", "min", ">="],
+}
+
+# Metric phrases mapped to criteria fields; more specific phrases come first
+METRIC_PATTERNS = [
+    ("po_touchless_percentage", r"(?:po\s+)?touchless(?:\s+po)?(?:\s+(?:rate|percentage|share))?"),
+    ("non_po_percentage", r"non[\s\-]?po(?:\s+invoices)?(?:\s+(?:rate|percentage|share))?"),
+    ("automatic_distribution", r"auto(?:matic)?[\s\-]?dist(?:ribution)?(?:\s+(?:rate|percentage|share))?"),
+    ("po_percentage", r"po(?:\s+invoices)?(?:\s+(?:rate|percentage|share))?"),
+    ("invoice_volume", r"invoice\s+volume|invoices"),
+]
+
+PERCENTAGE_FIELDS = {"po_percentage", "non_po_percentage", "po_touchless_percentage", "automatic_distribution"}
+
+# Words that carry no criteria on their own and never lower the confidence
+FILLER_WORDS = {
+    "a", "all", "an", "and", "any", "are", "by", "can", "client", "clients", "companies", "company",
+    "customer", "customers", "erp", "erps", "find", "for", "from", "get", "give", "has", "have",
+    "having", "i", "in", "industry", "is", "list", "looking", "me", "need", "of", "on", "or", "please",
+    "reference", "references", "running", "sector", "show", "some", "system", "systems", "that",
+    "the", "their", "to", "top", "use", "uses", "using", "via", "want", "which", "who", "whose",
+    "with", "account", "accounts", "activated", "activation", "activations", "product", "products",
+    "either", "just", "now", "only", "ones", "these", "those", "them", "among",
+}
+
+_OPERATOR_LOOKUP = {phrase: op for op, phrases in OPERATOR_PHRASES.items() for phrase in phrases}
+_OPERATOR = "|".join(
+    re.escape(phrase).replace(r"\ ", r"\s+")
+    for phrase in sorted(_OPERATOR_LOOKUP, key=len, reverse=True)
+)
+_NUMBER = r"(?P<number>\d+(?:[.,]\d+)*)\s*(?P<scale>k|m|thousand|million)?\s*(?P<percent>%|percent)?"
+_METRIC = "|".join(f"(?P<{field}>{pattern})" for field, pattern in METRIC_PATTERNS)
+
+# "less than 30% po touchless", "more than 10k invoices"
+_OPERATOR_FIRST = re.compile(
+    rf"(?<![\w])(?P<operator>{_OPERATOR})\s*{_NUMBER}\s+(?:of\s+)?(?:{_METRIC})(?![\w])"
+)
+# "po touchless below 30%", "invoice volume of at least 10000"
+_METRIC_FIRST = re.compile(
+    rf"(?<![\w])(?:{_METRIC})\s+(?:(?:of|is|at)\s+)?(?P<operator>{_OPERATOR})\s*{_NUMBER}(?![\w])"
+)
+# "5 retail customers", "top 10 clients on SAP"
+_LIMIT = re.compile(
+    r"(?<![\w.,])(?P<limit>\d+)(?=\s+(?:[^\s\d]+\s+){0,4}?(?:customers?|clients?|references?|accounts?|companies)\b)"
+)
+_TOKEN = re.compile(r"[\w%<>=&/\-+.]+")
+# Numbers read the same in every locale: "10,000", "10,000.5", "10000", "12.5".
+# "10.000" and "1,5" (European separators) are left to the LLM.
+_UNAMBIGUOUS_NUMBER = re.compile(r"\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?")
+_DOT_GROUPING = re.compile(r"\d{1,3}\.\d{3}")
+# Between two values of one field: only "or" (with commas before it in a list)
+# means any of them; "SAP and Oracle" may mean customers on both
+_OR_JOINER = re.compile(r"\b(?:or|either)\b")
+_AND_JOINER = re.compile(r"\b(?:and|both|plus)\b|&")
+
+_SCALES = {"k": 1_000, "thousand": 1_000, "m": 1_000_000, "million": 1_000_000}
+
+def _compile_vocabulary(values: List[str]) -> re.Pattern:
+    alternatives = sorted((re.escape(value.casefold()) for value in values), key=len, reverse=True)
+    return re.compile(rf"(?<![\w])(?:{'|'.join(alternatives)})(?![\w])")
+
+VOCABULARIES = [
+    # (criteria field, values, case-insensitive match allowed for single common words)
+    ("erp_system", ERP_SYSTEMS, False),
+    ("industry", INDUSTRIES, True),
+    ("product_activations", PRODUCT_ACTIVATIONS, False),
+]
+_VOCABULARY_PATTERNS = [
+    (field, _compile_vocabulary(values), {value.casefold(): value for value in values}, loose)
+    for field, values, loose in VOCABULARIES
+]
+
+# "SAP customers vs Oracle customers", "compare retail to wholesale side by side"
+_COMPARE_PREFIX = re.compile(r"^\s*(?:please\s+)?(?:compare|contrast)\s+", re.I)
+_COMPARE_SEPARATOR = re.compile(r"\s+(?:vs\.?|versus|compared\s+(?:to|with))\s+", re.I)
+# After a leading "compare", "to" also separates the sides ("and" is left to
+# the single query, see _is_any_of; "up to" is an operator)
+_COMPARE_PREFIXED_SEPARATOR = re.compile(r"\s+(?:vs\.?|versus|compared\s+(?:to|with)|(?<!\bup\s)to)\s+", re.I)
+_SIDE_BY_SIDE = re.compile(r"[\s,]*\bside[\s\-]by[\s\-]side\b[\s,.?!]*", re.I)
+
+def split_comparison(prompt: str) -> List[str]:
+    """Split a side-by-side comparison into its independent sub-prompts.
+
+    Returns an empty list when the prompt does not compare two or more groups.
+    """
+    text = _SIDE_BY_SIDE.sub(" ", prompt).strip().rstrip("?.!")
+    prefix = _COMPARE_PREFIX.match(text)
+    if prefix:
+        sides = _COMPARE_PREFIXED_SEPARATOR.split(text[prefix.end():])
+    else:
+        sides = _COMPARE_SEPARATOR.split(text)
+    sides = [side.strip(" ,") for side in sides if side.strip(" ,")]
+    return sides if len(sides) > 1 else []
+
+# Follow-ups that point back at the previous answer: "which of those are in
+# retail?", "only those on SAP", "keep just these"
+_ANAPHORIC_REFINEMENT = re.compile(
+    r"\b(?:of|from|among)\s+(?:those|these|them|the\s+(?:results|list))\b"
+    r"|\b(?:only|just|keep)\s+(?:those|these|them)\b",
+    re.I
+)
+# Follow-ups that narrow without naming what: "now just above 50% touchless",
+# "the ones on SAP", "filter to retail". They count only when the prompt names
+# no population of its own: "just show me SAP customers" is a new search.
+_NARROWING = re.compile(
+    r"^\s*(?:(?:ok(?:ay)?|and|but|now|then)[\s,]+)*(?:only|just|filter|narrow|keep)\b|\bthe\s+ones\b",
+    re.I
+)
+_POPULATION = re.compile(r"\b(?:customers?|clients?|compan(?:y|ies)|accounts?|references?)\b", re.I)
+
+def is_refinement(prompt: str) -> bool:
+    """Whether the prompt refines the previous answer rather than starting a new search"""
+    if _ANAPHORIC_REFINEMENT.search(prompt):
+        return True
+    return bool(_NARROWING.search(prompt)) and not _POPULATION.search(prompt)
+
+def _is_unambiguous_number(number: str) -> bool:
+    return bool(_UNAMBIGUOUS_NUMBER.fullmatch(number)) and not _DOT_GROUPING.fullmatch(number)
+
+def _parse_number(match: re.Match) -> float:
+    number = match.group("number").replace(",", "")
+    value = float(number) * _SCALES.get((match.group("scale") or "").lower(), 1)
+    return int(value) if value.is_integer() else value
+
+def _matched_field(match: re.Match) -> str:
+    return next(field for field, _ in METRIC_PATTERNS if match.group(field))
+
+def _mask(text: str, start: int, end: int) -> str:
+    return text[:start] + " " * (end - start) + text[end:]
+
+def _count_tokens(text: str) -> int:
+    return len(_TOKEN.findall(text))
+
+def _is_any_of(gaps: List[str]) -> bool:
+    """Whether the text between consecutive values of one field lists alternatives ("A, B or C")"""
+    if any(_AND_JOINER.search(gap) for gap in gaps):
+        return False
+    return bool(_OR_JOINER.search(gaps[-1])) and all(_OR_JOINER.search(gap) or gap.strip() == "," for gap in gaps)
+
+def _accept_vocabulary_hit(prompt: str, start: int, end: int, value: str, loose: bool) -> bool:
+    """Single common words (e.g. 'Advanced', 'Capture') only count when typed in their listed casing"""
+    if loose or not value.isalpha() or " " in value:
+        return True
+    return prompt[start:end] == value
+
+def parse_criteria_rules(prompt: str) -> Tuple[Optional[CustomerCriteria], float]:
+    """Extract criteria from common prompt patterns without calling the LLM.
+
+    Returns the criteria (or None) and a confidence between 0 and 1: the share of
+    meaningful prompt words that were explained by an extracted criterion.
+    """
+    text = prompt.casefold()
+    if len(text) != len(prompt):
+        prompt = text  # casefolding changed offsets; fall back to case-insensitive checks
+    remaining = text
+    values: Dict[str, object] = {}
+    matched_tokens = 0
+    ambiguous: List[str] = []
+
+    for pattern in (_OPERATOR_FIRST, _METRIC_FIRST):
+        for match in pattern.finditer(text):
+            if remaining[match.start():match.end()] != match.group(0):
+                continue  # overlaps a clause that was already consumed
+            field = _matched_field(match)
+            if field in values:
+                return None, 0.0
+            if match.group("percent") and field not in PERCENTAGE_FIELDS:
+                return None, 0.0
+            remaining = _mask(remaining, match.start(), match.end())
+            if not _is_unambiguous_number(match.group("number")):
+                # "10.000" may be ten or ten thousand: keep the clause out of the criteria
+                ambiguous.append(match.group("number"))
+                continue
+            operator = _OPERATOR_LOOKUP[re.sub(r"\s+", " ", match.group("operator"))]
+            values[field] = {"value": _parse_number(match), "operator": operator}
+            matched_tokens += _count_tokens(match.group(0))
+
+    spans: Dict[str, List[Tuple[int, int]]] = {}
+    for field, vocabulary, canonical, loose in _VOCABULARY_PATTERNS:
+        for match in vocabulary.finditer(remaining):
+            value = canonical[match.group(0)]
+            if not _accept_vocabulary_hit(prompt, match.start(), match.end(), value, loose):
+                continue
+            # Several values mean any of them ("SAP or Oracle")
+            found = values.setdefault(field, [])
+            if value not in found:
+                found.append(value)
+            spans.setdefault(field, []).append((match.start(), match.end()))
+            matched_tokens += _count_tokens(match.group(0))
+            remaining = _mask(remaining, match.start(), match.end())
+
+    limit_matches = list(_LIMIT.finditer(remaining))
+    if len(limit_matches) > 1:
+        return None, 0.0
+    if limit_matches:
+        limit = int(limit_matches[0].group("limit"))
+        if not 0 < limit <= settings.MAX_RESULT_LIMIT:
+            return None, 0.0
+        values["limit"] = limit
+        matched_tokens += 1
+        remaining = _mask(remaining, limit_matches[0].start(), limit_matches[0].end())
+
+    if not matched_tokens:
+        return None, 0.0
+
+    words = (token.strip(".,-") for token in _TOKEN.findall(remaining))
+    unexplained = [word for word in words if word and word not in FILLER_WORDS] + ambiguous
+    for field, field_spans in spans.items():
+        field_spans.sort()
+        gaps = [remaining[end:start] for (_, end), (start, _) in zip(field_spans, field_spans[1:])]
+        if gaps and not _is_any_of(gaps):
+            # Leave "all of" versus "any of" to the LLM
+            unexplained.append(f"<{field} joiner>")
+    confidence = matched_tokens / (matched_tokens + len(unexplained))
+
+    try:
+        criteria = CustomerCriteria(**values)
+    except ValueError as e:
+        logger.info(f"Rule-based criteria rejected: {e}")
+        return None, 0.0
+
+    logger.info(f"Rule-based criteria (confidence {confidence:.2f}): {criteria}; unexplained words: {unexplained}")
+    return criteria, confidence
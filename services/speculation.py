@@ -0,0 +1,79 @@
+#services/speculation.py
+
+import asyncio
+from typing import Dict, List, Optional
+from config.settings import settings
+from models.criteria import CustomerCriteria, stated_fields
+from services.conversation import NON_FILTER_FIELDS, filter_candidates, is_narrower
+from services.query_executor import aquery_salesforce
+from services.query_plan import QueryPlan
+from services.resilience import deadline
+from services.rule_parser import parse_criteria_rules
+from utils.logger import logger
+
+def speculative_criteria(prompt: str) -> Optional[CustomerCriteria]:
+    """A broad guess at the prompt's criteria, or None when there is nothing to guess.
+
+    Only the clauses the rule-based parser recognizes are kept, so the guess
+    usually filters on a subset of what the LLM will return.
+    """
+    criteria, confidence = parse_criteria_rules(prompt)
+    if criteria is None or confidence >= settings.RULE_PARSER_MIN_CONFIDENCE:
+        # Confident rule matches skip the LLM, so there is no latency to overlap
+        return None
+    if not stated_fields(criteria) - NON_FILTER_FIELDS:
+        # A guess without filters would fetch arbitrary customers
+        return None
+    return criteria
+
+class Speculation:
+    """A Salesforce query for a broad criteria guess, run while the LLM parses.
+
+    The query fetches up to SPECULATIVE_PREFETCH_POOL rows. When it returns
+    fewer (every match) and the parsed criteria are narrower than the guess,
+    the answer is filtered from those rows; otherwise the speculation is
+    discarded and the pipeline queries as usual.
+    """
+
+    def __init__(self, criteria: CustomerCriteria, pool: int):
+        self.criteria = criteria
+        self.pool = pool
+        self.soql_query = QueryPlan.from_criteria(criteria, limit=pool).to_soql()
+        logger.info(f"Speculative prefetch for {criteria}: {self.soql_query}")
+        # Cached on the SOQL, so a speculative pool never stands in for a plain result;
+        # the task starts outside any stage, so it gets the parse and query budgets itself
+        with deadline(settings.PARSE_TIMEOUT_SECONDS + settings.QUERY_TIMEOUT_SECONDS):
+            self._task = asyncio.ensure_future(aquery_salesforce(self.soql_query))
+        self._task.add_done_callback(self._consume_error)
+
+    @staticmethod
+    def _consume_error(task: asyncio.Future):
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Speculative prefetch failed: {task.exception()}")
+
+    def cancel(self):
+        self._task.cancel()
+
+    async def candidates(self, criteria: CustomerCriteria) -> Optional[List[Dict]]:
+        """Rows matching the parsed criteria taken from the prefetch, or None"""
+        if not is_narrower(criteria, self.criteria):
+            logger.info(f"Speculative prefetch discarded: {criteria} is not narrower than the guess")
+            self.cancel()
+            return None
+        try:
+            rows = await self._task
+        except Exception:
+            return None
+        if len(rows) >= self.pool:
+            logger.info(f"Speculative prefetch discarded: {len(rows)} rows may not be every match")
+            return None
+        filtered = filter_candidates(rows, criteria)
+        logger.info(f"Speculative prefetch used: {len(filtered)} of {len(rows)} prefetched rows match")
+        return filtered
+
+def start_speculation(prompt: str) -> Optional[Speculation]:
+    """Start the prefetch for the prompt's criteria guess; call from a running event loop"""
+    criteria = speculative_criteria(prompt)
+    if criteria is None:
+        return None
+    return Speculation(criteria, settings.SPECULATIVE_PREFETCH_POOL)
@@ -0,0 +1,15 @@
+from starlette.testclient import TestClient
+
+from services.api import app
+from utils.formatter import display_projector
+
+def test_search_without_matches_returns_an_empty_table(monkeypatch):
+    monkeypatch.setenv("API_FAKE_BACKENDS", "1")
+    with TestClient(app) as client:
+        response = client.post("/search", json={"prompt": "customers with exactly 3 invoices"})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["count"] == 0
+    assert body["rows"] == []
+    assert body["columns"] == display_projector.labels
@@ -0,0 +1,36 @@
+import sqlite3
+import threading
+import time
+
+from services.cache import ResultCache
+
+def test_workers_share_results_through_sqlite(tmp_path):
+    db_path = str(tmp_path / "results.db")
+    first, second = ResultCache(db_path=db_path), ResultCache(db_path=db_path)
+
+    first.get_or_load("q", lambda: [{"Id": "1"}])
+
+    assert second.get_or_load("q", lambda: [{"Id": "other"}]) == [{"Id": "1"}]
+    assert second.stats()["hits"] == 1
+
+def test_memory_hits_do_not_wait_for_a_blocked_sqlite_write(tmp_path):
+    db_path = str(tmp_path / "results.db")
+    cache = ResultCache(db_path=db_path)
+    cache.set("cached", [{"Id": "1"}])
+
+    # Another worker holds the write lock, so the next store blocks in SQLite
+    other_worker = sqlite3.connect(db_path)
+    other_worker.execute("BEGIN IMMEDIATE")
+    writer = threading.Thread(target=cache.set, args=("new", [{"Id": "2"}]))
+    writer.start()
+    time.sleep(0.2)
+    try:
+        started = time.perf_counter()
+        assert cache.get("cached") == [{"Id": "1"}]
+        assert time.perf_counter() - started < 0.1
+        assert writer.is_alive()
+    finally:
+        other_worker.rollback()
+        other_worker.close()
+        writer.join()
+    assert ResultCache(db_path=db_path).get("new") == [{"Id": "2"}]
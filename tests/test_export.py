@@ -0,0 +1,70 @@
+import csv
+import os
+
+import pandas as pd
+import pytest
+from langchain_salesforce import SalesforceTool
+
+from benchmarks.fakes import CompiledQuery, FakeSalesforce
+from benchmarks.synthetic import synthetic_records
+from models.criteria import CustomerCriteria
+from services.clients import clients
+from services.export import EXPORT_COLUMNS, bulk_export, stream_export
+from services.query_builder import build_soql_query
+from services.query_executor import iter_salesforce_records, stream_salesforce
+
+RECORDS = synthetic_records(1000)
+SOQL = build_soql_query(CustomerCriteria(), include_limit=False, fields=EXPORT_COLUMNS)
+MATCHES = CompiledQuery(SOQL).execute(RECORDS)
+assert len(MATCHES) > 600, "the chunking tests need several chunks"
+
+@pytest.fixture
+def salesforce():
+    fake = FakeSalesforce(RECORDS, page_size=100)
+    clients.set_salesforce_tool(SalesforceTool("fake", "fake", "fake", salesforce_client=fake))
+    return fake
+
+def read_csv_rows(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.reader(f))
+
+def test_stream_salesforce_follows_every_page(salesforce):
+    pages = list(stream_salesforce(SOQL))
+
+    assert len(pages) > 1
+    assert [len(page) for page in pages[:-1]] == [100] * (len(pages) - 1)
+    assert sum(len(page) for page in pages) == len(MATCHES)
+    assert salesforce.queries == 1
+    assert salesforce.query_mores == len(pages) - 1
+
+def test_iter_salesforce_records_yields_each_record_once(salesforce):
+    records = list(iter_salesforce_records(SOQL))
+
+    assert records == MATCHES
+
+@pytest.mark.parametrize("export", [stream_export, bulk_export])
+def test_export_writes_csv_chunks(salesforce, tmp_path, export):
+    files = export(SOQL, str(tmp_path), "csv", chunk_rows=300)
+
+    assert [os.path.basename(path) for path in files] == [f"part-{part:05d}.csv" for part in range(1, len(files) + 1)]
+    chunks = [read_csv_rows(path) for path in files]
+    assert all(chunk[0] == EXPORT_COLUMNS for chunk in chunks)
+    assert [len(chunk) - 1 for chunk in chunks][:-1] == [300] * (len(files) - 1)
+    assert sum(len(chunk) - 1 for chunk in chunks) == len(MATCHES)
+    assert sorted(os.listdir(tmp_path)) == sorted(os.path.basename(path) for path in files)
+
+@pytest.mark.parametrize("export", [stream_export, bulk_export])
+def test_export_writes_parquet_chunks(salesforce, tmp_path, export):
+    files = export(SOQL, str(tmp_path), "parquet", chunk_rows=300)
+
+    frames = [pd.read_parquet(path) for path in files]
+    assert all(list(frame.columns) == EXPORT_COLUMNS for frame in frames)
+    assert [len(frame) for frame in frames][:-1] == [300] * (len(files) - 1)
+    assert pd.concat(frames)["Account__r.Name"].tolist() == [record["Account__r"]["Name"] for record in MATCHES]
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".csv")]
+
+def test_bulk_export_runs_one_job(salesforce, tmp_path):
+    bulk_export(SOQL, str(tmp_path), "csv", chunk_rows=300)
+
+    assert salesforce.bulk_jobs == 1
+    assert salesforce.queries == 0
@@ -0,0 +1,20 @@
+import json
+
+from utils.logger import LazyPayload
+
+def test_payload_is_snapshotted_when_logged():
+    data = {"erp_system": "sap", "product_activations": ["ap"]}
+    payload = LazyPayload(data, max_items=10, max_chars=1000)
+
+    data["erp_system"] = "SAP S/4HANA"
+    data["product_activations"].append("ar")
+
+    assert json.loads(str(payload)) == {"erp_system": "sap", "product_activations": ["ap"]}
+
+def test_snapshot_only_copies_the_preview():
+    records = [{"Id": str(i)} for i in range(100)]
+    payload = LazyPayload({"records": records, "done": True}, max_items=2, max_chars=10_000)
+
+    records[0]["Id"] = "changed"
+
+    assert json.loads(str(payload)) == {"records": [{"Id": "0"}, {"Id": "1"}, "... 98 more items"], "done": True}
@@ -0,0 +1,41 @@
+import asyncio
+from typing import Any
+
+from benchmarks.fakes import FakeChatModel, install_fakes
+from benchmarks.synthetic import synthetic_records
+from services.clients import clients
+from services.pipeline import customer_reference_agent
+
+class LoopBoundChatModel(FakeChatModel):
+    """Fails like a pooled httpx.AsyncClient when used after the loop it first ran on closed"""
+
+    loop: Any = None
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        loop = asyncio.get_running_loop()
+        if self.loop is None:
+            self.loop = loop
+        elif self.loop is not loop and self.loop.is_closed():
+            raise RuntimeError("Event loop is closed")
+        return await super()._agenerate(messages, stop, run_manager, **kwargs)
+
+def test_consecutive_sync_calls_share_the_llm_client():
+    install_fakes(synthetic_records(500))
+    llm = LoopBoundChatModel(responses={
+        "reference for a retailer": '{"industry": "Retail"}',
+        "reference for a bank": '{"industry": "Banking"}',
+    })
+    clients.set_llm(llm)
+
+    for prompt in ("Who is a good reference for a retailer?", "Who is a good reference for a bank?"):
+        _, _, soql_query, _ = customer_reference_agent(prompt)
+        assert "Industry" in soql_query
+    assert llm.calls == 2
+
+def test_table_answers_skip_the_text_table_when_asked():
+    install_fakes(synthetic_records(500), {"retailer": '{"industry": "Retail"}'})
+
+    text, results, _, message_type = customer_reference_agent("Who is a good reference for a retailer?", text=False)
+
+    assert message_type == "table"
+    assert text == f"Found {len(results)} matching customers."
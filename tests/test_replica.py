@@ -0,0 +1,42 @@
+import pytest
+
+from benchmarks.fakes import CompiledQuery
+from benchmarks.synthetic import synthetic_records
+from models.criteria import CustomerCriteria
+from services.columnar import CustomerSnapshot
+from services.query_builder import build_soql_query
+from services.replica import CustomerReplica
+
+RENAMED = {0: "100% Foods", 1: "100 Foods", 2: "A_B Corp", 3: "AxB Corp", 4: "Back\\slash Ltd"}
+
+@pytest.fixture(scope="module")
+def records():
+    records = synthetic_records(15)
+    for position, name in RENAMED.items():
+        records[position]["Account__r"].update(Name=name, Type="Customer")
+    records[5]["archived_invoice_count_R12__c"] = 4200
+    records[6]["archived_invoice_count_R12__c"] = None
+    return records
+
+@pytest.fixture(scope="module")
+def replica(records, tmp_path_factory):
+    replica = CustomerReplica(str(tmp_path_factory.mktemp("replica") / "replica.db"))
+    replica.full_load(records)
+    return replica
+
+def names(rows):
+    return sorted(row["Account__r"]["Name"] for row in rows)
+
+@pytest.mark.parametrize("criteria", [
+    CustomerCriteria(customer_name="100%"),
+    CustomerCriteria(customer_name="A_B"),
+    CustomerCriteria(customer_name="back\\slash"),
+    CustomerCriteria(invoice_volume={"value": 4200, "operator": "!="}),
+    CustomerCriteria(po_percentage={"value": 50, "operator": "!="}),
+], ids=["percent", "underscore", "backslash", "not-equal", "not-equal-percentage"])
+def test_replica_and_snapshot_match_salesforce(records, replica, criteria):
+    criteria.limit = 20
+    expected = names(CompiledQuery(build_soql_query(criteria)).execute(records))
+
+    assert names(replica.query(criteria)) == expected
+    assert names(CustomerSnapshot(replica.records()).query(criteria)) == expected
@@ -0,0 +1,47 @@
+import asyncio
+import time
+
+import pytest
+
+from services.pipeline import run_stage
+from services.resilience import BackendPolicy, CircuitBreaker
+
+class Unavailable(Exception):
+    status = 503
+
+def test_worker_thread_stops_retrying_after_its_stage_times_out():
+    attempts = []
+
+    def failing_call():
+        attempts.append(time.monotonic())
+        time.sleep(0.2)
+        raise Unavailable("busy")
+
+    policy = BackendPolicy("salesforce", 1, 10, 0.05, 0.05, CircuitBreaker("salesforce", 100, 1))
+
+    async def main():
+        with pytest.raises(TimeoutError):
+            await run_stage("query_salesforce", asyncio.to_thread(policy.call, failing_call), 0.3)
+        # Without the deadline the thread would go on for ~10 attempts (2.5s)
+        await asyncio.sleep(1)
+
+    asyncio.run(main())
+    assert len(attempts) <= 2
+
+def test_retry_after_a_stalled_call_fits_in_the_stage_timeout():
+    calls = []
+
+    async def stalls_once():
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            await asyncio.sleep(60)
+        return "ok"
+
+    # The per-call deadline alone (20s) is longer than the whole stage
+    policy = BackendPolicy("llm", 20, 3, 0.01, 0.01, CircuitBreaker("llm", 100, 1))
+
+    async def main():
+        return await run_stage("parse_criteria", policy.acall(stalls_once), 1.5)
+
+    assert asyncio.run(main()) == "ok"
+    assert len(calls) == 2
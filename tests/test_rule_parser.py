@@ -0,0 +1,29 @@
+import pytest
+
+from config.settings import settings
+from services.rule_parser import parse_criteria_rules
+
+@pytest.mark.parametrize("prompt, field, value", [
+    ("customers with invoices over 10,000", "invoice_volume", 10000),
+    ("customers with invoices over 10000", "invoice_volume", 10000),
+    ("customers with invoices over 1,250,000.5", "invoice_volume", 1250000.5),
+    ("customers with po touchless above 12.5%", "po_touchless_percentage", 12.5),
+])
+def test_unambiguous_numbers_are_parsed(prompt, field, value):
+    criteria, confidence = parse_criteria_rules(prompt)
+
+    assert getattr(criteria, field).value == value
+    assert confidence >= settings.RULE_PARSER_MIN_CONFIDENCE
+
+@pytest.mark.parametrize("prompt", [
+    "customers with invoices over 10.000",
+    "customers on SAP with invoices over 10.000",
+    "po touchless above 1,5%",
+    "customers with invoices over 1.500.000",
+])
+def test_locale_dependent_numbers_are_left_to_the_llm(prompt):
+    criteria, confidence = parse_criteria_rules(prompt)
+
+    assert confidence < settings.RULE_PARSER_MIN_CONFIDENCE
+    if criteria is not None:
+        assert criteria.invoice_volume is None and criteria.po_touchless_percentage is None
@@ -0,0 +1,39 @@
+import asyncio
+
+from benchmarks.fakes import CompiledQuery, install_fakes
+from benchmarks.synthetic import synthetic_records
+from models.criteria import CustomerCriteria
+from services import pipeline
+from services.cache import criteria_cache, result_cache
+from services.conversation import filter_candidates
+from services.speculation import Speculation
+
+def test_cache_hit_does_not_start_a_speculation(monkeypatch):
+    monkeypatch.setenv("SPECULATIVE_PREFETCH", "true")
+    install_fakes(synthetic_records(500))
+    prompt = "Which accounts in insurance could talk to a prospect?"
+    criteria_cache.set(prompt, CustomerCriteria(industry="Insurance"))
+    started = []
+    monkeypatch.setattr(pipeline, "speculate", lambda *args: started.append(args))
+
+    pipeline.customer_reference_agent(prompt)
+
+    assert started == []
+
+def test_prefetch_spanning_several_pages_is_complete():
+    records = synthetic_records(500)
+    _, salesforce = install_fakes(records)
+    salesforce.page_size = 50
+    result_cache.clear()
+    guess = CustomerCriteria(invoice_volume={"value": 1000, "operator": ">"})
+    parsed = CustomerCriteria(invoice_volume={"value": 5000, "operator": ">"})
+
+    async def prefetch():
+        speculation = Speculation(guess, pool=2000)
+        return speculation.soql_query, await speculation.candidates(parsed)
+    soql_query, candidates = asyncio.run(prefetch())
+
+    expected = filter_candidates(CompiledQuery(soql_query).execute(records), parsed)
+    assert len(expected) > salesforce.page_size
+    assert candidates == expected
+    assert salesforce.query_mores > 0
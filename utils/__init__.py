@@ -1,4 +1,4 @@
-from .formatter import format_results, get_nested_value
-from .logger import logger, log_json, setup_logger
+from .formatter import format_results, get_nested_value, ColumnSpec, RowProjector
+from .logger import logger, log_json, setup_logger, set_raw_payload_logging, new_request_id, request_id_var
 
-__all__ = ['format_results', 'get_nested_value', 'logger', 'log_json', 'setup_logger']
\ No newline at end of file
+__all__ = ['format_results', 'get_nested_value', 'ColumnSpec', 'RowProjector', 'logger', 'log_json', 'setup_logger', 'set_raw_payload_logging', 'new_request_id', 'request_id_var']
\ No newline at end of file
@@ -1,10 +1,18 @@
 #utils/formatter.py
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
 from config.field_mapping import FIELD_MAPPING
-import pandas as pd
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+@lru_cache(maxsize=None)
+def _split_path(field_path: str) -> Tuple[str, ...]:
+    return tuple(field_path.split('.'))
 
 def get_nested_value(data: dict, field_path: str, default="N/A"):
     """Get nested field values using dot notation"""
-    keys = field_path.split('.')
+    keys = _split_path(field_path)
     value = data
     for key in keys:
         if isinstance(value, dict):
@@ -13,88 +21,125 @@ def get_nested_value(data: dict, field_path: str, default="N/A"):
             return default
     return value if value is not None else default
 
+def compile_accessor(field_path: str, default: Any = "N/A") -> Callable[[dict], Any]:
+    """Compile a dotted path into a getter with the same semantics as get_nested_value"""
+    keys = _split_path(field_path)
+    if len(keys) == 1:
+        (leaf,) = keys
+        def get(record):
+            value = record.get(leaf) if isinstance(record, dict) else None
+            return default if value is None else value
+    elif len(keys) == 2:
+        # Records are dicts of dicts; any other shape falls out through the except
+        parent, leaf = keys
+        def get(record):
+            try:
+                value = record[parent][leaf]
+            except (KeyError, TypeError, IndexError):
+                return default
+            return default if value is None else value
+    else:
+        def get(record):
+            value = record
+            for key in keys:
+                value = value.get(key) if isinstance(value, dict) else None
+                if value is None:
+                    return default
+            return value
+    return get
+
+def percent(value: Any) -> str:
+    return f"{value}%"
+
+class ColumnSpec(NamedTuple):
+    label: str
+    path: str
+    format: Optional[Callable[[Any], Any]] = None
+
+class RowProjector:
+    """Projects Salesforce records onto a fixed set of output columns.
+
+    Column specs are compiled into accessors once, so projecting a row is one
+    getter call (plus the optional formatter) per cell, with no path parsing.
+    """
+
+    def __init__(self, columns: List[ColumnSpec], default: Any = "N/A"):
+        self.labels = [column.label for column in columns]
+        self._getters = []
+        for column in columns:
+            get = compile_accessor(column.path, default)
+            if column.format is not None:
+                get = (lambda get, fmt: lambda record: fmt(get(record)))(get, column.format)
+            self._getters.append(get)
+
+    def rows(self, records: Iterable[dict]) -> Iterator[List[Any]]:
+        """Yield one list of cell values per record"""
+        getters = self._getters
+        for record in records:
+            yield [get(record) for get in getters]
+
+    def columns(self, records: List[dict]) -> Dict[str, List[Any]]:
+        """Column label -> list of cell values, built column by column"""
+        return {label: [get(record) for record in records] for label, get in zip(self.labels, self._getters)}
+
+    def dataframe(self, records: List[dict]) -> "pd.DataFrame":
+        import pandas as pd
+        return pd.DataFrame(self.columns(records), columns=self.labels)
+
+DISPLAY_COLUMNS = [
+    ColumnSpec("Customer Name", FIELD_MAPPING['customer_name']),
+    ColumnSpec("Account Owner", FIELD_MAPPING['account_owner']),
+    ColumnSpec("Industry", FIELD_MAPPING['industry']),
+    ColumnSpec("PO %", FIELD_MAPPING['po_percentage'], percent),
+    ColumnSpec("Non-PO %", FIELD_MAPPING['non_po_percentage'], percent),
+    ColumnSpec("PO Touchless %", FIELD_MAPPING['po_touchless_percentage'], percent),
+    ColumnSpec("Auto Dist %", FIELD_MAPPING['automatic_distribution'], percent),
+    ColumnSpec("Invoice Volume", FIELD_MAPPING['invoice_volume']),
+    ColumnSpec("ERP System", FIELD_MAPPING['erp_system']),
+    ColumnSpec("Product Activations", FIELD_MAPPING['product_activations']),
+    ColumnSpec("Account URL", FIELD_MAPPING['account_url_link']),
+]
+
+display_projector = RowProjector(DISPLAY_COLUMNS)
+
+# Key the pipeline adds to each record of a side-by-side comparison
+GROUP_FIELD = "Comparison"
+comparison_projector = RowProjector([ColumnSpec("Comparison", GROUP_FIELD), *DISPLAY_COLUMNS])
+
+def projector_for(results: list[dict]) -> RowProjector:
+    """Comparison results get a leading column naming their group; no results get the display columns"""
+    return comparison_projector if results and GROUP_FIELD in results[0] else display_projector
+
 def format_results(results: list[dict]) -> str:
     if not results:
         return "No customers found matching your criteria."
-    
-    # Prepare data for DataFrame
-    formatted_data = []
-    
-    for customer in results:
-        formatted_data.append({
-            "Customer Name": get_nested_value(customer, FIELD_MAPPING['customer_name']),
-            "Account Owner": get_nested_value(customer, FIELD_MAPPING['account_owner']),
-            "Industry": get_nested_value(customer, FIELD_MAPPING['industry']),
-            "PO %": f"{get_nested_value(customer, FIELD_MAPPING['po_percentage'])}%",
-            "Non-PO %": f"{get_nested_value(customer, FIELD_MAPPING['non_po_percentage'])}%",
-            "PO Touchless %": f"{get_nested_value(customer, FIELD_MAPPING['po_touchless_percentage'])}%",
-            "Auto Dist %": f"{get_nested_value(customer, FIELD_MAPPING['automatic_distribution'])}%",
-            "Invoice Volume": get_nested_value(customer, FIELD_MAPPING['invoice_volume']),
-            "ERP System": get_nested_value(customer, FIELD_MAPPING['erp_system']),
-            "Product Activations": get_nested_value(customer, FIELD_MAPPING['product_activations']),
-            "Account URL": get_nested_value(customer, FIELD_MAPPING['account_url_link'])
-        })
-    
-    # Create DataFrame
-    df = pd.DataFrame(formatted_data)
-    
+    import pandas as pd
+
+    df = projector_for(results).dataframe(results)
+
     # Format DataFrame
     pd.set_option('display.max_columns', None)
     pd.set_option('display.expand_frame_repr', False)
     pd.set_option('display.max_colwidth', 30)
-    
+
     # Return formatted DataFrame as string
     return df.to_string(index=False)
 
 def format_results_html(results: list[dict]) -> str:
     if not results:
         return "No customers found matching your criteria."
-    
-    # Create DataFrame as above
-    formatted_data = []
-    for customer in results:
-        formatted_data.append({
-            "Customer Name": get_nested_value(customer, FIELD_MAPPING['customer_name']),
-            "Account Owner": get_nested_value(customer, FIELD_MAPPING['account_owner']),
-            "Industry": get_nested_value(customer, FIELD_MAPPING['industry']),
-            "PO %": f"{get_nested_value(customer, FIELD_MAPPING['po_percentage'])}%",
-            "Non-PO %": f"{get_nested_value(customer, FIELD_MAPPING['non_po_percentage'])}%",
-            "PO Touchless %": f"{get_nested_value(customer, FIELD_MAPPING['po_touchless_percentage'])}%",
-            "Auto Dist %": f"{get_nested_value(customer, FIELD_MAPPING['automatic_distribution'])}%",
-            "Invoice Volume": get_nested_value(customer, FIELD_MAPPING['invoice_volume']),
-            "ERP System": get_nested_value(customer, FIELD_MAPPING['erp_system']),
-            "Product Activations": get_nested_value(customer, FIELD_MAPPING['product_activations']),
-            "Account URL": get_nested_value(customer, FIELD_MAPPING['account_url_link'])
-        })
-    
-    df = pd.DataFrame(formatted_data)
-    
+
     # Return styled HTML table
-    return df.to_html(
+    return projector_for(results).dataframe(results).to_html(
         index=False,
         classes="table table-striped table-hover",
         border=0
     )
 
-def get_formatted_dataframe(results: list[dict]) -> pd.DataFrame:
+def get_formatted_dataframe(results: list[dict]) -> "pd.DataFrame":
     """Return data as a pandas DataFrame for direct use in Streamlit"""
     if not results:
+        # pandas is imported on first render, not when the app starts
+        import pandas as pd
         return pd.DataFrame()  # Empty DataFrame
-    
-    formatted_data = []
-    for customer in results:
-        formatted_data.append({
-            "Customer Name": get_nested_value(customer, FIELD_MAPPING['customer_name']),
-            "Account Owner": get_nested_value(customer, FIELD_MAPPING['account_owner']),
-            "Industry": get_nested_value(customer, FIELD_MAPPING['industry']),
-            "PO %": f"{get_nested_value(customer, FIELD_MAPPING['po_percentage'])}%",
-            "Non-PO %": f"{get_nested_value(customer, FIELD_MAPPING['non_po_percentage'])}%",
-            "PO Touchless %": f"{get_nested_value(customer, FIELD_MAPPING['po_touchless_percentage'])}%",
-            "Auto Dist %": f"{get_nested_value(customer, FIELD_MAPPING['automatic_distribution'])}%",
-            "Invoice Volume": get_nested_value(customer, FIELD_MAPPING['invoice_volume']),
-            "ERP System": get_nested_value(customer, FIELD_MAPPING['erp_system']),
-            "Product Activations": get_nested_value(customer, FIELD_MAPPING['product_activations']),
-            "Account URL": get_nested_value(customer, FIELD_MAPPING['account_url_link'])
-        })
-    
-    return pd.DataFrame(formatted_data)
\ No newline at end of file
+    return projector_for(results).dataframe(results)
@@ -1,21 +1,142 @@
-import logging
-from datetime import datetime
+import atexit
+import contextvars
+import copy
 import json
-from typing import Any, Dict
+import logging
+import logging.handlers
+import queue
+import random
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Optional
+from config.settings import settings
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s'
+
+# Id of the agent request being served; copied into tasks and to_thread workers
+request_id_var: contextvars.ContextVar[str] = contextvars.ContextVar("request_id", default="-")
+
+def new_request_id() -> str:
+    """Start a new request id in the current context and return it"""
+    request_id = uuid.uuid4().hex[:12]
+    request_id_var.set(request_id)
+    return request_id
+
+class RequestIdFilter(logging.Filter):
+    """Stamps the current request id on every record, on the thread that logged it"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+# LogRecord attributes that are not user-supplied `extra` fields
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: timestamp, level, logger, message, any `extra` fields and the traceback"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class _BackgroundQueueHandler(logging.handlers.QueueHandler):
+    """Enqueues records untouched so message formatting and payload serialization
+    happen on the listener thread instead of the request thread"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+# Payloads of these types cannot change after logging, so they are kept by reference
+_IMMUTABLE = (str, bytes, int, float, bool, type(None))
+
+class LazyPayload:
+    """Defers JSON serialization of a logged payload until a handler formats it.
+
+    Lists longer than max_items (including a response's "records") are cut to a
+    preview with a count, and the serialized text is truncated to max_chars.
+    Mutable payloads are copied when logged (only the previewed part), so
+    callers can keep modifying them without changing what gets written.
+    """
+
+    def __init__(self, data: Any, max_items: int, max_chars: int):
+        self.max_items = max_items
+        self.max_chars = max_chars
+        self.data = data if isinstance(data, _IMMUTABLE) else copy.deepcopy(self._preview(data))
+
+    def _preview(self, value: Any) -> Any:
+        if isinstance(value, list) and len(value) > self.max_items:
+            return [*value[:self.max_items], f"... {len(value) - self.max_items} more items"]
+        if isinstance(value, dict) and isinstance(value.get("records"), list):
+            return {**value, "records": self._preview(value["records"])}
+        return value
+
+    def __str__(self) -> str:
+        text = json.dumps(self.data, default=str)
+        if len(text) > self.max_chars:
+            return f"{text[:self.max_chars]}... ({len(text) - self.max_chars} chars truncated)"
+        return text
+
+def _file_handler() -> Optional[logging.Handler]:
+    if not settings.LOG_FILE:
+        return None
+    if settings.LOG_ROTATION == "time":
+        handler = logging.handlers.TimedRotatingFileHandler(
+            settings.LOG_FILE, when=settings.LOG_ROTATE_WHEN, backupCount=settings.LOG_BACKUP_COUNT
+        )
+    else:
+        handler = logging.handlers.RotatingFileHandler(
+            settings.LOG_FILE, maxBytes=settings.LOG_MAX_BYTES, backupCount=settings.LOG_BACKUP_COUNT
+        )
+    handler.setFormatter(JsonFormatter())
+    return handler
+
+_listener: Optional[logging.handlers.QueueListener] = None
 
 def setup_logger():
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(f'customer_reference_agent_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log'),
-            logging.StreamHandler()
-        ]
-    )
+    """Route logging through a queue to a background writer (rotating JSON file + console)"""
+    global _listener
+    if _listener is None:
+        console = logging.StreamHandler()
+        console.setFormatter(JsonFormatter() if settings.LOG_CONSOLE_JSON else logging.Formatter(TEXT_FORMAT))
+        handlers = [h for h in (_file_handler(), console) if h is not None]
+        log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+        _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+        queue_handler = _BackgroundQueueHandler(log_queue)
+        queue_handler.addFilter(RequestIdFilter())
+        logging.basicConfig(level=settings.LOG_LEVEL, handlers=[queue_handler])
+        set_raw_payload_logging(__name__, settings.LOG_RAW_PAYLOADS)
     return logging.getLogger(__name__)
 
+def set_raw_payload_logging(logger_name: str, enabled: bool):
+    """Turn raw-response dumps from log_json(..., raw=True) on or off for one logger"""
+    logging.getLogger(f"{logger_name}.raw").disabled = not enabled
+
 logger = setup_logger()
 
-def log_json(data: Dict[str, Any], step_name: str):
-    """Helper function to log JSON data with pretty formatting"""
-    logger.info(f"{step_name} JSON:\n{json.dumps(data, indent=2)}")
\ No newline at end of file
+def log_json(data: Any, step_name: str, raw: bool = False, log: Optional[logging.Logger] = None):
+    """Log a JSON payload, serialized lazily on the writer thread.
+
+    Raw backend responses (raw=True) go to the '<logger>.raw' child logger,
+    which set_raw_payload_logging() can switch off, and are sampled at
+    LOG_PAYLOAD_SAMPLE_RATE.
+    """
+    log = log or logger
+    if raw:
+        log = logging.getLogger(f"{log.name}.raw")
+        if log.disabled or random.random() >= settings.LOG_PAYLOAD_SAMPLE_RATE:
+            return
+    if log.isEnabledFor(logging.INFO):
+        payload = LazyPayload(data, settings.LOG_PAYLOAD_MAX_ITEMS, settings.LOG_PAYLOAD_MAX_CHARS)
+        log.info("%s JSON: %s", step_name, payload)
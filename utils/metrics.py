@@ -0,0 +1,198 @@
+#utils/metrics.py
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from utils.logger import logger
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+LATENCY_BUCKETS = [0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+ROW_BUCKETS = [0, 1, 5, 10, 20, 50, 100, 1000, 10000, 100000]
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+def _render_labels(key: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            lines += [f"{self.name}{_render_labels(key)} {value}" for key, value in sorted(self._values.items())]
+        return lines
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus model, one series per label set"""
+
+    def __init__(self, name: str, help: str, buckets: List[float]):
+        self.name = name
+        self.help = help
+        self.buckets = sorted(buckets)
+        # label key -> (per-bucket counts with a trailing +Inf slot, sum, count)
+        self._series: Dict[LabelKey, Tuple[List[int], float, int]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total, count = self._series.get(key) or ([0] * (len(self.buckets) + 1), 0.0, 0)
+            counts[slot] += 1
+            self._series[key] = (counts, total + value, count + 1)
+
+    def quantile(self, q: float, **labels) -> Optional[float]:
+        """Estimate a quantile by linear interpolation within its bucket"""
+        with self._lock:
+            series = self._series.get(_label_key(labels))
+            if series is None:
+                return None
+            counts, count = list(series[0]), series[2]
+        rank = q * count
+        seen = 0
+        for i, bucket_count in enumerate(counts):
+            if bucket_count and seen + bucket_count >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.buckets[-1]
+
+    def label_sets(self) -> List[Dict[str, str]]:
+        with self._lock:
+            return [dict(key) for key in sorted(self._series)]
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            series = self._series.get(_label_key(labels))
+            return series[2] if series else 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f"{self.name}_bucket{_render_labels(key, (('le', str(bound)),))} {cumulative}")
+                lines.append(f"{self.name}_bucket{_render_labels(key, (('le', '+Inf'),))} {count}")
+                lines.append(f"{self.name}_sum{_render_labels(key)} {total}")
+                lines.append(f"{self.name}_count{_render_labels(key)} {count}")
+        return lines
+
+class Registry:
+    """Process-wide metrics, rendered in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self._metrics: List = []
+        self._gauges: List[Tuple[str, str, Callable[[], Dict[str, float]]]] = []
+
+    def counter(self, name: str, help: str) -> Counter:
+        metric = Counter(name, help)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, buckets: List[float]) -> Histogram:
+        metric = Histogram(name, help, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge_callback(self, name: str, help: str, collect: Callable[[], Dict[str, float]]):
+        """Register a gauge whose values (one per 'key' label) are read at scrape time"""
+        self._gauges.append((name, help, collect))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines += metric.render()
+        for name, help, collect in self._gauges:
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} gauge"]
+            try:
+                lines += [f'{name}{{key="{key}"}} {value}' for key, value in sorted(collect().items())]
+            except Exception as e:
+                logger.warning(f"Metrics gauge '{name}' failed: {str(e)}")
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+STAGE_SECONDS = registry.histogram(
+    "reference_agent_stage_seconds", "Latency of each pipeline stage", LATENCY_BUCKETS
+)
+REQUESTS = registry.counter("reference_agent_requests_total", "Agent requests by outcome")
+LLM_TOKENS = registry.counter("reference_agent_llm_tokens_total", "LLM tokens used, by kind")
+SALESFORCE_ROWS = registry.histogram(
+    "reference_agent_salesforce_rows", "Rows returned per live Salesforce query", ROW_BUCKETS
+)
+BACKEND_RETRIES = registry.counter("reference_agent_backend_retries_total", "Retried backend calls, by backend")
+LLM_HEDGES = registry.counter("reference_agent_llm_hedges_total", "Hedged LLM requests, by which request won")
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """Observe the wall time of the block in STAGE_SECONDS, whether it succeeds or fails"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage=stage)
+
+def record_llm_usage(usage: Optional[Dict[str, int]]):
+    """Count the tokens from a chat model response's usage_metadata"""
+    if not usage:
+        return
+    LLM_TOKENS.inc(usage.get("input_tokens", 0), kind="prompt")
+    LLM_TOKENS.inc(usage.get("output_tokens", 0), kind="completion")
+
+def stage_summary() -> List[Dict[str, object]]:
+    """Count and estimated p50/p95/p99 in milliseconds per stage, for the debug panel"""
+    rows = []
+    for labels in STAGE_SECONDS.label_sets():
+        row = {"stage": labels["stage"], "count": STAGE_SECONDS.count(**labels)}
+        for q in (0.5, 0.95, 0.99):
+            row[f"p{int(q * 100)} ms"] = round(STAGE_SECONDS.quantile(q, **labels) * 1000, 1)
+        rows.append(row)
+    return rows
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+def start_metrics_server(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve GET /metrics from a daemon thread; later calls reuse the running server"""
+    global _server
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+            logger.info(f"Serving Prometheus metrics on http://{host}:{port}/metrics")
+        return _server
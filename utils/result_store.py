@@ -0,0 +1,159 @@
+#utils/result_store.py
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, List, Optional
+from utils.formatter import get_formatted_dataframe
+from utils.logger import logger
+
+if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
+
+# Cell value the formatter shows for a missing field
+MISSING = "N/A"
+_MISSING_COLUMNS_KEY = b"missing_columns"
+
+def _to_arrow(df: "pd.DataFrame") -> "pa.Table":
+    """Convert a display DataFrame to Arrow.
+
+    Numeric columns hold MISSING for absent values, which Arrow cannot mix with
+    numbers; those cells are stored as nulls and restored by _to_pandas.
+    """
+    import pyarrow as pa
+    arrays, missing_columns = [], []
+    for label in df.columns:
+        column = df[label]
+        try:
+            array = pa.array(column, from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            try:
+                array = pa.array(column.mask(column == MISSING), from_pandas=True)
+                missing_columns.append(label)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                array = pa.array(column.astype(str))
+        if pa.types.is_string(array.type) or pa.types.is_large_string(array.type):
+            encoded = array.dictionary_encode()
+            # Owners, industries and ERP systems repeat across rows; names and URLs do not
+            if encoded.nbytes < array.nbytes:
+                array = encoded
+        arrays.append(array)
+    metadata = {_MISSING_COLUMNS_KEY: json.dumps(missing_columns).encode()}
+    return pa.Table.from_arrays(arrays, names=[str(label) for label in df.columns], metadata=metadata)
+
+def _to_pandas(table: "pa.Table") -> "pd.DataFrame":
+    import pyarrow as pa
+    # Decode dictionaries so columns come back as strings, not categoricals
+    columns = [
+        column.cast(column.type.value_type) if pa.types.is_dictionary(column.type) else column
+        for column in table.columns
+    ]
+    df = pa.Table.from_arrays(columns, names=table.column_names).to_pandas()
+    metadata = table.schema.metadata or {}
+    for label in json.loads(metadata.get(_MISSING_COLUMNS_KEY, b"[]")):
+        # From the Arrow values, so integers are not widened to floats by the nulls
+        df[label] = [MISSING if value is None else value for value in table.column(label).to_pylist()]
+    return df
+
+class SessionResultStore:
+    """Formatted result tables of one chat session, built once per message.
+
+    The `recent` most recently used tables stay as DataFrames, ready to render.
+    Older ones are converted to Arrow tables, which hold the same cells in a
+    fraction of the memory. When the session uses more than `max_bytes`, the
+    oldest Arrow tables are written to a temporary Feather file, or dropped
+    when `spill` is off. Spill files are removed with the store.
+    """
+
+    def __init__(self, max_bytes: int, recent: int = 3, spill: bool = True):
+        self.max_bytes = max_bytes
+        self.recent = max(1, recent)
+        self.spill = spill
+        self._frames: "OrderedDict[int, pd.DataFrame]" = OrderedDict()
+        self._frame_bytes: Dict[int, int] = {}
+        self._tables: "OrderedDict[int, pa.Table]" = OrderedDict()
+        self._spilled: Dict[int, str] = {}
+        self._spill_dir: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def __contains__(self, idx: int) -> bool:
+        with self._lock:
+            return idx in self._frames or idx in self._tables or idx in self._spilled
+
+    def put(self, idx: int, records: List[dict]) -> "pd.DataFrame":
+        """Build the display DataFrame for a message once; the raw records are not kept"""
+        df = get_formatted_dataframe(records)
+        with self._lock:
+            self._remember_frame(idx, df)
+            self._enforce_budget()
+        return df
+
+    def get(self, idx: int) -> Optional["pd.DataFrame"]:
+        """The message's DataFrame, or None if it was dropped to stay within the budget"""
+        with self._lock:
+            df = self._frames.get(idx)
+            if df is not None:
+                self._frames.move_to_end(idx)
+                return df
+            table = self._tables.pop(idx, None)
+            path = self._spilled.pop(idx, None)
+        if table is None and path is None:
+            return None
+        if table is None:
+            from pyarrow import feather
+            table = feather.read_table(path)
+            os.remove(path)
+        df = _to_pandas(table)
+        with self._lock:
+            self._remember_frame(idx, df)
+            self._enforce_budget()
+        return df
+
+    def memory_bytes(self) -> int:
+        """Approximate bytes held in memory (spilled tables excluded)"""
+        with self._lock:
+            return self._memory_bytes()
+
+    def clear(self):
+        with self._lock:
+            self._frames.clear()
+            self._frame_bytes.clear()
+            self._tables.clear()
+            self._spilled.clear()
+            if self._spill_dir is not None:
+                shutil.rmtree(self._spill_dir, ignore_errors=True)
+                self._spill_dir = None
+
+    def _memory_bytes(self) -> int:
+        return sum(self._frame_bytes.values()) + sum(table.nbytes for table in self._tables.values())
+
+    def _remember_frame(self, idx: int, df: "pd.DataFrame"):
+        self._frames[idx] = df
+        self._frame_bytes[idx] = int(df.memory_usage(deep=True).sum())
+        while len(self._frames) > self.recent:
+            old_idx, old_df = self._frames.popitem(last=False)
+            del self._frame_bytes[old_idx]
+            self._tables[old_idx] = _to_arrow(old_df)
+        # Oldest message first, so the budget releases the least recent results
+        self._tables = OrderedDict(sorted(self._tables.items()))
+
+    def _enforce_budget(self):
+        while self._tables and self._memory_bytes() > self.max_bytes:
+            idx, table = self._tables.popitem(last=False)
+            if not self.spill:
+                logger.info(f"Dropped results of message {idx} to stay within the session budget")
+                continue
+            if self._spill_dir is None:
+                self._spill_dir = tempfile.mkdtemp(prefix="reference-agent-results-")
+                # The session state may be discarded without clear(); remove the files with the store
+                weakref.finalize(self, shutil.rmtree, self._spill_dir, True)
+            from pyarrow import feather
+            path = os.path.join(self._spill_dir, f"message-{idx}.feather")
+            feather.write_feather(table, path)
+            self._spilled[idx] = path
+            logger.info(f"Spilled results of message {idx} to {path}")